@@ -14,3 +14,21 @@ if not SECRET_KEY:
 
 # URL del servicio NLP
 NLP_GESTIONAR_URL: str = os.getenv("NLP_GESTIONAR_URL", "http://nlp:8001/gestionar")
+
+# Cliente HTTP hacia el NLP (conexiones persistentes compartidas por todas las peticiones)
+NLP_MAX_CONNECTIONS: int = int(os.getenv("NLP_MAX_CONNECTIONS", 100))
+NLP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("NLP_MAX_KEEPALIVE_CONNECTIONS", 20))
+NLP_KEEPALIVE_EXPIRY: float = float(os.getenv("NLP_KEEPALIVE_EXPIRY", 30))
+NLP_HTTP2: bool = os.getenv("NLP_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Timeouts por fase (segundos)
+NLP_CONNECT_TIMEOUT: float = float(os.getenv("NLP_CONNECT_TIMEOUT", 2))
+NLP_READ_TIMEOUT: float = float(os.getenv("NLP_READ_TIMEOUT", 5))
+NLP_WRITE_TIMEOUT: float = float(os.getenv("NLP_WRITE_TIMEOUT", 5))
+NLP_POOL_TIMEOUT: float = float(os.getenv("NLP_POOL_TIMEOUT", 2))
+
+# Reintentos (solo fallos de conexión) y circuit breaker
+NLP_RETRY_ATTEMPTS: int = int(os.getenv("NLP_RETRY_ATTEMPTS", 2))
+NLP_RETRY_BACKOFF_BASE: float = float(os.getenv("NLP_RETRY_BACKOFF_BASE", 0.1))
+NLP_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("NLP_CIRCUIT_FAILURE_THRESHOLD", 5))
+NLP_CIRCUIT_RESET_SECONDS: float = float(os.getenv("NLP_CIRCUIT_RESET_SECONDS", 30))
@@ -1,14 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.routes import chatbot
+from app.services.historial_service import asegurar_indices
+from app.services.nlp_service import iniciar_cliente, cerrar_cliente
 import os
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Índice del historial (y comprobación de que las consultas lo usan)
+    await asegurar_indices()
+    # Un único cliente HTTP hacia el NLP durante toda la vida de la aplicación
+    iniciar_cliente()
+    yield
+    await cerrar_cliente()
+
 # Creación de la Aplicación
 app = FastAPI(
     title="Asistente Virtual API",
     description="API de backend para gestión de mensajes de evaluación emocional.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS (ajustable en producción)
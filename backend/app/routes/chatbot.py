@@ -1,8 +1,11 @@
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from datetime import datetime
+from typing import Literal, Optional
 from app.models.message import Message
 from app.services.nlp_service import analizar_mensaje
-from app.services.historial_service import recuperar_historial
+from app.services.historial_service import recuperar_historial, transmitir_historial
+import json
 import traceback
 
 router = APIRouter()
@@ -44,13 +47,28 @@ async def chat_endpoint(mensaje: Message):
         )
 
 @router.get("/chat/historial")
-async def obtener_historial(session_id: str):
+async def obtener_historial(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, description="Máximo de interacciones por página."),
+    after_timestamp: Optional[datetime] = Query(None, description="Cursor: devuelve lo posterior a este instante."),
+    after_id: Optional[str] = Query(
+        None, pattern="^[0-9a-f]{24}$", description="Cursor: desempata interacciones con el mismo `after_timestamp`."
+    ),
+    ultimos: bool = Query(False, description="Devuelve las `limit` interacciones más recientes."),
+    formato: Literal["json", "ndjson"] = Query("json", description="ndjson transmite la sesión mensaje a mensaje.")
+):
     """
-    Recupera el historial completo de una sesión.
+    Recupera el historial de una sesión, completo o por páginas (`limit`, `after_timestamp`, `after_id`),
+    o lo transmite como NDJSON (un mensaje por línea) para sesiones largas y exportaciones.
     """
     try:
-        historial = recuperar_historial(session_id)
-        return {"historial": historial}
+        if formato == "ndjson":
+            async def lineas():
+                async for mensaje in transmitir_historial(session_id, after_timestamp, after_id):
+                    yield json.dumps(mensaje, ensure_ascii=False) + "\n"
+            return StreamingResponse(lineas(), media_type="application/x-ndjson")
+
+        return await recuperar_historial(session_id, limit, after_timestamp, after_id, ultimos)
     except Exception as e:
         traceback.print_exc()
         return JSONResponse(
@@ -1,38 +1,145 @@
-from pymongo import MongoClient
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient
 from pymongo.errors import PyMongoError
+from datetime import datetime
+from typing import AsyncIterator, Optional
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Conexión a MongoDB
+# Conexión a MongoDB (driver asíncrono: las consultas no bloquean el bucle de eventos)
 MONGO_URL = os.getenv("DATABASE_URL", "mongodb://db:27017")
-cliente = MongoClient(MONGO_URL)
+cliente = AsyncMongoClient(MONGO_URL)
 db = cliente.get_database("chatbot")
 conversaciones = db.get_collection("historial")
 
-def _obtener_historial_por_sesion(session_id: str) -> list:
+# Índice compuesto con el que se sirve el historial de una sesión ya ordenado.
+# El _id desempata interacciones con el mismo timestamp al paginar
+INDICE_HISTORIAL = [("session_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]
+PROYECCION_HISTORIAL = {"pregunta": 1, "respuesta_usuario": 1, "timestamp": 1}
+
+# Máximo de interacciones por página
+LIMITE_MAXIMO_PAGINA = int(os.getenv("HISTORIAL_MAX_PAGE_SIZE", 500))
+
+def _etapas_plan(plan) -> set:
+    """
+    Todas las etapas ("stage") de un plan de explain(), a cualquier profundidad.
+    """
+    etapas = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            etapas.add(plan["stage"])
+        for valor in plan.values():
+            etapas |= _etapas_plan(valor)
+    elif isinstance(plan, list):
+        for valor in plan:
+            etapas |= _etapas_plan(valor)
+    return etapas
+
+async def asegurar_indices() -> None:
     """
-    Devuelve el historial ordenado de mensajes para una sesión.
+    Crea (si no existe) el índice {session_id: 1, timestamp: 1, _id: 1} y comprueba con
+    explain() que la consulta del historial lo usa. Si el plan vuelve a recorrer
+    la colección entera (COLLSCAN) u ordena en memoria (SORT) lanza RuntimeError.
     """
     try:
-        historial = conversaciones.find({"session_id": session_id}).sort("timestamp", 1)
-        resultado = []
+        await conversaciones.create_index(INDICE_HISTORIAL)
+        planes = [
+            await _consulta_historial("__verificacion_indice__", None, None, 1, ultimos).explain()
+            for ultimos in (False, True)
+        ]
+    except PyMongoError as e:
+        logger.error(f"❌ No se pudo preparar el índice del historial: {e}")
+        return
+
+    for plan in planes:
+        etapas = _etapas_plan(plan.get("queryPlanner", {}).get("winningPlan", {}))
+        if etapas & {"COLLSCAN", "SORT"}:
+            raise RuntimeError(
+                f"La consulta del historial no usa el índice {INDICE_HISTORIAL} (etapas: {sorted(etapas)})."
+            )
+
+def _consulta_historial(
+    session_id: str,
+    after_timestamp: Optional[datetime],
+    after_id: Optional[str],
+    limit: Optional[int],
+    ultimos: bool
+):
+    filtro = {"session_id": session_id}
+    if after_timestamp is not None and after_id is not None:
+        # Cursor compuesto: lo posterior a (timestamp, _id), sin saltarse empates
+        filtro["timestamp"] = {"$gte": after_timestamp}
+        filtro["$or"] = [
+            {"timestamp": {"$gt": after_timestamp}},
+            {"timestamp": after_timestamp, "_id": {"$gt": ObjectId(after_id)}}
+        ]
+    elif after_timestamp is not None:
+        filtro["timestamp"] = {"$gt": after_timestamp}
+    orden = DESCENDING if ultimos else ASCENDING
+    cursor = conversaciones.find(filtro, PROYECCION_HISTORIAL).sort([("timestamp", orden), ("_id", orden)])
+    if limit:
+        cursor = cursor.limit(min(limit, LIMITE_MAXIMO_PAGINA))
+    return cursor
 
-        for doc in historial:
-            if "pregunta" in doc:
-                resultado.append({"role": "assistant", "content": doc["pregunta"]})
-            if "respuesta_usuario" in doc:
-                resultado.append({"role": "user", "content": doc["respuesta_usuario"]})
-        
-        return resultado
+def _mensajes(doc: dict) -> list:
+    mensajes = []
+    if "pregunta" in doc:
+        mensajes.append({"role": "assistant", "content": doc["pregunta"]})
+    if "respuesta_usuario" in doc:
+        mensajes.append({"role": "user", "content": doc["respuesta_usuario"]})
+    return mensajes
 
+async def recuperar_historial(
+    session_id: str,
+    limit: Optional[int] = None,
+    after_timestamp: Optional[datetime] = None,
+    after_id: Optional[str] = None,
+    ultimos: bool = False
+) -> dict:
+    """
+    Recupera el historial de una sesión en orden cronológico.
+    - Sin `limit` devuelve la sesión completa.
+    - Con `limit` devuelve como mucho ese número de interacciones posteriores al
+      cursor (`after_timestamp`, `after_id`) y en `siguiente_cursor` los dos valores
+      para pedir la página siguiente.
+    - Con `ultimos` devuelve las `limit` interacciones más recientes (p. ej. al recargar).
+    """
+    try:
+        docs = await _consulta_historial(session_id, after_timestamp, after_id, limit, ultimos).to_list()
     except PyMongoError as e:
         logger.error(f"❌ Error recuperando historial para sesión {session_id}: {e}")
-        return []
+        return {"historial": [], "siguiente_cursor": None}
+
+    if ultimos:
+        docs.reverse()
 
-def recuperar_historial(session_id: str) -> list:
+    historial = []
+    for doc in docs:
+        historial.extend(_mensajes(doc))
+
+    hay_mas = bool(limit) and not ultimos and len(docs) == min(limit, LIMITE_MAXIMO_PAGINA)
+    siguiente_cursor = None
+    if hay_mas and docs[-1].get("timestamp"):
+        siguiente_cursor = {
+            "after_timestamp": docs[-1]["timestamp"].isoformat(),
+            "after_id": str(docs[-1]["_id"])
+        }
+    return {"historial": historial, "siguiente_cursor": siguiente_cursor}
+
+async def transmitir_historial(
+    session_id: str,
+    after_timestamp: Optional[datetime] = None,
+    after_id: Optional[str] = None
+) -> AsyncIterator[dict]:
     """
-    Recupera el historial completo de una sesión.
+    Recorre el historial de una sesión con un cursor asíncrono y produce los
+    mensajes uno a uno, sin cargar la sesión completa en memoria.
     """
-    return _obtener_historial_por_sesion(session_id)
+    try:
+        async for doc in _consulta_historial(session_id, after_timestamp, after_id, None, False):
+            for mensaje in _mensajes(doc):
+                yield mensaje
+    except PyMongoError as e:
+        logger.error(f"❌ Error transmitiendo historial para sesión {session_id}: {e}")
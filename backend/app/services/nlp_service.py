@@ -1,7 +1,128 @@
 import httpx
+import time
+import random
+import asyncio
 import traceback
+from typing import Optional
 from app.models.message import Message
-from app.config import NLP_GESTIONAR_URL
+from app.config import (
+    NLP_GESTIONAR_URL,
+    NLP_MAX_CONNECTIONS,
+    NLP_MAX_KEEPALIVE_CONNECTIONS,
+    NLP_KEEPALIVE_EXPIRY,
+    NLP_HTTP2,
+    NLP_CONNECT_TIMEOUT,
+    NLP_READ_TIMEOUT,
+    NLP_WRITE_TIMEOUT,
+    NLP_POOL_TIMEOUT,
+    NLP_RETRY_ATTEMPTS,
+    NLP_RETRY_BACKOFF_BASE,
+    NLP_CIRCUIT_FAILURE_THRESHOLD,
+    NLP_CIRCUIT_RESET_SECONDS
+)
+
+# Errores en los que la petición no llegó al NLP: reintentarlos no puede
+# avanzar dos veces la conversación (POST /gestionar no es idempotente)
+ERRORES_REINTENTABLES = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+class CircuitBreaker:
+    """
+    Corta las llamadas al NLP tras `umbral_fallos` fallos seguidos durante
+    `segundos_reinicio`; después deja pasar una petición de prueba (semiabierto)
+    y se cierra de nuevo si tiene éxito.
+    """
+
+    def __init__(self, umbral_fallos: int, segundos_reinicio: float):
+        self.umbral_fallos = max(1, umbral_fallos)
+        self.segundos_reinicio = segundos_reinicio
+        self.fallos_consecutivos = 0
+        self._abierto_hasta = 0.0
+        self._prueba_hasta = 0.0
+
+    @property
+    def estado(self) -> str:
+        if self.fallos_consecutivos < self.umbral_fallos:
+            return "cerrado"
+        return "abierto" if time.monotonic() < self._abierto_hasta else "semiabierto"
+
+    def permitir(self) -> bool:
+        estado = self.estado
+        if estado == "cerrado":
+            return True
+        # Una sola petición de prueba a la vez (si se pierde, se permite otra pasado el plazo)
+        ahora = time.monotonic()
+        if estado == "semiabierto" and ahora >= self._prueba_hasta:
+            self._prueba_hasta = ahora + self.segundos_reinicio
+            return True
+        return False
+
+    def registrar_exito(self) -> None:
+        self.fallos_consecutivos = 0
+        self._prueba_hasta = 0.0
+
+    def registrar_fallo(self) -> None:
+        self.fallos_consecutivos += 1
+        self._prueba_hasta = 0.0
+        if self.fallos_consecutivos >= self.umbral_fallos:
+            self._abierto_hasta = time.monotonic() + self.segundos_reinicio
+
+circuito_nlp = CircuitBreaker(NLP_CIRCUIT_FAILURE_THRESHOLD, NLP_CIRCUIT_RESET_SECONDS)
+
+# Cliente HTTP compartido durante la vida de la aplicación (ver lifespan en main.py)
+_cliente: Optional[httpx.AsyncClient] = None
+
+def _usar_http2() -> bool:
+    if not NLP_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        print("⚠️ NLP_HTTP2 activo pero el paquete 'h2' no está instalado. Se usa HTTP/1.1.")
+        return False
+
+def iniciar_cliente() -> httpx.AsyncClient:
+    """
+    Crea el cliente HTTP hacia el NLP: conexiones persistentes (keep-alive) con
+    límites y timeouts por fase configurables.
+    """
+    global _cliente
+    if _cliente is None:
+        _cliente = httpx.AsyncClient(
+            http2=_usar_http2(),
+            limits=httpx.Limits(
+                max_connections=NLP_MAX_CONNECTIONS,
+                max_keepalive_connections=NLP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=NLP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=NLP_CONNECT_TIMEOUT,
+                read=NLP_READ_TIMEOUT,
+                write=NLP_WRITE_TIMEOUT,
+                pool=NLP_POOL_TIMEOUT
+            )
+        )
+    return _cliente
+
+async def cerrar_cliente() -> None:
+    global _cliente
+    if _cliente is not None:
+        await _cliente.aclose()
+        _cliente = None
+
+async def _enviar_con_reintentos(payload: dict) -> httpx.Response:
+    """
+    Envía la petición reintentando solo los fallos previos a que el NLP la reciba,
+    con backoff exponencial y jitter para no sincronizar los reintentos.
+    """
+    cliente = iniciar_cliente()
+    for intento in range(NLP_RETRY_ATTEMPTS + 1):
+        try:
+            return await cliente.post(NLP_GESTIONAR_URL, json=payload)
+        except ERRORES_REINTENTABLES:
+            if intento == NLP_RETRY_ATTEMPTS:
+                raise
+            await asyncio.sleep(random.uniform(0, NLP_RETRY_BACKOFF_BASE * 2 ** intento))
 
 async def analizar_mensaje(mensaje: Message) -> dict:
     """
@@ -12,24 +133,33 @@ async def analizar_mensaje(mensaje: Message) -> dict:
         "mensaje_usuario": mensaje.mensaje_usuario
     }
 
+    if not circuito_nlp.permitir():
+        return _respuesta_error("Servicio NLP no disponible temporalmente. Inténtalo de nuevo en unos segundos.")
+
     try:
         print("[DEBUG] Enviando payload al NLP:", payload)
 
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.post(NLP_GESTIONAR_URL, json=payload)
-            response.raise_for_status()
-            json_data = response.json()
+        response = await _enviar_con_reintentos(payload)
+        response.raise_for_status()
+        json_data = response.json()
+        circuito_nlp.registrar_exito()
 
-            print("[DEBUG] Respuesta recibida del NLP:", json_data)
-            return json_data
+        print("[DEBUG] Respuesta recibida del NLP:", json_data)
+        return json_data
 
     except (httpx.RequestError, httpx.HTTPStatusError) as e:
+        # Los errores 4xx son de la petición, no indican que el NLP esté caído
+        if isinstance(e, httpx.RequestError) or e.response.status_code >= 500:
+            circuito_nlp.registrar_fallo()
+        else:
+            circuito_nlp.registrar_exito()
         error_msg = "Error de conexión con el NLP" if isinstance(
             e, httpx.RequestError) else "Error HTTP desde NLP"
         print(f"[ERROR NLP] {error_msg}: {str(e)}")
         return _respuesta_error(f"{error_msg}: {str(e)}")
 
     except Exception as e:
+        circuito_nlp.registrar_fallo()
         print("[ERROR NLP] Excepción inesperada:")
         traceback.print_exc()
         return _respuesta_error(f"Error inesperado procesando respuesta: {str(e)}")
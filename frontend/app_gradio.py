@@ -6,6 +6,8 @@ import os
 # ------------------- Configuración -------------------
 BACKEND_URL = os.getenv("BACKEND_URL", "http://backend:8000/api/chat")
 HISTORIAL_URL = os.getenv("HISTORIAL_URL", "http://backend:8000/api/chat/historial")
+# Interacciones recientes que se recuperan al recargar la página
+HISTORIAL_PAGINA = int(os.getenv("HISTORIAL_PAGE_SIZE", 50))
 conversacion_activa = True
 
 # ------------------- Mensaje de bienvenida -------------------
@@ -79,7 +81,12 @@ def cargar_historial(session_id):
         session_id = str(uuid.uuid4())
 
     try:
-        response = requests.get(f"{HISTORIAL_URL}?session_id={session_id}", timeout=5)
+        # Solo la última página: las sesiones largas no se descargan completas
+        response = requests.get(
+            HISTORIAL_URL,
+            params={"session_id": session_id, "limit": HISTORIAL_PAGINA, "ultimos": "true"},
+            timeout=5
+        )
         response.raise_for_status()
         historial_guardado = response.json().get("historial", [])
 
@@ -1,9 +1,26 @@
-from fastapi import FastAPI, HTTPException
+import os
+import json
+import secrets
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from core.response_generator import generar_respuesta
-from core.conversation_controller import gestionar_mensaje
+from core.response_generator import generar_respuesta_async, generar_respuestas_lote_async, TAMANO_LOTE_ANALISIS
+from core.conversation_controller import gestionar_mensaje_async
+from core.intent_detector import obtener_estadisticas_cache_intencion
+from core.redis_pool import estadisticas_pool, cerrar_pool, cerrar_pool_async
+from core.database import (
+    asegurar_indices_historial, cerrar_cliente_async, estadisticas_escritura, vaciar_escrituras_pendientes
+)
+from core.executor import cerrar_ejecutor
+from core.inference_pool import iniciar_pool_inferencia, cerrar_pool_inferencia, estadisticas_pool_inferencia
+from core.processor import get_spacy_model
+from core.report_jobs import obtener_estado_informe, cerrar_trabajos_informe
+from core.moderator import gestor_lexico
+from core.cache import estadisticas_cache, espacios_registrados, invalidar_espacio
+from core.conversation_flow import MANEJADORES_ESTADO
+from core.precomputed_suggestions import precalcular_sugerencias, estadisticas_precalculo
 
 app = FastAPI(
     title="Servicio NLP Asistente Virtual",
@@ -20,9 +37,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Máximo de mensajes aceptados en una petición a /analyze/batch
+MAX_MENSAJES_LOTE = int(os.getenv("ANALYZE_BATCH_MAX_ITEMS", 10000))
+
+# Token de las operaciones de administración (cabecera X-Admin-Token). Sin token quedan desactivadas
+TOKEN_ADMIN = os.getenv("ADMIN_TOKEN", "")
+
 # Montaje de carpeta estática para archivos PDF
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# El pool se crea en el primer hook de arranque: el fork tiene que hacerse antes de
+# cualquier inferencia en este proceso (torch/OpenMP crean sus hilos en la primera) y
+# antes de que otros hooks abran clientes con hilos propios
+@app.on_event("startup")
+async def arrancar_pool_inferencia():
+    # Los modelos ya están cargados al importar; spaCy se carga antes del fork
+    # para que los workers de inferencia compartan también sus pesos. Las respuestas
+    # sugeridas se analizan después, ya repartidas entre los workers
+    iniciar_pool_inferencia(precargar=[get_spacy_model])
+    precalcular_sugerencias(estados=MANEJADORES_ESTADO)
+
+@app.on_event("startup")
+def preparar_indices():
+    asegurar_indices_historial()
+
+@app.on_event("shutdown")
+async def liberar_conexiones():
+    cerrar_ejecutor()
+    cerrar_pool_inferencia()
+    cerrar_trabajos_informe()
+    vaciar_escrituras_pendientes()
+    cerrar_pool()
+    await cerrar_pool_async()
+    await cerrar_cliente_async()
+
 # Modelos de entrada/salida
 class MensajeEntrada(BaseModel):
     mensaje_usuario: str
@@ -43,21 +91,108 @@ async def home():
         "mensaje": "Servicio NLP activo. Usa /gestionar para conversación completa o /analyze para respuesta directa."
     }
 
+@app.get("/metricas", tags=["Sistema"])
+async def metricas():
+    return {
+        "cache_intencion": obtener_estadisticas_cache_intencion(),
+        "cache_resultados": {**estadisticas_cache(), "espacios": espacios_registrados()},
+        "redis": estadisticas_pool(),
+        "inferencia": estadisticas_pool_inferencia(),
+        "escritura_historial": estadisticas_escritura(),
+        "moderacion": gestor_lexico.estadisticas(),
+        "precalculo_sugerencias": estadisticas_precalculo()
+    }
+
 @app.post("/analyze", response_model=RespuestaSalida, tags=["Análisis emocional"])
 async def analizar(mensaje: MensajeEntrada):
-    resultado = generar_respuesta(mensaje.mensaje_usuario)
+    resultado = await generar_respuesta_async(mensaje.mensaje_usuario)
     return RespuestaSalida(
         mensaje=resultado["respuesta"],
         estado=resultado.get("estado", "fin"),
         sugerencias=resultado.get("sugerencias", [])
     )
 
+def _leer_mensajes_lote(cuerpo: bytes, tipo_contenido: str) -> list[str]:
+    """
+    Acepta JSON {"mensajes": [...]} (o directamente la lista) o NDJSON con un
+    mensaje por línea, como cadena JSON o como {"mensaje_usuario": ...}.
+    """
+    try:
+        if "ndjson" in tipo_contenido:
+            elementos = [json.loads(linea) for linea in cuerpo.decode("utf-8").splitlines() if linea.strip()]
+        else:
+            datos = json.loads(cuerpo or b"null")
+            elementos = datos.get("mensajes") if isinstance(datos, dict) else datos
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Cuerpo no válido: {e}")
+
+    if not isinstance(elementos, list):
+        raise HTTPException(status_code=422, detail="Se esperaba una lista de mensajes en 'mensajes'.")
+    if len(elementos) > MAX_MENSAJES_LOTE:
+        raise HTTPException(status_code=413, detail=f"Máximo {MAX_MENSAJES_LOTE} mensajes por petición.")
+
+    mensajes = []
+    for i, elemento in enumerate(elementos):
+        if isinstance(elemento, dict):
+            elemento = elemento.get("mensaje_usuario")
+        if not isinstance(elemento, str):
+            raise HTTPException(status_code=422, detail=f"El mensaje {i} no es texto ni tiene 'mensaje_usuario'.")
+        mensajes.append(elemento)
+    return mensajes
+
+@app.post("/analyze/batch", tags=["Análisis emocional"])
+async def analizar_lote(request: Request):
+    """
+    Analiza muchos mensajes en una sola petición. Se procesan en bloques de
+    ANALYZE_BATCH_SIZE y los resultados se devuelven en NDJSON, en el orden de
+    entrada, a medida que termina cada bloque.
+    """
+    mensajes = _leer_mensajes_lote(await request.body(), request.headers.get("content-type", ""))
+
+    async def resultados():
+        for inicio in range(0, len(mensajes), TAMANO_LOTE_ANALISIS):
+            bloque = await generar_respuestas_lote_async(mensajes[inicio:inicio + TAMANO_LOTE_ANALISIS])
+            for indice, resultado in enumerate(bloque, start=inicio):
+                yield json.dumps({
+                    "indice": indice,
+                    "mensaje": resultado["respuesta"],
+                    "estado": resultado.get("estado", "fin"),
+                    "estado_emocional": resultado["estado_emocional"],
+                    "sugerencias": resultado.get("sugerencias", [])
+                }, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(resultados(), media_type="application/x-ndjson")
+
 @app.post("/gestionar", tags=["Conversación emocional"])
 async def gestionar(payload: PayloadGestionar):
     try:
-        return gestionar_mensaje(payload.session_id, payload.mensaje_usuario)
+        return await gestionar_mensaje_async(payload.session_id, payload.mensaje_usuario)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error al procesar el mensaje: {str(e)}"
         )
+
+@app.get("/informes/{job_id}", tags=["Informes"])
+def estado_informe(job_id: str):
+    estado = obtener_estado_informe(job_id)
+    if estado is None:
+        raise HTTPException(status_code=404, detail="Informe no encontrado o caducado.")
+    return estado
+
+@app.delete("/admin/cache/{espacio}", tags=["Administración"])
+def invalidar_cache(espacio: str, solo_obsoletas: bool = False, x_admin_token: str = Header(default="")):
+    """
+    Borra de Redis las claves de un espacio de caché (SCAN + UNLINK por lotes).
+    Con solo_obsoletas=true conserva las de la huella vigente del modelo.
+    """
+    if not TOKEN_ADMIN or not secrets.compare_digest(x_admin_token.encode(), TOKEN_ADMIN.encode()):
+        raise HTTPException(status_code=403, detail="Operación no autorizada.")
+    espacios = espacios_registrados()
+    if espacio not in espacios:
+        raise HTTPException(status_code=404, detail=f"Espacio de caché desconocido. Disponibles: {sorted(espacios)}")
+
+    eliminadas = invalidar_espacio(espacio, solo_obsoletas=solo_obsoletas)
+    if eliminadas is None:
+        raise HTTPException(status_code=503, detail="Redis no disponible.")
+    return {"espacio": espacio, "huella_vigente": espacios[espacio], "eliminadas": eliminadas}
@@ -1,54 +1,340 @@
-import redis
+import os
+import re
+import time
 import hashlib
 import json
-import os
-from typing import Optional, Any
-
-# -------- Configuración de conexión con Redis --------
-REDIS_HOST = os.getenv("REDIS_HOST", "redis")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-
-try:
-    cache_client = redis.Redis(
-        host=REDIS_HOST,
-        port=REDIS_PORT,
-        decode_responses=True
-    )
-    cache_client.ping()
-except redis.exceptions.ConnectionError:
-    cache_client = None
-    print("Aviso: No se pudo conectar a Redis. La caché estará deshabilitada.")
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Optional, Any, Tuple
+from core.redis_pool import obtener_cliente, obtener_cliente_async, notificar_error
+
+# -------- Configuración de la caché en dos niveles --------
+# L1: LRU acotada en memoria de cada proceso, delante de Redis (L2). Sus entradas
+# caducan antes que las de Redis y, si Redis no está disponible, es la única caché.
+TAMANO_CACHE_LOCAL = int(os.getenv("CACHE_L1_SIZE", 4096))
+TTL_CACHE_LOCAL = float(os.getenv("CACHE_L1_TTL_SECONDS", 300))
+# Caché negativa: durante este tiempo un texto que no estaba en Redis no se vuelve
+# a consultar allí (0 = desactivada)
+TTL_CACHE_NEGATIVA = float(os.getenv("CACHE_NEGATIVE_TTL_SECONDS", 30))
+# Claves que se borran por cada SCAN al invalidar un espacio
+TAMANO_LOTE_INVALIDACION = int(os.getenv("CACHE_INVALIDATION_BATCH_SIZE", 500))
+
+REDIS_PREFIX = "cache"
+
+# Valor guardado en L1 para "se consultó Redis y no estaba"
+_AUSENTE = None
+
+
+class CacheLocal:
+    """
+    LRU con caducidad por entrada. Guarda el JSON serializado, como Redis, para
+    que quien recibe un resultado pueda modificarlo sin alterar la caché.
+    """
+
+    def __init__(self, capacidad: int, ttl: float):
+        self.capacidad = max(0, capacidad)
+        self.ttl = ttl
+        self._entradas: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obtener(self, clave: str) -> Tuple[bool, Optional[str]]:
+        """(encontrada, valor). Una entrada negativa devuelve (True, None)."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return False, None
+            if entrada[0] <= time.monotonic():
+                del self._entradas[clave]
+                return False, None
+            self._entradas.move_to_end(clave)
+            return True, entrada[1]
+
+    def guardar(self, clave: str, valor: Optional[str], ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.capacidad == 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + ttl, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+
+    def eliminar_prefijo(self, prefijo: str, excepto: Optional[str] = None) -> int:
+        with self._lock:
+            claves = [
+                clave for clave in self._entradas
+                if clave.startswith(prefijo) and not (excepto and clave.startswith(excepto))
+            ]
+            for clave in claves:
+                del self._entradas[clave]
+        return len(claves)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_local = CacheLocal(TAMANO_CACHE_LOCAL, TTL_CACHE_LOCAL)
+
+# -------- Métricas por nivel --------
+_contadores = {"consultas": 0, "l1_aciertos": 0, "l1_negativos": 0, "l2_consultas": 0, "l2_aciertos": 0}
+_lock_contadores = threading.Lock()
+
+
+def _contar(**incrementos: int) -> None:
+    with _lock_contadores:
+        for nombre, valor in incrementos.items():
+            _contadores[nombre] += valor
+
+
+def _proporcion(aciertos: int, total: int) -> float:
+    return round(aciertos / total, 4) if total else 0.0
+
+
+def estadisticas_cache() -> dict:
+    """Aciertos y proporción de aciertos de cada nivel en el proceso actual."""
+    with _lock_contadores:
+        c = dict(_contadores)
+    fallos = c["consultas"] - c["l1_aciertos"] - c["l1_negativos"] - c["l2_aciertos"]
+    return {
+        "consultas": c["consultas"],
+        "l1": {
+            "aciertos": c["l1_aciertos"],
+            "negativos": c["l1_negativos"],
+            "proporcion_aciertos": _proporcion(c["l1_aciertos"], c["consultas"]),
+            "entradas": len(cache_local),
+            "capacidad": cache_local.capacidad
+        },
+        "redis": {
+            "consultas": c["l2_consultas"],
+            "aciertos": c["l2_aciertos"],
+            "proporcion_aciertos": _proporcion(c["l2_aciertos"], c["l2_consultas"])
+        },
+        "fallos": fallos,
+        "proporcion_aciertos": _proporcion(c["l1_aciertos"] + c["l2_aciertos"], c["consultas"])
+    }
+
+
+# -------- Espacios de claves --------
+# Cada productor de resultados tiene su espacio y una huella de lo que los produce
+# (modelo, versión de la lista de moderación...). Si la huella cambia, las claves
+# antiguas dejan de leerse y caducan solas, sin vaciar el resto de Redis.
+_espacios: dict[str, Callable[[], str]] = {}
+
+
+def registrar_espacio(espacio: str, huella: Callable[[], str]) -> None:
+    """Registra un espacio de caché y la función que devuelve su huella vigente."""
+    if not re.fullmatch(r"[a-z0-9_]+", espacio):
+        raise ValueError(f"Nombre de espacio de caché no válido: {espacio!r}")
+    _espacios[espacio] = huella
+
+
+def espacios_registrados() -> dict[str, str]:
+    """Espacio -> huella vigente."""
+    return {espacio: huella() for espacio, huella in _espacios.items()}
+
+
+def _prefijo_espacio(espacio: str, vigente: bool = True) -> str:
+    if espacio not in _espacios:
+        raise KeyError(f"Espacio de caché no registrado: {espacio}")
+    if not vigente:
+        return f"{REDIS_PREFIX}:{espacio}:"
+    return f"{REDIS_PREFIX}:{espacio}:{_espacios[espacio]()}:"
+
 
 # -------- Utilidades --------
-def generar_clave_cache(texto: str) -> str:
+def normalizar_texto_cache(texto: str) -> str:
+    """Forma canónica del texto para la clave: Unicode NFC y espacios colapsados."""
+    return " ".join(unicodedata.normalize("NFC", texto).split())
+
+
+def generar_clave_cache(espacio: str, texto: str) -> str:
     """
-    Genera una clave única para la caché a partir del texto original usando SHA-256.
+    Genera la clave cache:{espacio}:{huella}:{sha256 del texto normalizado}.
     """
-    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+    return _prefijo_espacio(espacio) + hashlib.sha256(normalizar_texto_cache(texto).encode("utf-8")).hexdigest()
+
+
+def _leer_l1(clave: str) -> Tuple[bool, Optional[dict[str, Any]]]:
+    encontrada, valor = cache_local.obtener(clave)
+    if not encontrada:
+        return False, None
+    _contar(**{"l1_aciertos" if valor is not None else "l1_negativos": 1})
+    return True, json.loads(valor) if valor is not None else None
+
+
+def _tras_leer_l2(clave: str, resultado: Optional[str], pttl: int) -> Optional[dict[str, Any]]:
+    """`pttl` es la vida restante de la clave en Redis (ms; -1 sin caducidad): L1 no la supera."""
+    _contar(l2_consultas=1)
+    if resultado:
+        _contar(l2_aciertos=1)
+        cache_local.guardar(clave, resultado, pttl / 1000 if pttl >= 0 else None)
+        return json.loads(resultado)
+    cache_local.guardar(clave, _AUSENTE, TTL_CACHE_NEGATIVA)
+    return None
+
 
 # -------- Funciones de lectura y escritura en caché --------
-def obtener_cache(texto: str) -> Optional[dict[str, Any]]:
+def obtener_cache(texto: str, *, espacio: str) -> Optional[dict[str, Any]]:
     """
-    Recupera una respuesta almacenada en la caché si existe.
+    Recupera una respuesta almacenada en la caché si existe (primero en memoria, luego en Redis).
     """
+    _contar(consultas=1)
+    clave = generar_clave_cache(espacio, texto)
+    encontrada, valor = _leer_l1(clave)
+    if encontrada:
+        return valor
+
+    cache_client = obtener_cliente()
     if not cache_client:
         return None
     try:
-        clave = generar_clave_cache(texto)
-        resultado = cache_client.get(clave)
-        return json.loads(resultado) if resultado else None
+        pipe = cache_client.pipeline(transaction=False)
+        pipe.get(clave)
+        pipe.pttl(clave)
+        return _tras_leer_l2(clave, *pipe.execute())
     except Exception as e:
+        notificar_error(e)
         print(f"Error al obtener desde caché: {e}")
         return None
 
-def guardar_cache(texto: str, resultado: dict, expiracion_segundos: int = 3600) -> None:
+def guardar_cache(texto: str, resultado: dict, expiracion_segundos: int = 3600, *, espacio: str) -> None:
     """
     Guarda un resultado en caché para el texto dado, con una expiración opcional.
     """
+    clave = generar_clave_cache(espacio, texto)
+    valor = json.dumps(resultado)
+    cache_local.guardar(clave, valor, expiracion_segundos)
+
+    cache_client = obtener_cliente()
+    if not cache_client:
+        return
+    try:
+        cache_client.set(clave, valor, ex=expiracion_segundos)
+    except Exception as e:
+        notificar_error(e)
+        print(f"Error al guardar en caché: {e}")
+
+# -------- Versiones asíncronas (redis.asyncio) --------
+async def obtener_cache_async(texto: str, *, espacio: str) -> Optional[dict[str, Any]]:
+    _contar(consultas=1)
+    clave = generar_clave_cache(espacio, texto)
+    encontrada, valor = _leer_l1(clave)
+    if encontrada:
+        return valor
+
+    cache_client = obtener_cliente_async()
+    if not cache_client:
+        return None
+    try:
+        async with cache_client.pipeline(transaction=False) as pipe:
+            pipe.get(clave)
+            pipe.pttl(clave)
+            return _tras_leer_l2(clave, *await pipe.execute())
+    except Exception as e:
+        notificar_error(e)
+        print(f"Error al obtener desde caché: {e}")
+        return None
+
+async def guardar_cache_async(texto: str, resultado: dict, expiracion_segundos: int = 3600, *, espacio: str) -> None:
+    clave = generar_clave_cache(espacio, texto)
+    valor = json.dumps(resultado)
+    cache_local.guardar(clave, valor, expiracion_segundos)
+
+    cache_client = obtener_cliente_async()
     if not cache_client:
         return
     try:
-        clave = generar_clave_cache(texto)
-        cache_client.set(clave, json.dumps(resultado), ex=expiracion_segundos)
+        await cache_client.set(clave, valor, ex=expiracion_segundos)
     except Exception as e:
+        notificar_error(e)
         print(f"Error al guardar en caché: {e}")
+
+# -------- Lotes: una sola ida y vuelta a Redis para muchos textos --------
+async def obtener_cache_lote_async(textos: list[str], *, espacio: str) -> list[Optional[dict[str, Any]]]:
+    _contar(consultas=len(textos))
+    resultados: list[Optional[dict[str, Any]]] = [None] * len(textos)
+    claves_pendientes = {}
+    for i, texto in enumerate(textos):
+        clave = generar_clave_cache(espacio, texto)
+        encontrada, valor = _leer_l1(clave)
+        if encontrada:
+            resultados[i] = valor
+        else:
+            claves_pendientes.setdefault(clave, []).append(i)
+
+    cache_client = obtener_cliente_async()
+    if not cache_client or not claves_pendientes:
+        return resultados
+    try:
+        claves = list(claves_pendientes)
+        async with cache_client.pipeline(transaction=False) as pipe:
+            pipe.mget(claves)
+            for clave in claves:
+                pipe.pttl(clave)
+            valores, *pttls = await pipe.execute()
+        for clave, valor, pttl in zip(claves, valores, pttls):
+            resultado = _tras_leer_l2(clave, valor, pttl)
+            # Los textos repetidos del lote comparten una sola consulta a Redis
+            repetidos = len(claves_pendientes[clave]) - 1
+            _contar(l2_consultas=repetidos, l2_aciertos=repetidos if resultado is not None else 0)
+            for i in claves_pendientes[clave]:
+                resultados[i] = resultado
+        return resultados
+    except Exception as e:
+        notificar_error(e)
+        print(f"Error al obtener lote desde caché: {e}")
+        return resultados
+
+async def guardar_cache_lote_async(resultados: dict[str, dict], expiracion_segundos: int = 3600, *, espacio: str) -> None:
+    valores = {generar_clave_cache(espacio, texto): json.dumps(resultado) for texto, resultado in resultados.items()}
+    for clave, valor in valores.items():
+        cache_local.guardar(clave, valor, expiracion_segundos)
+
+    cache_client = obtener_cliente_async()
+    if not cache_client or not valores:
+        return
+    try:
+        async with cache_client.pipeline(transaction=False) as pipe:
+            for clave, valor in valores.items():
+                pipe.set(clave, valor, ex=expiracion_segundos)
+            await pipe.execute()
+    except Exception as e:
+        notificar_error(e)
+        print(f"Error al guardar lote en caché: {e}")
+
+
+# -------- Invalidación --------
+def invalidar_espacio(espacio: str, solo_obsoletas: bool = False) -> Optional[int]:
+    """
+    Borra las claves de un espacio con SCAN + UNLINK por lotes (sin bloquear Redis
+    como KEYS o FLUSHALL). Con `solo_obsoletas` conserva las de la huella vigente.
+    Devuelve cuántas claves se han borrado en Redis, o None si no está disponible.
+    La L1 de los demás procesos se vacía sola al caducar sus entradas.
+    """
+    prefijo = _prefijo_espacio(espacio, vigente=False)
+    vigente = _prefijo_espacio(espacio) if solo_obsoletas else None
+    cache_local.eliminar_prefijo(prefijo, excepto=vigente)
+
+    cache_client = obtener_cliente()
+    if not cache_client:
+        return None
+    eliminadas = 0
+    try:
+        cursor = 0
+        while True:
+            cursor, claves = cache_client.scan(cursor, match=f"{prefijo}*", count=TAMANO_LOTE_INVALIDACION)
+            if vigente:
+                claves = [clave for clave in claves if not clave.startswith(vigente)]
+            if claves:
+                eliminadas += cache_client.unlink(*claves)
+            if cursor == 0:
+                return eliminadas
+    except Exception as e:
+        notificar_error(e)
+        print(f"Error al invalidar el espacio de caché {espacio}: {e}")
+        return None
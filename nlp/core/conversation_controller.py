@@ -5,6 +5,10 @@ from core.conversation_state import (
     borrar_estado_usuario
 )
 from core.conversation_flow import procesar_mensaje
+from core.inference_context import contexto_inferencia
+from core.session_store import sesion_turno, sesion_turno_async
+from core.database import escrituras_agrupadas_async
+from core.executor import ejecutar_en_hilo
 
 ESTADO_INICIAL = "presentacion"
 ESTADO_FINAL = "fin"
@@ -12,9 +16,10 @@ ESTADO_FINAL = "fin"
 def gestionar_mensaje(session_id: str, texto_usuario: str) -> Dict:
     """
     Controlador principal de la conversación.
-    1. Recupera el estado actual del usuario desde Redis (si existe).
+    1. Recupera el estado actual del usuario desde Redis (si existe) en una sola lectura.
     2. Procesa el mensaje recibido con base en el estado actual.
-    3. Guarda o elimina el nuevo estado según si la conversación continúa o finaliza.
+    3. Guarda o elimina el nuevo estado según si la conversación continúa o finaliza
+       (todos los cambios del turno se escriben en una única transacción).
     4. Devuelve la respuesta que debe mostrar el asistente.
     """
     if not session_id:
@@ -24,6 +29,31 @@ def gestionar_mensaje(session_id: str, texto_usuario: str) -> Dict:
             "sugerencias": []
         }
 
+    # Estado y puntuaciones se leen de Redis una vez al empezar el turno y se
+    # escriben juntos al terminar (ver core.session_store)
+    with sesion_turno(session_id):
+        return _procesar_turno(session_id, texto_usuario)
+
+
+async def gestionar_mensaje_async(session_id: str, texto_usuario: str) -> Dict:
+    """
+    Versión asíncrona de gestionar_mensaje(): la sesión se lee y se vuelca con
+    redis.asyncio, las escrituras en MongoDB del turno se agrupan en un insert_many
+    asíncrono y el procesamiento (modelos) se ejecuta en el ejecutor acotado.
+    """
+    if not session_id:
+        return {
+            "estado": ESTADO_FINAL,
+            "mensaje": "❌ Sesión inválida.",
+            "sugerencias": []
+        }
+
+    async with sesion_turno_async(session_id), escrituras_agrupadas_async():
+        return await ejecutar_en_hilo(_procesar_turno, session_id, texto_usuario)
+
+
+def _procesar_turno(session_id: str, texto_usuario: str) -> Dict:
+    """Cuerpo de un turno; requiere una sesión abierta con sesion_turno()."""
     # Recuperar o inicializar el estado del usuario
     estado_usuario = obtener_estado_usuario(session_id)
 
@@ -36,10 +66,11 @@ def gestionar_mensaje(session_id: str, texto_usuario: str) -> Dict:
     estado_actual = estado_usuario.get("estado_actual", ESTADO_INICIAL)
     datos_guardados = estado_usuario.get("datos_guardados", {})
 
-    # Procesar mensaje y obtener respuesta
-    respuesta, datos_guardados_actualizados = procesar_mensaje(
-        session_id, texto_usuario, estado_actual, datos_guardados
-    )
+    # Procesar mensaje y obtener respuesta (cada texto se analiza una sola vez por turno)
+    with contexto_inferencia():
+        respuesta, datos_guardados_actualizados = procesar_mensaje(
+            session_id, texto_usuario, estado_actual, datos_guardados
+        )
 
     # Actualizar o eliminar el estado según el nuevo estado
     nuevo_estado = respuesta.get("estado")
@@ -1,7 +1,7 @@
-from typing import Tuple
+from typing import Optional, Tuple
 from core import dialog_manager
-from core.emotion_model import analizar_sentimiento
-from core.cache import obtener_cache, guardar_cache
+from core.emotion_model import analizar_sentimiento, HUELLA_MODELO_EMOCION
+from core.cache import registrar_espacio, obtener_cache, guardar_cache
 from core.intent_detector import detectar_intencion
 from core.score_manager import (
     asignar_puntuacion,
@@ -15,25 +15,44 @@ from core.empathy_utils import (
     generar_respuesta_empatica,
     detectar_ambiguedad_identidad
 )
-from core.database import guardar_interaccion_completa, generar_pdf_informe
+from core.database import guardar_interaccion_completa
 from core.cleaner import limpiar_texto
 from core.security import anonimizar_texto
 from utils.extract_name import extraer_nombre
-from core.pdf_utils import construir_interacciones_para_pdf
-import os
+from core.report_jobs import encolar_informe
+from core import precomputed_suggestions as precalculo
 import re
 
-def detectar_emocion(texto_usuario: str) -> str:
+# Los resultados del modelo de emociones se guardan aparte de las respuestas de /analyze
+ESPACIO_CACHE_EMOCION = "emocion"
+registrar_espacio(ESPACIO_CACHE_EMOCION, lambda: HUELLA_MODELO_EMOCION)
+
+def _emocion_con_cache(texto_usuario: str) -> dict:
     """
-    Detecta la emoción principal del texto, usando caché si está disponible.
+    Resultado del modelo de emociones, usando la caché (memoria del proceso y Redis).
     """
-    cached = obtener_cache(texto_usuario)
+    cached = obtener_cache(texto_usuario, espacio=ESPACIO_CACHE_EMOCION)
     if cached and "estado_emocional" in cached:
-        return cached["estado_emocional"]
+        return cached
 
     resultado = analizar_sentimiento(texto_usuario)
-    guardar_cache(texto_usuario, resultado)
-    return resultado.get("estado_emocional", "neutral")
+    # Un fallo del modelo no se guarda: el siguiente mensaje igual lo vuelve a intentar
+    if resultado.get("estado_emocional") != "error":
+        guardar_cache(texto_usuario, resultado, espacio=ESPACIO_CACHE_EMOCION)
+    return resultado
+
+def _resultado_emocional(texto_usuario: str) -> dict:
+    """
+    Las respuestas sugeridas se analizaron al arrancar y no llegan al modelo;
+    el resto pasa por la caché antes de llamarlo.
+    """
+    return precalculo.consultar(precalculo.EMOCION, texto_usuario, _emocion_con_cache)
+
+def detectar_emocion(texto_usuario: str) -> str:
+    """
+    Detecta la emoción principal del texto, usando caché si está disponible.
+    """
+    return _resultado_emocional(texto_usuario).get("estado_emocional", "neutral")
 
 # ---------------- Constantes ----------------
 FIN = "fin"
@@ -79,1513 +98,914 @@ ESTADOS_DIALOG_MANAGER = {
 }
 
 
+# ---------------- Utilidades comunes de los manejadores ----------------
+def _analizar_emocion(texto_usuario: str) -> Tuple[str, str]:
+    resultado_emocional = _resultado_emocional(texto_usuario)
+    emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
+    confianza = resultado_emocional.get("confianza", "0%")
+    return emocion, confianza
 
-def procesar_mensaje(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
-    # Validación de mensaje vacío
-    if not texto_usuario or not texto_usuario.strip():
-        respuesta_base_fn = ESTADOS_DIALOG_MANAGER.get(estado_actual)
-        if respuesta_base_fn:
-            try:
-                base = respuesta_base_fn(datos_guardados)
-            except TypeError:
-                base = respuesta_base_fn()
-            return {
-                "estado": estado_actual,
-                "mensaje": "Por favor, selecciona una opción o escribe algo antes de continuar.",
-                "modo_entrada": base.get("modo_entrada", "texto_libre"),
-                "sugerencias": base.get("sugerencias", [])
-            }, datos_guardados
-
-        return {
-            "estado": estado_actual,
-            "mensaje": "Por favor, escribe algo antes de continuar.",
-            "modo_entrada": "mixto",
-            "sugerencias": []
-        }, datos_guardados
-
-    # Fase de presentación
-    if estado_actual == "presentacion":
-        respuesta = dialog_manager.obtener_mensaje_presentacion()
-        respuesta["estado"] = "consentimiento"
-        return respuesta, datos_guardados
-
-    # Fase de consentimiento
-    if estado_actual == "consentimiento":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria("consentimiento"), datos_guardados
-
-        respuestas_negativas_explicitamente = [
-            "no", "no quiero continuar", "no, prefiero no continuar",
-            "prefiero no continuar", "no deseo continuar"
-        ]
-        if texto_usuario.strip().lower() in respuestas_negativas_explicitamente:
-            respuesta = dialog_manager.obtener_mensaje_consentimiento_rechazado()
-            return respuesta, datos_guardados
-
-        intencion = detectar_intencion(texto_usuario)
-
-        if intencion == "afirmativo":
-            datos_guardados["consentimiento"] = texto_usuario
-            datos_guardados["consentimiento_aceptado"] = True
-            guardar_interaccion_completa(
-                session_id=session_id,
-                estado=estado_actual,
-                pregunta="¿Estás de acuerdo en continuar con esta evaluación emocional?",
-                respuesta_usuario=texto_usuario
-            )
-            respuesta = dialog_manager.obtener_mensaje_nombre()
-            respuesta["estado"] = "preguntar_nombre"
-
-        elif intencion == "negativo":
-            respuesta = dialog_manager.obtener_mensaje_consentimiento_rechazado()
-
-        else:
-            respuesta = dialog_manager.obtener_mensaje_presentacion()
-            respuesta["estado"] = "consentimiento"
 
-        return respuesta, datos_guardados
+def _guardar_turno(**campos) -> None:
+    """
+    Guarda la interacción con la emoción ya resuelta (tabla precalculada, caché o memo
+    del turno) para que la capa de datos no vuelva a pasar la respuesta por el modelo.
+    """
+    if campos.get("emocion") is None or campos.get("confianza") is None:
+        campos["emocion"], campos["confianza"] = _analizar_emocion(campos["respuesta_usuario"])
+    guardar_interaccion_completa(**campos)
 
-    # Fase de nombre
-    if estado_actual == "preguntar_nombre":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        nombre_usuario = extraer_nombre(texto_usuario)
-        datos_guardados["nombre_usuario"] = nombre_usuario
-        datos_guardados["preguntar_nombre"] = nombre_usuario
+# Intención, ambigüedad y limpieza, consultando antes la tabla de respuestas sugeridas
+def _detectar_intencion(texto: str) -> str:
+    return precalculo.consultar(precalculo.INTENCION, texto, detectar_intencion)
 
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Con qué nombre o seudónimo puedo dirigirme a ti?",
-            respuesta_usuario=nombre_usuario
-        )
 
-        respuesta = dialog_manager.obtener_mensaje_identidad(nombre_usuario)
-        respuesta["estado"] = "preguntar_identidad"
-        return respuesta, datos_guardados
+def _es_ambigua(texto: str) -> bool:
+    return precalculo.consultar(precalculo.AMBIGUEDAD, texto, detectar_ambiguedad)
 
-    # --- Preguntar identidad ---
-    if estado_actual == "preguntar_identidad":
-        texto_limpio = texto_usuario.strip().lower()
 
-        # Detectar ambigüedad general o ambigüedad específica de identidad
-        if detectar_ambiguedad(texto_limpio) or detectar_ambiguedad_identidad(texto_limpio):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+def _limpiar(texto: str) -> str:
+    return precalculo.consultar(precalculo.LIMPIEZA, texto, limpiar_texto)
 
-        # Mapeo de respuestas comunes a etiquetas estandarizadas
-        MAPEO_IDENTIDAD = {
-            "masculino": "masculino",
-            "hombre": "masculino",
-            "femenino": "femenino",
-            "mujer": "femenino",
-            "no binario": "no binario",
-            "nobinario": "no binario",
-            "no-binario": "no binario"
-        }
 
-        identidad = MAPEO_IDENTIDAD.get(texto_limpio, texto_limpio)  # Usar tal cual si no está mapeada
+def _respuesta_siguiente(siguiente: dict, mensaje: str) -> dict:
+    return {
+        "estado": siguiente["estado"],
+        "mensaje": mensaje,
+        "modo_entrada": siguiente["modo_entrada"],
+        "sugerencias": siguiente.get("sugerencias", [])
+    }
 
-        # Guardamos ambas versiones
-        datos_guardados["identidad"] = identidad
-        datos_guardados["identidad_original"] = texto_usuario
-        datos_guardados["preguntar_identidad"] = texto_usuario
 
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Qué etiqueta identifica mejor tu identidad?",
-            respuesta_usuario=texto_usuario
-        )
+def _puntuacion_por_intencion(texto_usuario: str, depurar: bool = False) -> Optional[int]:
+    """1 si la intención es afirmativa, 0 si es negativa y None si no se reconoce."""
+    intencion = _detectar_intencion(texto_usuario)
+    if depurar:
+        print(f"[DEBUG] Intención detectada: {intencion}")
+    if intencion == "afirmativo":
+        return 1
+    if intencion == "negativo":
+        return 0
+    return None
+
+
+# ---------------- Tablas de opciones (se construyen una sola vez) ----------------
+RESPUESTAS_NEGATIVAS_CONSENTIMIENTO = frozenset({
+    "no", "no quiero continuar", "no, prefiero no continuar",
+    "prefiero no continuar", "no deseo continuar"
+})
+
+# Mapeo de respuestas comunes a etiquetas estandarizadas
+MAPEO_IDENTIDAD = {
+    "masculino": "masculino",
+    "hombre": "masculino",
+    "femenino": "femenino",
+    "mujer": "femenino",
+    "no binario": "no binario",
+    "nobinario": "no binario",
+    "no-binario": "no binario"
+}
 
-        nombre = datos_guardados.get("nombre_usuario", "")
-        respuesta = dialog_manager.obtener_mensaje_exploracion_tristeza(nombre)
-        respuesta["estado"] = "inicio_exploracion_tristeza"
-        return respuesta, datos_guardados
+OPCIONES_FRECUENCIA_VALIDAS = frozenset(limpiar_texto(opcion) for opcion in (
+    "Todos los días",
+    "Casi todos los días",
+    "Muy seguido",
+    "A menudo",
+    "Algunas veces por semana",
+    "De vez en cuando",
+    "Con poca frecuencia",
+    "Pocas veces",
+    "Casi nunca",
+    "Nunca"
+))
+
+OPCIONES_DURACION_VALIDAS = frozenset(limpiar_texto(opcion) for opcion in (
+    "Momentos puntuales",
+    "Unas horas",
+    "Más de 6 horas",
+    "Un día o más",
+    "Entre tres y cinco días",
+    "Una semana",
+    "Poco más de una semana",
+    "Dos semanas",
+    "Varias semanas",
+    "Un mes o más"
+))
+
+# Números del 1 al 10 como texto
+OPCIONES_INTENSIDAD_VALIDAS = frozenset(str(i) for i in range(1, 11))
+
+RESPUESTAS_AFIRMATIVAS_ANHEDONIA = frozenset({"Sí, he perdido interés"})
+RESPUESTAS_NEGATIVAS_ANHEDONIA = frozenset({"No, sigo disfrutando igual"})
+
+# Mapa exacto de respuestas válidas de ideación suicida
+MAPA_IDEACION_SUICIDA = {
+    "No, en ningún momento": 0,
+    "Sí, pero sin intención de hacerme daño": 1,
+    "Sí, pensé en hacerme daño, pero no tengo intención": 2,
+    "Sí, pensé en hacerme daño y tengo un plan": 3,
+    "No entiendo la pregunta": None
+}
 
+MENSAJES_IDEACION_SUICIDA = {
+    0: (
+        "Gracias por tu respuesta. Me alegra saber que no has tenido pensamientos de ese tipo últimamente.\n\n"
+        "Es importante reconocer estos momentos en los que nos sentimos emocionalmente estables."
+    ),
+    1: (
+        "Gracias por compartir algo tan delicado. No estás solo/a en sentirte así en ciertos momentos.\n\n"
+        "Reconocer estos pensamientos, incluso sin intención, ya es un paso importante para cuidar tu salud emocional."
+    ),
+    2: (
+        "Gracias por tu sinceridad. Entiendo que compartir esto no es fácil.\n\n"
+        "Si en algún momento estos pensamientos se vuelven más intensos o difíciles de manejar, por favor considera hablar con un profesional de salud mental.\n"
+        "Tu bienestar es muy importante. Seguimos adelante sin presión."
+    )
+}
 
-    # ------------ APARTADO TRISTEZA -------------------
-    # --- Inicio de exploración emocional (tristeza) ---
-    if estado_actual == "inicio_exploracion_tristeza":
-        texto_limpio = limpiar_texto(texto_usuario)
 
-        # Detectar ambigüedad general
-        if detectar_ambiguedad(texto_limpio):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+# ---------------- Estados de escala (sugerencias cerradas y puntuación por tipo) ----------------
+# estado -> tipo de puntuación, clave en datos_guardados, opciones válidas, pregunta y siguiente mensaje
+ESTADOS_ESCALA = {
+    "preguntar_frecuencia": {
+        "tipo": "frecuencia",
+        "clave": "frecuencia_tristeza",
+        "opciones": OPCIONES_FRECUENCIA_VALIDAS,
+        "pregunta": "¿Con qué frecuencia sueles experimentar tristeza?",
+        "siguiente": dialog_manager.obtener_mensaje_duracion_tristeza,
+        "estado_siguiente": "preguntar_duracion"
+    },
+    "preguntar_duracion": {
+        "tipo": "duracion",
+        "clave": "duracion_tristeza",
+        "opciones": OPCIONES_DURACION_VALIDAS,
+        "pregunta": "¿Cuánto tiempo dura generalmente esa tristeza?",
+        "siguiente": dialog_manager.obtener_mensaje_intensidad_tristeza,
+        "estado_siguiente": "intensidad_tristeza"
+    },
+    "intensidad_tristeza": {
+        "tipo": "intensidad",
+        "clave": "intensidad_tristeza",
+        "opciones": OPCIONES_INTENSIDAD_VALIDAS,
+        "pregunta": "Cuando sientes tristeza, ¿cómo de intensa es?",
+        "siguiente": dialog_manager.obtener_mensaje_anhedonia,
+        "estado_siguiente": "preguntar_anhedonia"
+    }
+}
 
-        # Detectar intención (afirmativa, negativa, desconocida)
-        intencion = detectar_intencion(texto_limpio)
 
-        if intencion == "desconocido" and detectar_ambiguedad(texto_limpio):
+def _manejador_escala(spec: dict):
+    def manejar(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+        if _limpiar(texto_usuario) not in spec["opciones"]:
             return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        # Detectar emoción solo si la intención es afirmativa
-        if intencion == "afirmativo":
-            resultado_emocional = analizar_sentimiento(texto_usuario)
-            emocion_detectada = resultado_emocional.get("estado_emocional", "neutral").lower()
-            confianza_emocion = resultado_emocional.get("confianza", "0%")
-        else:
-            emocion_detectada = "neutral"
-            confianza_emocion = "100%"
-
-        # Asignar puntuación según intención
-        if intencion == "afirmativo":
-            puntuacion = 1
-        elif intencion == "negativo":
-            puntuacion = 0
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+        emocion, confianza = _analizar_emocion(texto_usuario)
 
-        # Guardar respuesta, emoción y puntuación
-        datos_guardados["respuesta_tristeza"] = texto_usuario
-        datos_guardados["emocion_tristeza"] = emocion_detectada
-        datos_guardados["confianza_emocion_tristeza"] = confianza_emocion
-        datos_guardados["puntuacion_tristeza"] = puntuacion
+        puntuacion = calcular_puntuacion(spec["tipo"], texto_usuario)
+        asignar_puntuacion(session_id, spec["tipo"], texto_usuario)
 
-        asignar_puntuacion(session_id, "tristeza", str(puntuacion))
+        # Claves coherentes con el PDF
+        clave = spec["clave"]
+        datos_guardados[clave] = texto_usuario
+        datos_guardados[f"emocion_{clave}"] = emocion
+        datos_guardados[f"confianza_emocion_{clave}"] = confianza
+        datos_guardados[f"puntuacion_{clave}"] = puntuacion
 
-        guardar_interaccion_completa(
+        _guardar_turno(
             session_id=session_id,
             estado=estado_actual,
-            pregunta="¿Has experimentado tristeza recientemente?",
+            pregunta=spec["pregunta"],
             respuesta_usuario=texto_usuario,
             puntuacion=puntuacion
         )
 
-        # Construir respuesta según intención detectada
-        if intencion == "afirmativo":
-            respuesta_base = dialog_manager.obtener_mensaje_frecuencia_tristeza()
-            respuesta = {
-                "estado": "preguntar_frecuencia",
-                "mensaje": generar_respuesta_empatica(respuesta_base["mensaje"], tipo="tristeza"),
-                "modo_entrada": respuesta_base.get("modo_entrada", "texto_libre"),
-                "sugerencias": respuesta_base.get("sugerencias", [])
-            }
-
-        elif intencion == "negativo":
-            respuesta_base = dialog_manager.obtener_mensaje_anhedonia()
-            respuesta = {
-                "estado": "preguntar_anhedonia",
-                "mensaje": respuesta_base["mensaje"],
-                "modo_entrada": respuesta_base.get("modo_entrada", "texto_libre"),
-                "sugerencias": respuesta_base.get("sugerencias", [])
-            }
-
-        return respuesta, datos_guardados
-
+        respuesta_base = spec["siguiente"]()
+        return {
+            "estado": spec["estado_siguiente"],
+            "mensaje": respuesta_base["mensaje"],
+            "modo_entrada": respuesta_base.get("modo_entrada", "texto_libre"),
+            "sugerencias": respuesta_base.get("sugerencias", [])
+        }, datos_guardados
 
+    return manejar
+
+
+# ---------------- Estados binarios (sugerencias exactas o intención) ----------------
+# "mapa" puntúa las sugerencias exactas tras aplicar "normalizar"; si no hay puntuación se
+# recurre a la intención. Con "intencion_solo_fuera_del_mapa" una sugerencia sin puntuación
+# ("No estoy seguro") no consulta la intención y termina en aclaración tras guardarse.
+# "transiciones" asocia cada puntuación con el siguiente mensaje y su introducción.
+ESTADOS_BINARIOS = {
+    "preguntar_fatiga": {
+        "clave": "fatiga",
+        "pregunta": "¿Has notado últimamente que te falta energía o te cansas con más facilidad de lo habitual?",
+        "mapa": {},
+        "transiciones": {
+            1: (
+                dialog_manager.obtener_mensaje_sueno,
+                "Gracias por contármelo. Sentirse con menos energía es algo que muchas personas experimentan en momentos difíciles."
+            ),
+            0: (
+                dialog_manager.obtener_mensaje_sueno,
+                "Entiendo, es una buena señal que mantengas tu nivel de energía habitual."
+            )
+        }
+    },
+    "preguntar_sueno": {
+        "clave": "sueno",
+        "pregunta": "¿Has notado últimamente cambios o dificultades con tu sueño?",
+        "normalizar": lambda texto: texto.strip().lower(),
+        "mapa": {
+            "sí, he notado cambios": 1,
+            "si, he notado cambios": 1,
+            "no, duermo bien": 0,
+            "no estoy seguro": None
+        },
+        "intencion_solo_fuera_del_mapa": True,
+        "transiciones": {
+            1: (
+                dialog_manager.obtener_detalle_sueno,
+                "Gracias por compartirlo. Los cambios en el sueño pueden tener un gran impacto en cómo nos sentimos durante el día."
+            ),
+            0: (
+                dialog_manager.obtener_mensaje_apetito,
+                "Me alegra saber que estás durmiendo bien. Un buen descanso es esencial para el bienestar emocional.\n\n"
+                "Ahora, vamos a hablar un momento sobre tu apetito."
+            )
+        }
+    },
+    "preguntar_apetito": {
+        "clave": "apetito",
+        "pregunta": "¿Has notado cambios en tu apetito o en la cantidad de comida que tomas?",
+        "mapa": {
+            "sí, he notado cambios": 1,
+            "no, como normal": 0,
+            "no estoy seguro": None
+        },
+        "depurar": True,
+        "transiciones": {
+            1: (
+                dialog_manager.obtener_detalle_apetito,
+                "Gracias por compartirlo. Los cambios en el apetito pueden ser una señal importante de cómo nos sentimos."
+            ),
+            0: (
+                dialog_manager.obtener_mensaje_concentracion,
+                "Está bien, comer con normalidad es una buena señal."
+            )
+        }
+    },
+    "preguntar_concentracion": {
+        "clave": "concentracion",
+        "pregunta": "¿Te ha costado concentrarte en actividades como leer, trabajar o seguir una conversación?",
+        "mapa": {
+            "sí, me cuesta concentrarme": 1,
+            "no, me concentro bien": 0,
+            "no estoy seguro": None
+        },
+        "depurar": True,
+        "transiciones": {
+            1: (
+                dialog_manager.obtener_detalle_concentracion,
+                "Gracias por compartirlo. Es común que la falta de concentración acompañe a estados emocionales bajos."
+            ),
+            0: (
+                dialog_manager.obtener_mensaje_agitacion,
+                "Está bien, mantener una buena concentración es un buen indicador de estabilidad."
+            )
+        }
+    },
+    "preguntar_agitacion": {
+        "clave": "agitacion",
+        "pregunta": "¿Has notado que últimamente sientes inquietud o agitación?",
+        "mapa": {
+            "sí, me siento inquieto": 1,
+            "no, estoy tranquilo": 0,
+            "no estoy seguro": None
+        },
+        "depurar": True,
+        "transiciones": {
+            1: (
+                dialog_manager.obtener_detalle_agitacion,
+                "Gracias por compartirlo. A veces la inquietud puede ser difícil de explicar pero importante de reconocer."
+            ),
+            0: (
+                dialog_manager.obtener_mensaje_antecedentes_generales,
+                "Me alegra saber que no has notado inquietud últimamente."
+            )
+        }
+    },
+    "preguntar_impacto_diario": {
+        "clave": "impacto_diario",
+        "pregunta": "¿Dirías que estos sentimientos han afectado tu vida diaria? Por ejemplo, en el trabajo, estudios, relaciones sociales o bienestar personal.",
+        "mapa": {
+            "sí, ha afectado mi vida diaria": 1,
+            "no, no ha afectado mi vida diaria": 0,
+            "no estoy seguro": None
+        },
+        "depurar": True,
+        "transiciones": {
+            1: (
+                dialog_manager.obtener_detalle_impacto_diario,
+                "Gracias por compartirlo. Es importante identificar las áreas en las que estos sentimientos nos afectan."
+            ),
+            0: (
+                dialog_manager.obtener_mensaje_estrategias_1,
+                "Entiendo. Me alegra saber que no está teniendo un gran impacto en tu día a día."
+            )
+        }
+    }
+}
 
-    # --- Preguntar frecuencia de tristeza ---
-    if estado_actual == "preguntar_frecuencia":
-        texto_limpio = limpiar_texto(texto_usuario)
 
-        # Lista de sugerencias permitidas
-        OPCIONES_FRECUENCIA_VALIDAS = {
-            limpiar_texto("Todos los días"),
-            limpiar_texto("Casi todos los días"),
-            limpiar_texto("Muy seguido"),
-            limpiar_texto("A menudo"),
-            limpiar_texto("Algunas veces por semana"),
-            limpiar_texto("De vez en cuando"),
-            limpiar_texto("Con poca frecuencia"),
-            limpiar_texto("Pocas veces"),
-            limpiar_texto("Casi nunca"),
-            limpiar_texto("Nunca")
-        }
+def _manejador_binario(spec: dict):
+    normalizar = spec.get("normalizar", limpiar_texto)
+    mapa = {normalizar(opcion): valor for opcion, valor in spec["mapa"].items()}
+    solo_fuera_del_mapa = spec.get("intencion_solo_fuera_del_mapa", False)
+    depurar = spec.get("depurar", False)
 
-        if texto_limpio not in OPCIONES_FRECUENCIA_VALIDAS:
+    def manejar(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+        if _es_ambigua(texto_usuario):
             return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        # Detectar emoción
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion_detectada = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza_emocion = resultado_emocional.get("confianza", "0%")
+        texto_normalizado = normalizar(texto_usuario)
+
+        # Intento 1: sugerencia exacta. Intento 2: inferencia por intención
+        puntuacion = mapa.get(texto_normalizado)
+        if puntuacion is None and not (solo_fuera_del_mapa and texto_normalizado in mapa):
+            puntuacion = _puntuacion_por_intencion(texto_usuario, depurar)
+            if puntuacion is None:
+                return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        # Calcular puntuación
-        puntuacion_frecuencia = calcular_puntuacion("frecuencia", texto_usuario)
-        asignar_puntuacion(session_id, "frecuencia", texto_usuario)
+        if depurar:
+            print(f"[DEBUG] Puntuación final asignada: {puntuacion}")
 
-        # Base para claves coherentes con el PDF
-        base_clave = "frecuencia_tristeza"
+        emocion, confianza = _analizar_emocion(texto_usuario)
 
-        # Guardar información en memoria
-        datos_guardados[base_clave] = texto_usuario
-        datos_guardados[f"emocion_{base_clave}"] = emocion_detectada
-        datos_guardados[f"confianza_emocion_{base_clave}"] = confianza_emocion
-        datos_guardados[f"puntuacion_{base_clave}"] = puntuacion_frecuencia
+        clave = spec["clave"]
+        datos_guardados[f"puntuacion_{clave}"] = puntuacion
+        datos_guardados[f"{clave}_texto"] = texto_usuario
+        datos_guardados[f"emocion_{clave}"] = emocion
+        datos_guardados[f"confianza_emocion_{clave}"] = confianza
 
-        # Guardar en base de datos
-        guardar_interaccion_completa(
+        _guardar_turno(
             session_id=session_id,
             estado=estado_actual,
-            pregunta="¿Con qué frecuencia sueles experimentar tristeza?",
+            pregunta=spec["pregunta"],
             respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion_frecuencia
+            puntuacion=puntuacion
         )
 
-        # Avanzar al siguiente estado (duración)
-        respuesta_base = dialog_manager.obtener_mensaje_duracion_tristeza()
-        respuesta = {
-            "estado": "preguntar_duracion",
-            "mensaje": respuesta_base["mensaje"],
-            "modo_entrada": respuesta_base.get("modo_entrada", "texto_libre"),
-            "sugerencias": respuesta_base.get("sugerencias", [])
-        }
+        transicion = spec["transiciones"].get(puntuacion)
+        if transicion is None:
+            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        return respuesta, datos_guardados
+        obtener_siguiente, introduccion = transicion
+        siguiente = obtener_siguiente()
+        return _respuesta_siguiente(siguiente, f"{introduccion}\n\n{siguiente['mensaje']}"), datos_guardados
 
+    return manejar
 
-    # --- Preguntar duración de tristeza ---
-    if estado_actual == "preguntar_duracion":
-        texto_limpio = limpiar_texto(texto_usuario)
-
-        # Lista de sugerencias permitidas
-        OPCIONES_DURACION_VALIDAS = {
-            limpiar_texto("Momentos puntuales"),
-            limpiar_texto("Unas horas"),
-            limpiar_texto("Más de 6 horas"),
-            limpiar_texto("Un día o más"),
-            limpiar_texto("Entre tres y cinco días"),
-            limpiar_texto("Una semana"),
-            limpiar_texto("Poco más de una semana"),
-            limpiar_texto("Dos semanas"),
-            limpiar_texto("Varias semanas"),
-            limpiar_texto("Un mes o más")
-        }
 
-        if texto_limpio not in OPCIONES_DURACION_VALIDAS:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+# ---------------- Estados de texto libre (detalle, antecedentes, estrategias...) ----------------
+# estado -> clave en datos_guardados, pregunta, siguiente mensaje e introducción (None = sin introducción)
+ESTADOS_TEXTO_LIBRE = {
+    "detalle_anhedonia": {
+        "clave": "actividades_sin_disfrute",
+        "pregunta": "¿Qué actividades has dejado de disfrutar?",
+        "siguiente": dialog_manager.obtener_mensaje_desesperanza,
+        "introduccion": (
+            "Gracias por compartirlo. A veces, perder interés por lo que antes disfrutábamos puede ser confuso, "
+            "desconcertante o incluso doloroso. Reconocerlo ya es un paso importante para comprender cómo te sientes."
+        )
+    },
+    "detalle_inutilidad": {
+        "clave": "detalle_inutilidad",
+        "pregunta": "¿En qué situaciones se te viene normalmente este pensamiento a la cabeza?",
+        "siguiente": dialog_manager.obtener_mensaje_ideacion_suicida,
+        "introduccion": None
+    },
+    "detalle_sueno": {
+        "clave": "detalle_sueno",
+        "pregunta": "¿Qué tipo de dificultades has notado con tu sueño?",
+        "siguiente": dialog_manager.obtener_mensaje_apetito,
+        "introduccion": (
+            "Gracias por explicarlo. Comprender cómo afecta el sueño es muy importante.\n\n"
+            "Ahora, vamos a hablar un momento sobre tu apetito."
+        )
+    },
+    "detalle_apetito": {
+        "clave": "detalle_apetito",
+        "pregunta": "¿Qué tipo de cambios has notado en tu apetito?",
+        "siguiente": dialog_manager.obtener_mensaje_concentracion,
+        "introduccion": "Gracias por contármelo. Entender cómo afecta el apetito también es importante."
+    },
+    "detalle_concentracion": {
+        "clave": "detalle_concentracion",
+        "pregunta": "¿Con qué actividades te cuesta más concentrarte?",
+        "siguiente": dialog_manager.obtener_mensaje_agitacion,
+        "introduccion": "Gracias por compartirlo. La concentración es algo que puede verse muy afectado por nuestro estado emocional."
+    },
+    "detalle_agitacion": {
+        "clave": "detalle_agitacion",
+        "pregunta": "¿Cómo describirías esa inquietud que has sentido últimamente?",
+        "siguiente": dialog_manager.obtener_mensaje_antecedentes_generales,
+        "introduccion": "Gracias por contármelo. La agitación puede tener un gran impacto en cómo nos sentimos en el día a día."
+    },
+    "preguntar_antecedentes_generales": {
+        "clave": "antecedentes_generales",
+        "pregunta": "¿Hay algo que suela desencadenar tu tristeza, como situaciones, pensamientos o preocupaciones?",
+        "siguiente": dialog_manager.obtener_mensaje_consecuentes_generales_1,
+        "introduccion": "Gracias por compartirlo. Entender qué desencadena esas emociones es un paso importante para gestionarlas mejor."
+    },
+    "preguntar_consecuentes_generales_1": {
+        "clave": "consecuentes_generales_1",
+        "pregunta": "Cuando sientes tristeza, ¿qué sueles hacer? ¿Hay algo que te ayude como llamar a alguien, comer algo, etc.?",
+        "siguiente": dialog_manager.obtener_mensaje_consecuentes_generales_2,
+        "introduccion": "Gracias por compartirlo. Saber cómo reaccionamos cuando nos sentimos tristes puede ayudarnos a comprender nuestras emociones."
+    },
+    "preguntar_consecuentes_generales_2": {
+        "clave": "consecuentes_generales_2",
+        "pregunta": "¿Has notado cambios en tu comportamiento cuando sientes tristeza? Por ejemplo, evitar situaciones.",
+        "siguiente": dialog_manager.obtener_mensaje_impacto_diario,
+        "introduccion": "Gracias por contármelo. Los cambios en el comportamiento pueden ser señales importantes de cómo estamos afrontando la tristeza."
+    },
+    "detalle_impacto_diario": {
+        "clave": "detalle_impacto_diario",
+        "pregunta": "¿En qué aspectos sientes más dificultades en tu día a día debido a estos sentimientos?",
+        "siguiente": dialog_manager.obtener_mensaje_estrategias_1,
+        "introduccion": "Gracias por contármelo. Reconocer los efectos en tu día a día nos ayuda a trabajar sobre ellos de forma más precisa."
+    },
+    "preguntar_estrategias_1": {
+        "clave": "estrategias_1",
+        "pregunta": "¿Qué cosas sueles hacer para lidiar con la tristeza?",
+        "siguiente": dialog_manager.obtener_mensaje_estrategias_2,
+        "introduccion": "Gracias por compartirlo. Saber tus recursos de afrontamiento es muy valioso."
+    },
+    "preguntar_estrategias_2": {
+        "clave": "estrategias_2",
+        "pregunta": "¿Existen actividades o estrategias que te ayuden a sentirte mejor cuando sientes tristeza?",
+        "siguiente": dialog_manager.obtener_mensaje_percepcion_empatia,
+        "introduccion": "Gracias por compartirlo. Tener identificadas estas estrategias puede ayudarte a gestionar mejor los momentos difíciles."
+    }
+}
 
-        # Detectar emoción
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion_detectada = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza_emocion = resultado_emocional.get("confianza", "0%")
 
-        # Calcular puntuación
-        puntuacion_duracion = calcular_puntuacion("duracion", texto_usuario)
-        asignar_puntuacion(session_id, "duracion", texto_usuario)
+def _manejador_texto_libre(spec: dict):
+    def manejar(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+        if _es_ambigua(texto_usuario):
+            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        # Base para las claves correctas en el PDF
-        base_clave = "duracion_tristeza"
+        emocion, confianza = _analizar_emocion(texto_usuario)
 
-        # Guardar en memoria
-        datos_guardados[base_clave] = texto_usuario
-        datos_guardados[f"emocion_{base_clave}"] = emocion_detectada
-        datos_guardados[f"confianza_emocion_{base_clave}"] = confianza_emocion
-        datos_guardados[f"puntuacion_{base_clave}"] = puntuacion_duracion
+        clave = spec["clave"]
+        datos_guardados[clave] = texto_usuario
+        datos_guardados[f"emocion_{clave}"] = emocion
+        datos_guardados[f"confianza_emocion_{clave}"] = confianza
 
-        # Guardar en base de datos
-        guardar_interaccion_completa(
+        _guardar_turno(
             session_id=session_id,
             estado=estado_actual,
-            pregunta="¿Cuánto tiempo dura generalmente esa tristeza?",
+            pregunta=spec["pregunta"],
             respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion_duracion
+            emocion=emocion,
+            confianza=confianza
         )
 
-        # Avanzar al siguiente estado
-        respuesta_base = dialog_manager.obtener_mensaje_intensidad_tristeza()
-        respuesta = {
-            "estado": "intensidad_tristeza",
-            "mensaje": respuesta_base["mensaje"],
-            "modo_entrada": respuesta_base.get("modo_entrada", "texto_libre"),
-            "sugerencias": respuesta_base.get("sugerencias", [])
-        }
-
-        return respuesta, datos_guardados
-
+        siguiente = spec["siguiente"]()
+        mensaje = siguiente["mensaje"]
+        if spec["introduccion"] is not None:
+            mensaje = f"{spec['introduccion']}\n\n{mensaje}"
+        return _respuesta_siguiente(siguiente, mensaje), datos_guardados
 
+    return manejar
 
-    # --- Preguntar intensidad ---
-    if estado_actual == "intensidad_tristeza":
-        texto_limpio = limpiar_texto(texto_usuario)
 
-        # Lista permitida (números del 1 al 10 como texto)
-        OPCIONES_INTENSIDAD_VALIDAS = {str(i) for i in range(1, 11)}
-
-        if texto_limpio not in OPCIONES_INTENSIDAD_VALIDAS:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+# ---------------- Estados con lógica propia ----------------
+def _manejar_presentacion(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    respuesta = dialog_manager.obtener_mensaje_presentacion()
+    respuesta["estado"] = "consentimiento"
+    return respuesta, datos_guardados
 
-        # Detectar emoción
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion_detectada = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza_emocion = resultado_emocional.get("confianza", "0%")
 
-        # Calcular puntuación
-        puntuacion_intensidad = calcular_puntuacion("intensidad", texto_usuario)
-        asignar_puntuacion(session_id, "intensidad", texto_usuario)
+def _manejar_consentimiento(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    if _es_ambigua(texto_usuario):
+        return generar_respuesta_aclaratoria("consentimiento"), datos_guardados
 
-        # Base para claves coherentes con el PDF
-        base_clave = "intensidad_tristeza"
+    if texto_usuario.strip().lower() in RESPUESTAS_NEGATIVAS_CONSENTIMIENTO:
+        respuesta = dialog_manager.obtener_mensaje_consentimiento_rechazado()
+        return respuesta, datos_guardados
 
-        # Guardar en memoria
-        datos_guardados[base_clave] = texto_usuario
-        datos_guardados[f"emocion_{base_clave}"] = emocion_detectada
-        datos_guardados[f"confianza_emocion_{base_clave}"] = confianza_emocion
-        datos_guardados[f"puntuacion_{base_clave}"] = puntuacion_intensidad
+    intencion = _detectar_intencion(texto_usuario)
 
-        # Guardar en base de datos
-        guardar_interaccion_completa(
+    if intencion == "afirmativo":
+        datos_guardados["consentimiento"] = texto_usuario
+        datos_guardados["consentimiento_aceptado"] = True
+        _guardar_turno(
             session_id=session_id,
             estado=estado_actual,
-            pregunta="Cuando sientes tristeza, ¿cómo de intensa es?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion_intensidad
+            pregunta="¿Estás de acuerdo en continuar con esta evaluación emocional?",
+            respuesta_usuario=texto_usuario
         )
+        respuesta = dialog_manager.obtener_mensaje_nombre()
+        respuesta["estado"] = "preguntar_nombre"
 
-        # Transición directa al siguiente bloque
-        respuesta = dialog_manager.obtener_mensaje_anhedonia()
-        return respuesta, datos_guardados
-
+    elif intencion == "negativo":
+        respuesta = dialog_manager.obtener_mensaje_consentimiento_rechazado()
 
-    # --- APARTADO ANHEDONIA ---
-    if estado_actual == "preguntar_anhedonia":
-        texto_limpio = texto_usuario.strip()
+    else:
+        respuesta = dialog_manager.obtener_mensaje_presentacion()
+        respuesta["estado"] = "consentimiento"
 
-        # Mapas explícitos de sugerencias
-        respuestas_afirmativas = {"Sí, he perdido interés"}
-        respuestas_negativas = {"No, sigo disfrutando igual"}
+    return respuesta, datos_guardados
 
-        if texto_limpio in respuestas_afirmativas:
-            intencion = "afirmativo"
-        elif texto_limpio in respuestas_negativas:
-            intencion = "negativo"
-        elif detectar_ambiguedad(texto_limpio):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-        else:
-            intencion = detectar_intencion(texto_usuario)
-
-        # Detectar emoción
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion_detectada = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza_emocion = resultado_emocional.get("confianza", "0%")
-
-        if intencion == "afirmativo":
-            puntuacion = 1
-            datos_guardados["anhedonia"] = True
-            datos_guardados["emocion_anhedonia"] = emocion_detectada
-            datos_guardados["confianza_emocion_anhedonia"] = confianza_emocion
-            datos_guardados["puntuacion_anhedonia"] = puntuacion
-
-            asignar_puntuacion(session_id, "anhedonia", str(puntuacion))
-
-            respuesta_base = dialog_manager.obtener_mensaje_anhedonia_profunda()
-            mensaje_empatico = generar_respuesta_empatica(respuesta_base["mensaje"], tipo="anhedonia")
-
-            respuesta = {
-                "estado": "detalle_anhedonia",
-                "mensaje": mensaje_empatico,
-                "modo_entrada": respuesta_base.get("modo_entrada", "mixto"),
-                "sugerencias": respuesta_base.get("sugerencias", [])
-            }
-
-        elif intencion == "negativo":
-            puntuacion = 0
-            datos_guardados["anhedonia"] = False
-            datos_guardados["emocion_anhedonia"] = emocion_detectada
-            datos_guardados["confianza_emocion_anhedonia"] = confianza_emocion
-            datos_guardados["puntuacion_anhedonia"] = puntuacion
-
-            asignar_puntuacion(session_id, "anhedonia", str(puntuacion))
-
-            mensaje_base = (
-                "Me alegra saber que sigues disfrutando de tus actividades."
-            )
-            mensaje_empatico = generar_respuesta_empatica(mensaje_base, tipo=emocion_detectada)
 
-            siguiente = dialog_manager.obtener_mensaje_desesperanza()
-            respuesta = {
-                "estado": siguiente["estado"],
-                "mensaje": f"{mensaje_empatico}\n\n{siguiente['mensaje']}",
-                "modo_entrada": siguiente.get("modo_entrada", "mixto"),
-                "sugerencias": siguiente.get("sugerencias", [])
-            }
+def _manejar_nombre(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    if _es_ambigua(texto_usuario):
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+    nombre_usuario = extraer_nombre(texto_usuario)
+    datos_guardados["nombre_usuario"] = nombre_usuario
+    datos_guardados["preguntar_nombre"] = nombre_usuario
 
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Has notado pérdida de interés o placer en actividades que antes disfrutabas?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion
-        )
+    _guardar_turno(
+        session_id=session_id,
+        estado=estado_actual,
+        pregunta="¿Con qué nombre o seudónimo puedo dirigirme a ti?",
+        respuesta_usuario=nombre_usuario
+    )
 
-        return respuesta, datos_guardados
+    respuesta = dialog_manager.obtener_mensaje_identidad(nombre_usuario)
+    respuesta["estado"] = "preguntar_identidad"
+    return respuesta, datos_guardados
 
 
+def _manejar_identidad(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    texto_limpio = texto_usuario.strip().lower()
 
-    # --- Detalle actividades con anhedonia ---
-    if estado_actual == "detalle_anhedonia":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+    # Detectar ambigüedad general o ambigüedad específica de identidad
+    if _es_ambigua(texto_limpio) or detectar_ambiguedad_identidad(texto_limpio):
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion_detectada = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza_emocion = resultado_emocional.get("confianza", "0%")
+    identidad = MAPEO_IDENTIDAD.get(texto_limpio, texto_limpio)  # Usar tal cual si no está mapeada
 
-        # Mensaje fijo, sin modificación por emoción
-        mensaje_base = (
-            "Gracias por compartirlo. A veces, perder interés por lo que antes disfrutábamos puede ser confuso, "
-            "desconcertante o incluso doloroso. Reconocerlo ya es un paso importante para comprender cómo te sientes."
-        )
+    # Guardamos ambas versiones
+    datos_guardados["identidad"] = identidad
+    datos_guardados["identidad_original"] = texto_usuario
+    datos_guardados["preguntar_identidad"] = texto_usuario
 
-        respuesta_base = dialog_manager.obtener_mensaje_desesperanza()
-        mensaje_completo = f"{mensaje_base}\n\n{respuesta_base['mensaje']}"
+    _guardar_turno(
+        session_id=session_id,
+        estado=estado_actual,
+        pregunta="¿Qué etiqueta identifica mejor tu identidad?",
+        respuesta_usuario=texto_usuario
+    )
 
-        # Guardar interacción incluyendo emoción detectada
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Qué actividades has dejado de disfrutar?",
-            respuesta_usuario=texto_usuario,
-            emocion=emocion_detectada,
-            confianza=confianza_emocion
-        )
+    nombre = datos_guardados.get("nombre_usuario", "")
+    respuesta = dialog_manager.obtener_mensaje_exploracion_tristeza(nombre)
+    respuesta["estado"] = "inicio_exploracion_tristeza"
+    return respuesta, datos_guardados
 
-        # Guardar en memoria temporal con claves específicas
-        datos_guardados["actividades_sin_disfrute"] = texto_usuario
-        datos_guardados["emocion_actividades_sin_disfrute"] = emocion_detectada
-        datos_guardados["confianza_emocion_actividades_sin_disfrute"] = confianza_emocion
 
+# ------------ APARTADO TRISTEZA -------------------
+def _manejar_inicio_exploracion_tristeza(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    texto_limpio = _limpiar(texto_usuario)
+
+    # Detectar ambigüedad general
+    if _es_ambigua(texto_limpio):
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+
+    # Detectar intención (afirmativa, negativa, desconocida)
+    intencion = _detectar_intencion(texto_limpio)
+
+    if intencion == "desconocido" and _es_ambigua(texto_limpio):
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+
+    # Detectar emoción solo si la intención es afirmativa
+    if intencion == "afirmativo":
+        emocion_detectada, confianza_emocion = _analizar_emocion(texto_usuario)
+    else:
+        emocion_detectada = "neutral"
+        confianza_emocion = "100%"
+
+    # Asignar puntuación según intención
+    if intencion == "afirmativo":
+        puntuacion = 1
+    elif intencion == "negativo":
+        puntuacion = 0
+    else:
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+
+    # Guardar respuesta, emoción y puntuación
+    datos_guardados["respuesta_tristeza"] = texto_usuario
+    datos_guardados["emocion_tristeza"] = emocion_detectada
+    datos_guardados["confianza_emocion_tristeza"] = confianza_emocion
+    datos_guardados["puntuacion_tristeza"] = puntuacion
+
+    asignar_puntuacion(session_id, "tristeza", str(puntuacion))
+
+    _guardar_turno(
+        session_id=session_id,
+        estado=estado_actual,
+        pregunta="¿Has experimentado tristeza recientemente?",
+        respuesta_usuario=texto_usuario,
+        puntuacion=puntuacion
+    )
+
+    # Construir respuesta según intención detectada
+    if intencion == "afirmativo":
+        respuesta_base = dialog_manager.obtener_mensaje_frecuencia_tristeza()
         respuesta = {
-            "estado": "preguntar_desesperanza",
-            "mensaje": mensaje_completo,
-            "modo_entrada": respuesta_base.get("modo_entrada", "mixto"),
+            "estado": "preguntar_frecuencia",
+            "mensaje": generar_respuesta_empatica(respuesta_base["mensaje"], tipo="tristeza"),
+            "modo_entrada": respuesta_base.get("modo_entrada", "texto_libre"),
+            "sugerencias": respuesta_base.get("sugerencias", [])
+        }
+    else:
+        respuesta_base = dialog_manager.obtener_mensaje_anhedonia()
+        respuesta = {
+            "estado": "preguntar_anhedonia",
+            "mensaje": respuesta_base["mensaje"],
+            "modo_entrada": respuesta_base.get("modo_entrada", "texto_libre"),
             "sugerencias": respuesta_base.get("sugerencias", [])
         }
 
-        return respuesta, datos_guardados
-
+    return respuesta, datos_guardados
 
-    # --- Preguntar desesperanza ---
-    if estado_actual == "preguntar_desesperanza":
 
-        # Evaluar ambigüedad sobre el texto original
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+# --- APARTADO ANHEDONIA ---
+def _manejar_anhedonia(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    texto_limpio = texto_usuario.strip()
 
-        texto_limpio = limpiar_texto(texto_usuario)
-
-        # Detectar intención y emoción
-        intencion = detectar_intencion(texto_limpio)
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion_detectada = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza_emocion = resultado_emocional.get("confianza", "0%")
-
-        if intencion == "afirmativo":
-            datos_guardados["desesperanza"] = True
-            puntuacion = 1
-            asignar_puntuacion(session_id, "desesperanza", "1")
-        elif intencion == "negativo":
-            datos_guardados["desesperanza"] = False
-            puntuacion = 0
-            asignar_puntuacion(session_id, "desesperanza", "0")
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+    # Mapas explícitos de sugerencias
+    if texto_limpio in RESPUESTAS_AFIRMATIVAS_ANHEDONIA:
+        intencion = "afirmativo"
+    elif texto_limpio in RESPUESTAS_NEGATIVAS_ANHEDONIA:
+        intencion = "negativo"
+    elif _es_ambigua(texto_limpio):
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+    else:
+        intencion = _detectar_intencion(texto_usuario)
 
-        # Guardar en memoria
-        datos_guardados["puntuacion_desesperanza"] = puntuacion
-        datos_guardados["emocion_desesperanza"] = emocion_detectada
-        datos_guardados["confianza_emocion_desesperanza"] = confianza_emocion
+    emocion_detectada, confianza_emocion = _analizar_emocion(texto_usuario)
 
-        # Guardar en base de datos
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Te resulta difícil encontrar algo que te ilusione o motive al pensar en el futuro?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion
-        )
+    if intencion == "afirmativo":
+        puntuacion = 1
+        datos_guardados["anhedonia"] = True
+        datos_guardados["emocion_anhedonia"] = emocion_detectada
+        datos_guardados["confianza_emocion_anhedonia"] = confianza_emocion
+        datos_guardados["puntuacion_anhedonia"] = puntuacion
 
-        # Obtener mensaje siguiente
-        siguiente = dialog_manager.obtener_mensaje_inutilidad()
+        asignar_puntuacion(session_id, "anhedonia", str(puntuacion))
 
-        if intencion == "afirmativo":
-            mensaje_intro = generar_respuesta_empatica("", tipo="desesperanza")
-        else:
-            mensaje_intro = (
-                "Me alegra saber que ahora mismo te sientes motivado/a o con metas. "
-                "Es importante reconocer esos momentos de estabilidad emocional."
-            )
+        respuesta_base = dialog_manager.obtener_mensaje_anhedonia_profunda()
+        mensaje_empatico = generar_respuesta_empatica(respuesta_base["mensaje"], tipo="anhedonia")
 
         respuesta = {
-            "estado": siguiente["estado"],
-            "mensaje": f"{mensaje_intro}\n\n{siguiente['mensaje']}",
-            "modo_entrada": siguiente.get("modo_entrada", "mixto"),
-            "sugerencias": siguiente.get("sugerencias", [])
+            "estado": "detalle_anhedonia",
+            "mensaje": mensaje_empatico,
+            "modo_entrada": respuesta_base.get("modo_entrada", "mixto"),
+            "sugerencias": respuesta_base.get("sugerencias", [])
         }
 
-        return respuesta, datos_guardados
-
+    elif intencion == "negativo":
+        puntuacion = 0
+        datos_guardados["anhedonia"] = False
+        datos_guardados["emocion_anhedonia"] = emocion_detectada
+        datos_guardados["confianza_emocion_anhedonia"] = confianza_emocion
+        datos_guardados["puntuacion_anhedonia"] = puntuacion
 
-    if estado_actual == "preguntar_inutilidad":
-        texto_limpio = limpiar_texto(texto_usuario)
+        asignar_puntuacion(session_id, "anhedonia", str(puntuacion))
 
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        intencion = detectar_intencion(texto_limpio)
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion_detectada = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza_emocion = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["emocion_inutilidad"] = emocion_detectada
-        datos_guardados["confianza_emocion_inutilidad"] = confianza_emocion
-
-        if intencion == "afirmativo":
-            puntuacion = 1
-            datos_guardados["inutilidad"] = True
-            datos_guardados["puntuacion_inutilidad"] = puntuacion
-            asignar_puntuacion(session_id, "inutilidad", str(puntuacion))
-            mensaje_intro = generar_respuesta_empatica("", tipo="inutilidad")
-            siguiente = dialog_manager.obtener_detalle_inutilidad()
-
-        elif intencion == "negativo":
-            puntuacion = 0
-            datos_guardados["inutilidad"] = False
-            datos_guardados["puntuacion_inutilidad"] = puntuacion
-            asignar_puntuacion(session_id, "inutilidad", str(puntuacion))
-            mensaje_intro = (
-                "Es bueno saber que no has sentido esa carga últimamente. "
-                "Reconocer esos momentos de estabilidad es muy valioso."
-            )
-            siguiente = dialog_manager.obtener_mensaje_ideacion_suicida()
-
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿En los últimos días has sentido que no eres suficiente?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion
+        mensaje_empatico = generar_respuesta_empatica(
+            "Me alegra saber que sigues disfrutando de tus actividades.", tipo=emocion_detectada
         )
+        siguiente = dialog_manager.obtener_mensaje_desesperanza()
+        respuesta = _respuesta_siguiente(siguiente, f"{mensaje_empatico}\n\n{siguiente['mensaje']}")
 
-        respuesta = {
-            "estado": siguiente["estado"],
-            "mensaje": f"{mensaje_intro}\n\n{siguiente['mensaje']}",
-            "modo_entrada": siguiente.get("modo_entrada", "mixto"),
-            "sugerencias": siguiente.get("sugerencias", [])
-        }
+    else:
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        return respuesta, datos_guardados
+    _guardar_turno(
+        session_id=session_id,
+        estado=estado_actual,
+        pregunta="¿Has notado pérdida de interés o placer en actividades que antes disfrutabas?",
+        respuesta_usuario=texto_usuario,
+        puntuacion=puntuacion
+    )
 
+    return respuesta, datos_guardados
 
-    # --- Detalle de inutilidad ---
-    if estado_actual == "detalle_inutilidad":
-        texto_limpio = limpiar_texto(texto_usuario)
 
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+def _manejar_desesperanza(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    # Evaluar ambigüedad sobre el texto original
+    if _es_ambigua(texto_usuario):
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        # Análisis emocional del contenido
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion_detectada = resultado_emocional.get(
-            "estado_emocional", "neutral").lower()
-        confianza_emocion = resultado_emocional.get("confianza", "0%")
+    intencion = _detectar_intencion(_limpiar(texto_usuario))
+    emocion_detectada, confianza_emocion = _analizar_emocion(texto_usuario)
 
-        # Guardar la respuesta detallada
-        datos_guardados["detalle_inutilidad"] = texto_usuario
-        datos_guardados["emocion_detalle_inutilidad"] = emocion_detectada
-        datos_guardados["confianza_emocion_detalle_inutilidad"] = confianza_emocion
+    if intencion == "afirmativo":
+        datos_guardados["desesperanza"] = True
+        puntuacion = 1
+    elif intencion == "negativo":
+        datos_guardados["desesperanza"] = False
+        puntuacion = 0
+    else:
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+    asignar_puntuacion(session_id, "desesperanza", str(puntuacion))
 
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿En qué situaciones se te viene normalmente este pensamiento a la cabeza?",
-            respuesta_usuario=texto_usuario
-        )
+    datos_guardados["puntuacion_desesperanza"] = puntuacion
+    datos_guardados["emocion_desesperanza"] = emocion_detectada
+    datos_guardados["confianza_emocion_desesperanza"] = confianza_emocion
 
-        # Avanzar al siguiente estado
-        siguiente = dialog_manager.obtener_mensaje_ideacion_suicida()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": siguiente["mensaje"],
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
+    _guardar_turno(
+        session_id=session_id,
+        estado=estado_actual,
+        pregunta="¿Te resulta difícil encontrar algo que te ilusione o motive al pensar en el futuro?",
+        respuesta_usuario=texto_usuario,
+        puntuacion=puntuacion
+    )
 
+    siguiente = dialog_manager.obtener_mensaje_inutilidad()
 
-    # --- Preguntar ideación suicida ---
-    if estado_actual == "preguntar_ideacion_suicida":
-        # Mapa exacto de respuestas válidas
-        mapa_respuestas = {
-            "No, en ningún momento": 0,
-            "Sí, pero sin intención de hacerme daño": 1,
-            "Sí, pensé en hacerme daño, pero no tengo intención": 2,
-            "Sí, pensé en hacerme daño y tengo un plan": 3,
-            "No entiendo la pregunta": None
-        }
+    if intencion == "afirmativo":
+        mensaje_intro = generar_respuesta_empatica("", tipo="desesperanza")
+    else:
+        mensaje_intro = (
+            "Me alegra saber que ahora mismo te sientes motivado/a o con metas. "
+            "Es importante reconocer esos momentos de estabilidad emocional."
+        )
 
-        if texto_usuario not in mapa_respuestas:
-            return {
-                "estado": estado_actual,
-                "mensaje": (
-                    "Parece que tu respuesta no coincide con las opciones disponibles.\n\n"
-                    "Por favor, selecciona una de las respuestas propuestas para continuar."
-                ),
-                "modo_entrada": "sugerencias",
-                "sugerencias": list(mapa_respuestas.keys())
-            }, datos_guardados
+    return _respuesta_siguiente(siguiente, f"{mensaje_intro}\n\n{siguiente['mensaje']}"), datos_guardados
 
-        if texto_usuario == "No entiendo la pregunta":
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        # Obtener puntuación directamente
-        puntuacion = mapa_respuestas[texto_usuario]
+def _manejar_inutilidad(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    if _es_ambigua(texto_usuario):
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        # Analizar emoción
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion_detectada = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza_emocion = resultado_emocional.get("confianza", "0%")
+    intencion = _detectar_intencion(_limpiar(texto_usuario))
+    emocion_detectada, confianza_emocion = _analizar_emocion(texto_usuario)
 
-        # Mensaje según puntuación
-        if puntuacion == 0:
-            mensaje_ideacion = (
-                "Gracias por tu respuesta. Me alegra saber que no has tenido pensamientos de ese tipo últimamente.\n\n"
-                "Es importante reconocer estos momentos en los que nos sentimos emocionalmente estables."
-            )
-        elif puntuacion == 1:
-            mensaje_ideacion = (
-                "Gracias por compartir algo tan delicado. No estás solo/a en sentirte así en ciertos momentos.\n\n"
-                "Reconocer estos pensamientos, incluso sin intención, ya es un paso importante para cuidar tu salud emocional."
-            )
-        elif puntuacion == 2:
-            mensaje_ideacion = (
-                "Gracias por tu sinceridad. Entiendo que compartir esto no es fácil.\n\n"
-                "Si en algún momento estos pensamientos se vuelven más intensos o difíciles de manejar, por favor considera hablar con un profesional de salud mental.\n"
-                "Tu bienestar es muy importante. Seguimos adelante sin presión."
-            )
-        elif puntuacion == 3:
-            mensaje_ideacion = (
-                "Gracias por compartirlo. Lamento mucho que sea así, imagino que estás pasando por una situación difícil.\n\n"
-                "Lo más adecuado es que contactes ahora mismo con profesionales humanos. Por favor, ponte en contacto con las personas que pueden ayudarte:\n\n"
-                "- 📞 024 (Atención al suicidio - Cruz Roja)\n"
-                "- 📞 717 00 37 17 (Teléfono de la esperanza)\n"
-                "- 📞 112 (Emergencias)"
-            )
-            mensaje_cierre = dialog_manager.obtener_cierre_alto_riesgo()
-            return mensaje_cierre, datos_guardados
+    datos_guardados["emocion_inutilidad"] = emocion_detectada
+    datos_guardados["confianza_emocion_inutilidad"] = confianza_emocion
 
-        # Guardar datos en memoria temporal
-        datos_guardados["puntuacion_ideacion_suicida"] = puntuacion
-        datos_guardados["ideacion_suicida_texto"] = texto_usuario
-        datos_guardados["emocion_ideacion_suicida"] = emocion_detectada
-        datos_guardados["confianza_emocion_ideacion"] = confianza_emocion
+    if intencion == "afirmativo":
+        puntuacion = 1
+        datos_guardados["inutilidad"] = True
+        mensaje_intro = generar_respuesta_empatica("", tipo="inutilidad")
+        siguiente = dialog_manager.obtener_detalle_inutilidad()
 
-        # Guardar interacción completa con emoción y confianza
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Has tenido pensamientos relacionados con el suicidio en las últimas dos semanas?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion,
-            emocion=emocion_detectada,
-            confianza=confianza_emocion
+    elif intencion == "negativo":
+        puntuacion = 0
+        datos_guardados["inutilidad"] = False
+        mensaje_intro = (
+            "Es bueno saber que no has sentido esa carga últimamente. "
+            "Reconocer esos momentos de estabilidad es muy valioso."
         )
+        siguiente = dialog_manager.obtener_mensaje_ideacion_suicida()
 
-        # Siguiente pregunta (fatiga)
-        siguiente = dialog_manager.obtener_mensaje_fatiga()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": f"{mensaje_ideacion}\n\n{''.join(siguiente['mensaje'])}",
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- Preguntar fatiga ---
-    if estado_actual == "preguntar_fatiga":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        # Detectar intención
-        intencion = detectar_intencion(texto_usuario)
+    else:
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        if intencion == "afirmativo":
-            puntuacion = 1
-            mensaje_empatico = (
-                "Gracias por contármelo. Sentirse con menos energía es algo que muchas personas experimentan en momentos difíciles."
-            )
-        elif intencion == "negativo":
-            puntuacion = 0
-            mensaje_empatico = (
-                "Entiendo, es una buena señal que mantengas tu nivel de energía habitual."
-            )
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+    datos_guardados["puntuacion_inutilidad"] = puntuacion
+    asignar_puntuacion(session_id, "inutilidad", str(puntuacion))
 
-        # Analizar emoción
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
+    _guardar_turno(
+        session_id=session_id,
+        estado=estado_actual,
+        pregunta="¿En los últimos días has sentido que no eres suficiente?",
+        respuesta_usuario=texto_usuario,
+        puntuacion=puntuacion
+    )
 
-        # Guardar datos
-        datos_guardados["puntuacion_fatiga"] = puntuacion
-        datos_guardados["fatiga_texto"] = texto_usuario
-        datos_guardados["emocion_fatiga"] = emocion
-        datos_guardados["confianza_emocion_fatiga"] = confianza
+    return _respuesta_siguiente(siguiente, f"{mensaje_intro}\n\n{siguiente['mensaje']}"), datos_guardados
 
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Has notado últimamente que te falta energía o te cansas con más facilidad de lo habitual?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion
-        )
 
-        # Avanzar directamente a la siguiente pregunta: sueño
-        siguiente = dialog_manager.obtener_mensaje_sueno()
+def _manejar_ideacion_suicida(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    if texto_usuario not in MAPA_IDEACION_SUICIDA:
         return {
-            "estado": siguiente["estado"],
-            "mensaje": f"{mensaje_empatico}\n\n{''.join(siguiente['mensaje'])}",
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
+            "estado": estado_actual,
+            "mensaje": (
+                "Parece que tu respuesta no coincide con las opciones disponibles.\n\n"
+                "Por favor, selecciona una de las respuestas propuestas para continuar."
+            ),
+            "modo_entrada": "sugerencias",
+            "sugerencias": list(MAPA_IDEACION_SUICIDA.keys())
         }, datos_guardados
 
+    if texto_usuario == "No entiendo la pregunta":
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+
+    puntuacion = MAPA_IDEACION_SUICIDA[texto_usuario]
+    emocion_detectada, confianza_emocion = _analizar_emocion(texto_usuario)
+
+    # Riesgo alto: se deriva a profesionales y se cierra la evaluación
+    if puntuacion == 3:
+        return dialog_manager.obtener_cierre_alto_riesgo(), datos_guardados
+
+    datos_guardados["puntuacion_ideacion_suicida"] = puntuacion
+    datos_guardados["ideacion_suicida_texto"] = texto_usuario
+    datos_guardados["emocion_ideacion_suicida"] = emocion_detectada
+    datos_guardados["confianza_emocion_ideacion"] = confianza_emocion
+
+    _guardar_turno(
+        session_id=session_id,
+        estado=estado_actual,
+        pregunta="¿Has tenido pensamientos relacionados con el suicidio en las últimas dos semanas?",
+        respuesta_usuario=texto_usuario,
+        puntuacion=puntuacion,
+        emocion=emocion_detectada,
+        confianza=confianza_emocion
+    )
+
+    # Siguiente pregunta (fatiga)
+    siguiente = dialog_manager.obtener_mensaje_fatiga()
+    return _respuesta_siguiente(
+        siguiente, f"{MENSAJES_IDEACION_SUICIDA[puntuacion]}\n\n{siguiente['mensaje']}"
+    ), datos_guardados
+
+
+def _manejar_percepcion_empatia(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    texto_limpio = _limpiar(texto_usuario)
+
+    if not texto_limpio.isdigit() or int(texto_limpio) not in range(0, 11):
+        return generar_respuesta_aclaratoria(estado_actual), datos_guardados
+
+    puntuacion_empatia = int(texto_limpio)
+    datos_guardados["puntuacion_empatia"] = puntuacion_empatia
+
+    _guardar_turno(
+        session_id=session_id,
+        estado=estado_actual,
+        pregunta="¿Cómo calificarías la empatía del chatbot (0 a 10)?",
+        respuesta_usuario=texto_usuario,
+        puntuacion=puntuacion_empatia
+    )
+
+    # 1. Encolar el informe PDF: se genera en segundo plano (ver core.report_jobs)
+    informe = encolar_informe(session_id, datos_guardados)
+
+    # 2. Mensaje de cierre con enlace al informe y a su estado
+    nombre = datos_guardados.get("nombre_usuario", "usuario")
+    cierre = dialog_manager.obtener_mensaje_cierre(nombre)
+    mensaje_final = (
+        f"{cierre['mensaje']}\n\n"
+        f"Puedes descargar tu informe desde el siguiente enlace:\n{informe['url_pdf']}\n\n"
+        f"El informe se está generando; si el enlace aún no funciona, puedes consultar su estado aquí:\n"
+        f"{informe['url_estado']}"
+    )
+
+    respuesta = _respuesta_siguiente(cierre, mensaje_final)
+    respuesta["informe"] = informe
+    return respuesta, datos_guardados
 
-    # --- Preguntar sueño ---
-    if estado_actual == "preguntar_sueno":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        texto_limpio = texto_usuario.strip().lower()
-        mapa_respuestas = {
-            "sí, he notado cambios": 1,
-            "si, he notado cambios": 1,
-            "no, duermo bien": 0,
-            "no estoy seguro": None
-        }
+# ---------------- Registro de estados ----------------
+# Despacho O(1): estado -> manejador(session_id, texto_usuario, estado_actual, datos_guardados)
+MANEJADORES_ESTADO = {
+    "presentacion": _manejar_presentacion,
+    "consentimiento": _manejar_consentimiento,
+    "preguntar_nombre": _manejar_nombre,
+    "preguntar_identidad": _manejar_identidad,
+    "inicio_exploracion_tristeza": _manejar_inicio_exploracion_tristeza,
+    "preguntar_anhedonia": _manejar_anhedonia,
+    "preguntar_desesperanza": _manejar_desesperanza,
+    "preguntar_inutilidad": _manejar_inutilidad,
+    "preguntar_ideacion_suicida": _manejar_ideacion_suicida,
+    "preguntar_percepcion_empatia": _manejar_percepcion_empatia,
+    **{estado: _manejador_escala(spec) for estado, spec in ESTADOS_ESCALA.items()},
+    **{estado: _manejador_binario(spec) for estado, spec in ESTADOS_BINARIOS.items()},
+    **{estado: _manejador_texto_libre(spec) for estado, spec in ESTADOS_TEXTO_LIBRE.items()},
+}
 
-        # Intento 1: coincidencia exacta
-        puntuacion = mapa_respuestas.get(texto_limpio)
-
-        # Intento 2: inferencia por intención
-        if puntuacion is None and texto_limpio not in mapa_respuestas:
-            intencion = detectar_intencion(texto_usuario)
-            if intencion == "afirmativo":
-                puntuacion = 1
-            elif intencion == "negativo":
-                puntuacion = 0
-            else:
-                return generar_respuesta_aclaratoria(estado_actual), datos_guardados
 
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["puntuacion_sueno"] = puntuacion
-        datos_guardados["sueno_texto"] = texto_usuario
-        datos_guardados["emocion_sueno"] = emocion
-        datos_guardados["confianza_emocion_sueno"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Has notado últimamente cambios o dificultades con tu sueño?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion
-        )
-
-        if puntuacion == 1:
-            siguiente = dialog_manager.obtener_detalle_sueno()
-            mensaje = (
-                "Gracias por compartirlo. Los cambios en el sueño pueden tener un gran impacto en cómo nos sentimos durante el día.\n\n"
-                f"{siguiente['mensaje']}"
-            )
-            return {
-                "estado": siguiente["estado"],
-                "mensaje": mensaje,
-                "modo_entrada": siguiente["modo_entrada"],
-                "sugerencias": siguiente.get("sugerencias", [])
-            }, datos_guardados
-
-        elif puntuacion == 0:
-            siguiente = dialog_manager.obtener_mensaje_apetito()
-            mensaje = (
-                "Me alegra saber que estás durmiendo bien. Un buen descanso es esencial para el bienestar emocional.\n\n"
-                "Ahora, vamos a hablar un momento sobre tu apetito.\n\n"
-                f"{siguiente['mensaje']}"
-            )
+def procesar_mensaje(session_id: str, texto_usuario: str, estado_actual: str, datos_guardados: dict) -> Tuple[dict, dict]:
+    # Validación de mensaje vacío
+    if not texto_usuario or not texto_usuario.strip():
+        respuesta_base_fn = ESTADOS_DIALOG_MANAGER.get(estado_actual)
+        if respuesta_base_fn:
+            try:
+                base = respuesta_base_fn(datos_guardados)
+            except TypeError:
+                base = respuesta_base_fn()
             return {
-                "estado": siguiente["estado"],
-                "mensaje": mensaje,
-                "modo_entrada": siguiente["modo_entrada"],
-                "sugerencias": siguiente.get("sugerencias", [])
+                "estado": estado_actual,
+                "mensaje": "Por favor, selecciona una opción o escribe algo antes de continuar.",
+                "modo_entrada": base.get("modo_entrada", "texto_libre"),
+                "sugerencias": base.get("sugerencias", [])
             }, datos_guardados
 
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-
-    # --- Detalle del sueño ---
-    if estado_actual == "detalle_sueno":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["detalle_sueno"] = texto_usuario
-        datos_guardados["emocion_detalle_sueno"] = emocion
-        datos_guardados["confianza_emocion_detalle_sueno"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Qué tipo de dificultades has notado con tu sueño?",
-            respuesta_usuario=texto_usuario
-        )
-
-        siguiente = dialog_manager.obtener_mensaje_apetito()
         return {
-            "estado": siguiente["estado"],
-            "mensaje": (
-                "Gracias por explicarlo. Comprender cómo afecta el sueño es muy importante.\n\n"
-                "Ahora, vamos a hablar un momento sobre tu apetito.\n\n"
-                f"{siguiente['mensaje']}"
-            ),
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- Preguntar Apetito ---
-    if estado_actual == "preguntar_apetito":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        texto_limpio = texto_usuario.strip().lower()
-
-        # Mapear solo sugerencias exactas
-        mapa_respuestas = {
-            "sí, he notado cambios": 1,
-            "no, como normal": 0,
-            "no estoy seguro": None
-        }
-
-        texto_limpio = limpiar_texto(texto_usuario)
-
-        mapa_respuestas_limpio = {limpiar_texto(k): v for k, v in mapa_respuestas.items()}
-        puntuacion = mapa_respuestas_limpio.get(texto_limpio)
-
-        # Si no coincide con sugerencias, usar intención
-        if puntuacion is None:
-            intencion = detectar_intencion(texto_usuario)
-            print(f"[DEBUG] Intención detectada: {intencion}")
-            if intencion == "afirmativo":
-                puntuacion = 1
-            elif intencion == "negativo":
-                puntuacion = 0
-            else:
-                return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        print(f"[DEBUG] Puntuación final asignada: {puntuacion}")
-
-
-        # Analizar emoción solo si es entrada libre
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        # Guardar datos
-        datos_guardados["puntuacion_apetito"] = puntuacion
-        datos_guardados["apetito_texto"] = texto_usuario
-        datos_guardados["emocion_apetito"] = emocion
-        datos_guardados["confianza_emocion_apetito"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Has notado cambios en tu apetito o en la cantidad de comida que tomas?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion
-        )
-
-        if puntuacion == 1:
-            siguiente = dialog_manager.obtener_detalle_apetito()
-            mensaje = (
-                "Gracias por compartirlo. Los cambios en el apetito pueden ser una señal importante de cómo nos sentimos.\n\n"
-                f"{siguiente['mensaje']}"
-            )
-            return {
-                "estado": siguiente["estado"],
-                "mensaje": mensaje,
-                "modo_entrada": siguiente["modo_entrada"],
-                "sugerencias": siguiente.get("sugerencias", [])
-            }, datos_guardados
-
-        elif puntuacion == 0:
-            siguiente = dialog_manager.obtener_mensaje_concentracion()
-            mensaje = (
-                "Está bien, comer con normalidad es una buena señal.\n\n"
-                f"{siguiente['mensaje']}"
-            )
-            return {
-                "estado": siguiente["estado"],
-                "mensaje": mensaje,
-                "modo_entrada": siguiente["modo_entrada"],
-                "sugerencias": siguiente.get("sugerencias", [])
-            }, datos_guardados
-
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-
-    # --- Detalle del Apetito ---
-    if estado_actual == "detalle_apetito":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["detalle_apetito"] = texto_usuario
-        datos_guardados["emocion_detalle_apetito"] = emocion
-        datos_guardados["confianza_emocion_detalle_apetito"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Qué tipo de cambios has notado en tu apetito?",
-            respuesta_usuario=texto_usuario
-        )
-
-        siguiente = dialog_manager.obtener_mensaje_concentracion()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": (
-                "Gracias por contármelo. Entender cómo afecta el apetito también es importante.\n\n"
-                f"{siguiente['mensaje']}"
-            ),
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-    # --- Preguntar Concentración ---
-    if estado_actual == "preguntar_concentracion":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        texto_limpio = limpiar_texto(texto_usuario)
-
-        # Solo mapear sugerencias exactas
-        mapa_respuestas = {
-            "sí, me cuesta concentrarme": 1,
-            "no, me concentro bien": 0,
-            "no estoy seguro": None
-        }
-
-        mapa_respuestas_limpio = {limpiar_texto(k): v for k, v in mapa_respuestas.items()}
-        puntuacion = mapa_respuestas_limpio.get(texto_limpio)
-
-        # Si no coincide con sugerencias, usar intención
-        if puntuacion is None:
-            intencion = detectar_intencion(texto_usuario)
-            print(f"[DEBUG] Intención detectada: {intencion}")
-            if intencion == "afirmativo":
-                puntuacion = 1
-            elif intencion == "negativo":
-                puntuacion = 0
-            else:
-                return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        print(f"[DEBUG] Puntuación final asignada: {puntuacion}")
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["puntuacion_concentracion"] = puntuacion
-        datos_guardados["concentracion_texto"] = texto_usuario
-        datos_guardados["emocion_concentracion"] = emocion
-        datos_guardados["confianza_emocion_concentracion"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Te ha costado concentrarte en actividades como leer, trabajar o seguir una conversación?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion
-        )
-
-        if puntuacion == 1:
-            siguiente = dialog_manager.obtener_detalle_concentracion()
-            mensaje = (
-                "Gracias por compartirlo. Es común que la falta de concentración acompañe a estados emocionales bajos.\n\n"
-                f"{siguiente['mensaje']}"
-            )
-        elif puntuacion == 0:
-            siguiente = dialog_manager.obtener_mensaje_agitacion()
-            mensaje = (
-                "Está bien, mantener una buena concentración es un buen indicador de estabilidad.\n\n"
-                f"{siguiente['mensaje']}"
-            )
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": mensaje,
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- Detalle de la Concentración ---
-    if estado_actual == "detalle_concentracion":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["detalle_concentracion"] = texto_usuario
-        datos_guardados["emocion_detalle_concentracion"] = emocion
-        datos_guardados["confianza_emocion_detalle_concentracion"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Con qué actividades te cuesta más concentrarte?",
-            respuesta_usuario=texto_usuario
-        )
-
-        siguiente = dialog_manager.obtener_mensaje_agitacion()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": (
-                "Gracias por compartirlo. La concentración es algo que puede verse muy afectado por nuestro estado emocional.\n\n"
-                f"{siguiente['mensaje']}"
-            ),
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-    # --- Preguntar Agitación ---
-    if estado_actual == "preguntar_agitacion":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        texto_limpio = limpiar_texto(texto_usuario)
-
-        # Solo mapear sugerencias exactas
-        mapa_respuestas = {
-            "sí, me siento inquieto": 1,
-            "no, estoy tranquilo": 0,
-            "no estoy seguro": None
-        }
-
-        mapa_respuestas_limpio = {limpiar_texto(k): v for k, v in mapa_respuestas.items()}
-        puntuacion = mapa_respuestas_limpio.get(texto_limpio)
-
-        # Si no coincide con sugerencias, usar intención
-        if puntuacion is None:
-            intencion = detectar_intencion(texto_usuario)
-            print(f"[DEBUG] Intención detectada: {intencion}")
-            if intencion == "afirmativo":
-                puntuacion = 1
-            elif intencion == "negativo":
-                puntuacion = 0
-            else:
-                return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        print(f"[DEBUG] Puntuación final asignada: {puntuacion}")
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["puntuacion_agitacion"] = puntuacion
-        datos_guardados["agitacion_texto"] = texto_usuario
-        datos_guardados["emocion_agitacion"] = emocion
-        datos_guardados["confianza_emocion_agitacion"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Has notado que últimamente sientes inquietud o agitación?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion
-        )
-
-        if puntuacion == 1:
-            siguiente = dialog_manager.obtener_detalle_agitacion()
-            mensaje = (
-                "Gracias por compartirlo. A veces la inquietud puede ser difícil de explicar pero importante de reconocer.\n\n"
-                f"{siguiente['mensaje']}"
-            )
-        elif puntuacion == 0:
-            siguiente = dialog_manager.obtener_mensaje_antecedentes_generales()
-            mensaje = (
-                "Me alegra saber que no has notado inquietud últimamente.\n\n"
-                f"{siguiente['mensaje']}"
-            )
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": mensaje,
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-    # --- Detalle Agitación ---
-    if estado_actual == "detalle_agitacion":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["detalle_agitacion"] = texto_usuario
-        datos_guardados["emocion_detalle_agitacion"] = emocion
-        datos_guardados["confianza_emocion_detalle_agitacion"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Cómo describirías esa inquietud que has sentido últimamente?",
-            respuesta_usuario=texto_usuario
-        )
-
-        siguiente = dialog_manager.obtener_mensaje_antecedentes_generales()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": (
-                "Gracias por contármelo. La agitación puede tener un gran impacto en cómo nos sentimos en el día a día.\n\n"
-                f"{siguiente['mensaje']}"
-            ),
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- APARTADO ANTECEDENTES ---
-    # --- Preguntar Antecedentes Generales ---
-    if estado_actual == "preguntar_antecedentes_generales":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["antecedentes_generales"] = texto_usuario
-        datos_guardados["emocion_antecedentes_generales"] = emocion
-        datos_guardados["confianza_emocion_antecedentes_generales"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Hay algo que suela desencadenar tu tristeza, como situaciones, pensamientos o preocupaciones?",
-            respuesta_usuario=texto_usuario
-        )
-
-        siguiente = dialog_manager.obtener_mensaje_consecuentes_generales_1()
-        mensaje = (
-            "Gracias por compartirlo. Entender qué desencadena esas emociones es un paso importante para gestionarlas mejor.\n\n"
-            f"{siguiente['mensaje']}"
-        )
-
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": mensaje,
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- Preguntar Consecuentes Generales 1 ---
-    if estado_actual == "preguntar_consecuentes_generales_1":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["consecuentes_generales_1"] = texto_usuario
-        datos_guardados["emocion_consecuentes_generales_1"] = emocion
-        datos_guardados["confianza_emocion_consecuentes_generales_1"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="Cuando sientes tristeza, ¿qué sueles hacer? ¿Hay algo que te ayude como llamar a alguien, comer algo, etc.?",
-            respuesta_usuario=texto_usuario
-        )
-
-        siguiente = dialog_manager.obtener_mensaje_consecuentes_generales_2()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": (
-                "Gracias por compartirlo. Saber cómo reaccionamos cuando nos sentimos tristes puede ayudarnos a comprender nuestras emociones.\n\n"
-                f"{siguiente['mensaje']}"
-            ),
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- Preguntar Consecuentes Generales 2 ---
-    if estado_actual == "preguntar_consecuentes_generales_2":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["consecuentes_generales_2"] = texto_usuario
-        datos_guardados["emocion_consecuentes_generales_2"] = emocion
-        datos_guardados["confianza_emocion_consecuentes_generales_2"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Has notado cambios en tu comportamiento cuando sientes tristeza? Por ejemplo, evitar situaciones.",
-            respuesta_usuario=texto_usuario
-        )
-
-        siguiente = dialog_manager.obtener_mensaje_impacto_diario()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": (
-                "Gracias por contármelo. Los cambios en el comportamiento pueden ser señales importantes de cómo estamos afrontando la tristeza.\n\n"
-                f"{siguiente['mensaje']}"
-            ),
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- APARTADO IMPACTO EN LA VIDA DIARIA ---
-    # --- Preguntar Impacto Diario ---
-    if estado_actual == "preguntar_impacto_diario":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        texto_limpio = limpiar_texto(texto_usuario)
-
-        mapa_respuestas = {
-            "sí, ha afectado mi vida diaria": 1,
-            "no, no ha afectado mi vida diaria": 0,
-            "no estoy seguro": None
-        }
-
-        mapa_respuestas_limpio = {limpiar_texto(k): v for k, v in mapa_respuestas.items()}
-        puntuacion = mapa_respuestas_limpio.get(texto_limpio)
-
-        if puntuacion is None:
-            intencion = detectar_intencion(texto_usuario)
-            print(f"[DEBUG] Intención detectada: {intencion}")
-            if intencion == "afirmativo":
-                puntuacion = 1
-            elif intencion == "negativo":
-                puntuacion = 0
-            else:
-                return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        print(f"[DEBUG] Puntuación final asignada: {puntuacion}")
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["puntuacion_impacto_diario"] = puntuacion
-        datos_guardados["impacto_diario_texto"] = texto_usuario
-        datos_guardados["emocion_impacto_diario"] = emocion
-        datos_guardados["confianza_emocion_impacto_diario"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Dirías que estos sentimientos han afectado tu vida diaria? Por ejemplo, en el trabajo, estudios, relaciones sociales o bienestar personal.",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion
-        )
-
-        if puntuacion == 1:
-            siguiente = dialog_manager.obtener_detalle_impacto_diario()
-            mensaje = (
-                "Gracias por compartirlo. Es importante identificar las áreas en las que estos sentimientos nos afectan.\n\n"
-                f"{siguiente['mensaje']}"
-            )
-        elif puntuacion == 0:
-            siguiente = dialog_manager.obtener_mensaje_estrategias_1()
-            mensaje = (
-                "Entiendo. Me alegra saber que no está teniendo un gran impacto en tu día a día.\n\n"
-                f"{siguiente['mensaje']}"
-            )
-        else:
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": mensaje,
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-    # --- Detalle Impacto Diario ---
-    if estado_actual == "detalle_impacto_diario":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        datos_guardados["detalle_impacto_diario"] = texto_usuario
-        datos_guardados["emocion_detalle_impacto_diario"] = emocion
-        datos_guardados["confianza_emocion_detalle_impacto_diario"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿En qué aspectos sientes más dificultades en tu día a día debido a estos sentimientos?",
-            respuesta_usuario=texto_usuario
-        )
-
-        siguiente = dialog_manager.obtener_mensaje_estrategias_1()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": (
-                "Gracias por contármelo. Reconocer los efectos en tu día a día nos ayuda a trabajar sobre ellos de forma más precisa.\n\n"
-                f"{siguiente['mensaje']}"
-            ),
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- APARTADO ESTRATEGIAS DE AFRONTAMIENTO ---
-    # --- Preguntar Estrategias de Afrontamiento ---
-    if estado_actual == "preguntar_estrategias_1":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        # Analizar emoción
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        # Guardar respuesta
-        datos_guardados["estrategias_1"] = texto_usuario
-        datos_guardados["emocion_estrategias_1"] = emocion
-        datos_guardados["confianza_emocion_estrategias_1"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Qué cosas sueles hacer para lidiar con la tristeza?",
-            respuesta_usuario=texto_usuario
-        )
-
-        siguiente = dialog_manager.obtener_mensaje_estrategias_2()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": (
-                "Gracias por compartirlo. Saber tus recursos de afrontamiento es muy valioso.\n\n"
-                f"{siguiente['mensaje']}"
-            ),
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- Preguntar Estrategias de Afrontamiento ---
-    if estado_actual == "preguntar_estrategias_2":
-        if detectar_ambiguedad(texto_usuario):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        # Analizar emoción
-        resultado_emocional = analizar_sentimiento(texto_usuario)
-        emocion = resultado_emocional.get("estado_emocional", "neutral").lower()
-        confianza = resultado_emocional.get("confianza", "0%")
-
-        # Guardar respuesta
-        datos_guardados["estrategias_2"] = texto_usuario
-        datos_guardados["emocion_estrategias_2"] = emocion
-        datos_guardados["confianza_emocion_estrategias_2"] = confianza
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Existen actividades o estrategias que te ayuden a sentirte mejor cuando sientes tristeza?",
-            respuesta_usuario=texto_usuario
-        )
-
-        # Obtener nombre del usuario
-        nombre = datos_guardados.get("nombre_usuario", "amigo/a")
-
-        # Transición al cierre con nombre personalizado
-        siguiente = dialog_manager.obtener_mensaje_percepcion_empatia()
-        return {
-            "estado": siguiente["estado"],
-            "mensaje": (
-                "Gracias por compartirlo. Tener identificadas estas estrategias puede ayudarte a gestionar mejor los momentos difíciles.\n\n"
-                f"{siguiente['mensaje']}"
-            ),
-            "modo_entrada": siguiente["modo_entrada"],
-            "sugerencias": siguiente.get("sugerencias", [])
-        }, datos_guardados
-
-
-    # --- Preguntar percepción de empatía del chatbot ---
-    if estado_actual == "preguntar_percepcion_empatia":
-        texto_limpio = limpiar_texto(texto_usuario)
-
-        if not texto_limpio.isdigit() or int(texto_limpio) not in range(0, 11):
-            return generar_respuesta_aclaratoria(estado_actual), datos_guardados
-
-        puntuacion_empatia = int(texto_limpio)
-        datos_guardados["puntuacion_empatia"] = puntuacion_empatia
-
-        guardar_interaccion_completa(
-            session_id=session_id,
-            estado=estado_actual,
-            pregunta="¿Cómo calificarías la empatía del chatbot (0 a 10)?",
-            respuesta_usuario=texto_usuario,
-            puntuacion=puntuacion_empatia
-        )
-
-        # 1. Generar lista de interacciones automáticamente
-        interacciones = construir_interacciones_para_pdf(datos_guardados)
-
-        # 2. Generar PDF
-        nombre_pdf = f"{session_id}.pdf"
-        ruta_pdf = os.path.join("/app/static/informes", nombre_pdf)
-        os.makedirs(os.path.dirname(ruta_pdf), exist_ok=True)
-        generar_pdf_informe(interacciones, ruta_pdf)
-
-        # 3. Construir URL pública del PDF
-        url_pdf = f"http://localhost:8010/static/informes/{nombre_pdf}"
-
-        # 4. Mensaje de cierre con enlace al informe
-        nombre = datos_guardados.get("nombre_usuario", "usuario")
-        cierre = dialog_manager.obtener_mensaje_cierre(nombre)
-        mensaje_final = (
-            f"{cierre['mensaje']}\n\n"
-            f"Puedes descargar tu informe desde el siguiente enlace:\n{url_pdf}"
-        )
-
-        return {
-            "estado": cierre["estado"],
-            "mensaje": mensaje_final,
-            "modo_entrada": cierre["modo_entrada"],
-            "sugerencias": cierre.get("sugerencias", [])
+            "estado": estado_actual,
+            "mensaje": "Por favor, escribe algo antes de continuar.",
+            "modo_entrada": "mixto",
+            "sugerencias": []
         }, datos_guardados
 
+    manejador = MANEJADORES_ESTADO.get(estado_actual)
+    if manejador is not None:
+        return manejador(session_id, texto_usuario, estado_actual, datos_guardados)
 
     # --- Fallback de error ---
     respuesta = {
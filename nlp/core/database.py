@@ -1,5 +1,7 @@
-from pymongo import MongoClient
+from pymongo import ASCENDING, AsyncMongoClient, MongoClient
 from pymongo.errors import PyMongoError
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime, timezone
 from typing import Optional
 import os
@@ -9,6 +11,7 @@ from fpdf import FPDF
 from core.security import anonimizar_texto
 from core.emotion_model import analizar_sentimiento
 from core.score_manager import obtener_puntuaciones
+from core.write_behind import BufferEscritura
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +21,102 @@ cliente = MongoClient(MONGO_URL)
 db = cliente.get_database("chatbot")
 conversaciones = db.get_collection("historial")
 
+# Escritura diferida: las interacciones se encolan y un hilo las guarda por lotes,
+# fuera del tiempo de respuesta. Lo que no se consigue guardar va al fichero dead-letter.
+ESCRITURA_DIFERIDA = os.getenv("MONGO_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+buffer_escritura = BufferEscritura(
+    conversaciones,
+    capacidad=int(os.getenv("MONGO_WRITE_QUEUE_MAX_SIZE", 10000)),
+    tamano_lote=int(os.getenv("MONGO_WRITE_BATCH_SIZE", 100)),
+    intervalo_ms=float(os.getenv("MONGO_WRITE_FLUSH_INTERVAL_MS", 500)),
+    reintentos=int(os.getenv("MONGO_WRITE_RETRY_ATTEMPTS", 5)),
+    backoff_base=float(os.getenv("MONGO_WRITE_RETRY_BACKOFF_BASE", 0.2)),
+    ruta_dead_letter=os.getenv("MONGO_DEAD_LETTER_PATH", "historial_no_guardado.jsonl"),
+    nombre="write-behind-historial"
+) if ESCRITURA_DIFERIDA else None
+
+# Cliente asíncrono para el camino async de las peticiones (se crea en el primer uso,
+# dentro del bucle de eventos del servidor)
+_cliente_async: Optional[AsyncMongoClient] = None
+
+# Documentos pendientes del turno en curso cuando las escrituras se agrupan
+_escrituras_diferidas: ContextVar[Optional[list]] = ContextVar("escrituras_mongo_diferidas", default=None)
+
+
+def _coleccion_async():
+    global _cliente_async
+    if _cliente_async is None:
+        _cliente_async = AsyncMongoClient(MONGO_URL)
+    return _cliente_async.get_database("chatbot").get_collection("historial")
+
+
+def _insertar(doc: dict, descripcion: str) -> None:
+    """
+    Inserta el documento: lo aparta si hay escrituras agrupadas activas, lo encola
+    en el buffer de escritura diferida si está activo o, si no, lo escribe ya.
+    """
+    pendientes = _escrituras_diferidas.get()
+    if pendientes is not None:
+        pendientes.append(doc)
+        return
+    if buffer_escritura is not None:
+        buffer_escritura.encolar(doc)
+        return
+
+    try:
+        conversaciones.insert_one(doc)
+    except PyMongoError as e:
+        logger.error(f"Error guardando {descripcion}: {e}")
+        logger.error(f"Contenido fallido: {doc}")
+
+
+@asynccontextmanager
+async def escrituras_agrupadas_async():
+    """
+    Agrupa las inserciones hechas dentro del bloque (también desde el ejecutor, que
+    hereda el contexto) y las escribe al salir con un único insert_many asíncrono,
+    o las pasa al buffer de escritura diferida si está activo.
+    """
+    pendientes: list = []
+    token = _escrituras_diferidas.set(pendientes)
+    try:
+        yield
+    finally:
+        _escrituras_diferidas.reset(token)
+        if pendientes and buffer_escritura is not None:
+            for doc in pendientes:
+                buffer_escritura.encolar(doc)
+        elif pendientes:
+            try:
+                await _coleccion_async().insert_many(pendientes, ordered=False)
+            except PyMongoError as e:
+                logger.error(f"Error guardando {len(pendientes)} interacciones: {e}")
+
+
+def estadisticas_escritura() -> dict:
+    if buffer_escritura is None:
+        return {"activo": False}
+    return buffer_escritura.estadisticas()
+
+
+def vaciar_escrituras_pendientes() -> None:
+    """Guarda todo lo que quede en el buffer de escritura diferida (al apagar el servicio)."""
+    if buffer_escritura is not None:
+        buffer_escritura.detener()
+
+
+async def cerrar_cliente_async() -> None:
+    global _cliente_async
+    if _cliente_async is not None:
+        await _cliente_async.close()
+        _cliente_async = None
+
 
 def guardar_interaccion(
     texto: str,
     respuesta: str,
     emocion: str,
-    session_id: str,
+    session_id: Optional[str] = None,
     guardar_texto_original: bool = False
 ) -> None:
     doc = {
@@ -36,10 +129,7 @@ def guardar_interaccion(
     if guardar_texto_original:
         doc["mensaje_usuario"] = texto
 
-    try:
-        conversaciones.insert_one(doc)
-    except PyMongoError as e:
-        logger.error(f"Error guardando interacción simple: {e}")
+    _insertar(doc, "interacción simple")
 
 
 def guardar_interaccion_completa(
@@ -81,16 +171,55 @@ def guardar_interaccion_completa(
         "timestamp": datetime.now(timezone.utc)
     }
 
+    _insertar(doc, "interacción completa")
+
+
+# Índice compuesto con el que se sirve el historial de una sesión ya ordenado
+# (el mismo que crea el backend, que además pagina por (timestamp, _id))
+INDICE_HISTORIAL = [("session_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]
+PROYECCION_HISTORIAL = {"_id": 0, "pregunta": 1, "respuesta_hash": 1}
+
+
+def _etapas_plan(plan) -> set:
+    """Todas las etapas ("stage") de un plan de explain(), a cualquier profundidad."""
+    etapas = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            etapas.add(plan["stage"])
+        for valor in plan.values():
+            etapas |= _etapas_plan(valor)
+    elif isinstance(plan, list):
+        for valor in plan:
+            etapas |= _etapas_plan(valor)
+    return etapas
+
+
+def asegurar_indices_historial() -> None:
+    """
+    Crea (si no existe) el índice {session_id: 1, timestamp: 1, _id: 1} y comprueba con
+    explain() que la consulta del historial lo usa. Si el plan vuelve a recorrer
+    la colección entera (COLLSCAN) u ordena en memoria (SORT) lanza RuntimeError.
+    """
     try:
-        conversaciones.insert_one(doc)
+        conversaciones.create_index(INDICE_HISTORIAL)
+        plan = _consulta_historial("__verificacion_indice__").explain()
     except PyMongoError as e:
-        logger.error(f"Error guardando interacción completa: {e}")
-        logger.error(f"Contenido fallido: {doc}")
+        logger.error(f"No se pudo preparar el índice del historial: {e}")
+        return
+
+    etapas = _etapas_plan(plan.get("queryPlanner", {}).get("winningPlan", {}))
+    if etapas & {"COLLSCAN", "SORT"}:
+        raise RuntimeError(
+            f"La consulta del historial no usa el índice {INDICE_HISTORIAL} (etapas: {sorted(etapas)})."
+        )
+
+
+def _consulta_historial(session_id: str):
+    return conversaciones.find({"session_id": session_id}, PROYECCION_HISTORIAL).sort("timestamp", ASCENDING)
 
 
 def obtener_historial_conversacion(session_id: str) -> list:
-    from pymongo import ASCENDING
-    cursor = conversaciones.find({"session_id": session_id}).sort("timestamp", ASCENDING)
+    cursor = _consulta_historial(session_id)
 
     historial = []
     for doc in cursor:
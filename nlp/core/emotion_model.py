@@ -1,8 +1,15 @@
-from typing import Dict
+from typing import Dict, List, Optional
+import os
 import unicodedata
 import re
 import difflib
+import hashlib
+from importlib import metadata
 from pysentimiento import create_analyzer
+from core.micro_batcher import MicroBatcher
+from core import onnx_backend
+from core import inference_pool
+from core.inference_context import memorizado_por_turno
 
 # Emociones compatibles con el sistema
 EMOCIONES_VALIDAS = [
@@ -28,6 +35,13 @@ EMOCIONES_VALIDAS_NORMALIZADAS = [
     for e in EMOCIONES_VALIDAS
 ]
 
+# Número máximo de textos por pasada del modelo en el análisis por lotes
+TAMANO_LOTE_EMOCION = int(os.getenv("EMOTION_BATCH_SIZE", 32))
+
+# Backend de inferencia: "pytorch" (por defecto) u "onnx" (ONNX Runtime, opcionalmente INT8)
+BACKEND_EMOCION = os.getenv("EMOTION_BACKEND", "pytorch").lower()
+CUANTIZAR_ONNX_EMOCION = os.getenv("EMOTION_ONNX_QUANTIZE", "true").lower() in ("1", "true", "yes")
+
 # Carga del modelo de emociones
 try:
     print("Cargando modelo pysentimiento (emotion, lang='es')...")
@@ -39,6 +53,43 @@ except Exception as e:
     traceback.print_exc()
     modelo = None
 
+if modelo is not None and BACKEND_EMOCION == "onnx":
+    if not onnx_backend.onnx_disponible():
+        print("onnxruntime no está instalado. Se mantiene el backend PyTorch para emociones.")
+    else:
+        try:
+            print("Preparando backend ONNX Runtime para el modelo de emociones...")
+            modelo = onnx_backend.ClasificadorOnnx(modelo, cuantizar=CUANTIZAR_ONNX_EMOCION)
+            print("Backend ONNX de emociones listo.")
+        except Exception as e:
+            import traceback
+            print("Error preparando el backend ONNX. Se mantiene PyTorch:")
+            traceback.print_exc()
+
+
+def _huella_modelo() -> str:
+    """
+    Identifica el modelo y el backend que producen los resultados. Forma parte de las
+    claves de caché, así que al cambiar de modelo los resultados anteriores no se leen.
+    EMOTION_MODEL_VERSION permite forzar el cambio (p. ej. al reentrenar con el mismo nombre).
+    """
+    if modelo is None:
+        return "sin-modelo"
+    nombre = getattr(modelo, "nombre_modelo", None)
+    if nombre is None:
+        nombre = getattr(getattr(getattr(modelo, "model", None), "config", None), "name_or_path", "")
+    try:
+        version_libreria = metadata.version("pysentimiento")
+    except metadata.PackageNotFoundError:
+        version_libreria = ""
+    es_onnx = isinstance(modelo, onnx_backend.ClasificadorOnnx)
+    backend = ("onnx-int8" if CUANTIZAR_ONNX_EMOCION else "onnx") if es_onnx else "pytorch"
+    firma = "|".join([nombre, version_libreria, backend, os.getenv("EMOTION_MODEL_VERSION", "")])
+    return hashlib.sha256(firma.encode("utf-8")).hexdigest()[:12]
+
+
+HUELLA_MODELO_EMOCION = _huella_modelo()
+
 
 def limpiar_texto_emocion(texto: str) -> str:
     texto = texto.lower().strip()
@@ -54,45 +105,97 @@ def fallback_por_similitud(emocion_limpia: str) -> str:
     return "desconocido"
 
 
-def analizar_sentimiento(texto: str) -> Dict[str, str]:
-    if not texto.strip():
-        return {
-            "estado_emocional": "desconocido",
-            "confianza": "0%"
-        }
+def _interpretar_resultado(resultado) -> Dict[str, str]:
+    """Convierte la salida de pysentimiento al formato de emoción del sistema."""
+    emocion_detectada = resultado.output.strip().lower()
+    confianza_raw = resultado.probas.get(emocion_detectada, 0.0)
+    confianza = f"{round(confianza_raw * 100)}%"
+
+    emocion_traducida = TRADUCCION_PYSENTIMIENTO.get(emocion_detectada, emocion_detectada)
+    emocion_limpia = limpiar_texto_emocion(emocion_traducida)
+
+    if emocion_limpia in EMOCIONES_VALIDAS_NORMALIZADAS:
+        index = EMOCIONES_VALIDAS_NORMALIZADAS.index(emocion_limpia)
+        emocion_final = EMOCIONES_VALIDAS[index]
+    else:
+        emocion_final = fallback_por_similitud(emocion_limpia)
+
+    return {
+        "estado_emocional": emocion_final,
+        "confianza": confianza
+    }
+
+
+def _predecir_lote(lote: List[str]) -> List[Dict[str, str]]:
+    """Pasada del modelo sobre un lote; con el pool de inferencia activo se ejecuta en un worker."""
+    # Un único texto evita el coste de montar el dataset del predictor por lotes
+    salidas = [modelo.predict(lote[0])] if len(lote) == 1 else modelo.predict(lote)
+    resultados = []
+    for salida in salidas:
+        print(f"[DEBUG] Resultado del modelo: {salida}")
+        resultados.append(_interpretar_resultado(salida))
+    return resultados
+
+
+def analizar_sentimiento_lote(textos: List[str]) -> List[Dict[str, str]]:
+    """
+    Analiza varios textos en lotes de TAMANO_LOTE_EMOCION (con padding dinámico)
+    y devuelve los resultados en el mismo orden que la entrada.
+    """
+    resultados: List[Optional[Dict[str, str]]] = [None] * len(textos)
+
+    # Los textos vacíos no pasan por el modelo
+    pendientes = []
+    for i, texto in enumerate(textos):
+        if not texto.strip():
+            resultados[i] = {
+                "estado_emocional": "desconocido",
+                "confianza": "0%"
+            }
+        else:
+            pendientes.append(i)
 
     if modelo is None:
-        return {
-            "estado_emocional": "error",
-            "confianza": "0%",
-            "detalle": "Modelo no cargado correctamente."
-        }
-
-    try:
-        resultado = modelo.predict(texto)
-        print(f"[DEBUG] Resultado del modelo: {resultado}")
-
-        emocion_detectada = resultado.output.strip().lower()
-        confianza_raw = resultado.probas.get(emocion_detectada, 0.0)
-        confianza = f"{round(confianza_raw * 100)}%"
-
-        emocion_traducida = TRADUCCION_PYSENTIMIENTO.get(emocion_detectada, emocion_detectada)
-        emocion_limpia = limpiar_texto_emocion(emocion_traducida)
-
-        if emocion_limpia in EMOCIONES_VALIDAS_NORMALIZADAS:
-            index = EMOCIONES_VALIDAS_NORMALIZADAS.index(emocion_limpia)
-            emocion_final = EMOCIONES_VALIDAS[index]
-        else:
-            emocion_final = fallback_por_similitud(emocion_limpia)
-
-        return {
-            "estado_emocional": emocion_final,
-            "confianza": confianza
-        }
-
-    except Exception as e:
-        return {
-            "estado_emocional": "error",
-            "confianza": "0%",
-            "detalle": str(e)
-        }
\ No newline at end of file
+        for i in pendientes:
+            resultados[i] = {
+                "estado_emocional": "error",
+                "confianza": "0%",
+                "detalle": "Modelo no cargado correctamente."
+            }
+        return resultados
+
+    for inicio in range(0, len(pendientes), TAMANO_LOTE_EMOCION):
+        indices = pendientes[inicio:inicio + TAMANO_LOTE_EMOCION]
+        lote = [textos[i] for i in indices]
+        try:
+            for i, resultado in zip(indices, inference_pool.ejecutar(_predecir_lote, lote)):
+                resultados[i] = resultado
+        except Exception as e:
+            for i in indices:
+                resultados[i] = {
+                    "estado_emocional": "error",
+                    "confianza": "0%",
+                    "detalle": str(e)
+                }
+
+    return resultados
+
+
+# Micro-batching: agrupa en una sola pasada del modelo los textos que llegan
+# a la vez desde peticiones concurrentes.
+MICROBATCH_ACTIVO = os.getenv("EMOTION_MICROBATCH", "true").lower() in ("1", "true", "yes")
+planificador_emociones = MicroBatcher(
+    analizar_sentimiento_lote,
+    tamano_maximo=int(os.getenv("EMOTION_MICROBATCH_MAX_SIZE", TAMANO_LOTE_EMOCION)),
+    espera_maxima_ms=float(os.getenv("EMOTION_MICROBATCH_MAX_WAIT_MS", 5)),
+    nombre="micro-batcher-emociones",
+    # Un lote en curso por worker de inferencia para que ninguno quede parado
+    despachadores=max(1, inference_pool.INFERENCE_WORKERS)
+) if MICROBATCH_ACTIVO else None
+
+
+@memorizado_por_turno
+def analizar_sentimiento(texto: str) -> Dict[str, str]:
+    if planificador_emociones is None or not texto.strip() or modelo is None:
+        return analizar_sentimiento_lote([texto])[0]
+    return planificador_emociones.enviar(texto).result()
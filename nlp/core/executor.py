@@ -0,0 +1,46 @@
+import os
+import asyncio
+import functools
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# Hilos para el trabajo bloqueante de cada petición (modelos, spaCy, PDF).
+# Está acotado para que la concurrencia no crezca sin límite con la carga.
+NLP_EXECUTOR_WORKERS = int(os.getenv("NLP_EXECUTOR_WORKERS", 8))
+
+_ejecutor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def obtener_ejecutor() -> ThreadPoolExecutor:
+    global _ejecutor
+    if _ejecutor is None:
+        with _lock:
+            if _ejecutor is None:
+                _ejecutor = ThreadPoolExecutor(
+                    max_workers=NLP_EXECUTOR_WORKERS,
+                    thread_name_prefix="nlp-ejecutor"
+                )
+    return _ejecutor
+
+
+async def ejecutar_en_hilo(funcion: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Ejecuta una función bloqueante en el ejecutor acotado sin bloquear el bucle de
+    eventos. Se propaga el contexto actual (sesión del turno, escrituras diferidas...).
+    """
+    loop = asyncio.get_running_loop()
+    contexto = contextvars.copy_context()
+    return await loop.run_in_executor(
+        obtener_ejecutor(), functools.partial(contexto.run, funcion, *args, **kwargs)
+    )
+
+
+def cerrar_ejecutor() -> None:
+    global _ejecutor
+    with _lock:
+        if _ejecutor is not None:
+            _ejecutor.shutdown(wait=True)
+            _ejecutor = None
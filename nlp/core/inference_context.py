@@ -0,0 +1,48 @@
+import copy
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Optional
+
+# Memo de resultados de los modelos para el turno (petición) en curso.
+# Es None fuera de un contexto de inferencia: en ese caso no se memoriza nada.
+_memo_turno: ContextVar[Optional[dict]] = ContextVar("memo_inferencia_turno", default=None)
+
+
+@contextmanager
+def contexto_inferencia():
+    """
+    Abre un memo de inferencias para un turno de conversación. Dentro del bloque,
+    cada texto distinto se pasa por cada modelo como mucho una vez; el flujo, la
+    capa de base de datos y las utilidades de empatía comparten los resultados.
+    Si ya hay un contexto abierto (llamadas anidadas) se reutiliza.
+    """
+    if _memo_turno.get() is not None:
+        yield
+        return
+
+    token = _memo_turno.set({})
+    try:
+        yield
+    finally:
+        _memo_turno.reset(token)
+
+
+def memorizado_por_turno(funcion: Callable) -> Callable:
+    """
+    Decorador para funciones de inferencia de un único argumento de texto.
+    Devuelve una copia del resultado memorizado para que quien llama pueda
+    modificarlo sin afectar al resto del turno.
+    """
+    @wraps(funcion)
+    def envoltura(texto):
+        memo = _memo_turno.get()
+        if memo is None:
+            return funcion(texto)
+
+        clave = (funcion.__module__, funcion.__qualname__, texto)
+        if clave not in memo:
+            memo[clave] = funcion(texto)
+        return copy.deepcopy(memo[clave])
+
+    return envoltura
@@ -0,0 +1,120 @@
+import os
+import signal
+import logging
+import threading
+import multiprocessing
+from typing import Any, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Procesos de inferencia. Con 0 los modelos se ejecutan en el propio proceso de la API.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 0))
+
+# Hilos de torch / ONNX Runtime por worker; por defecto se reparten los núcleos
+# entre los workers para no sobresuscribir la CPU
+INFERENCE_TORCH_THREADS = int(os.getenv(
+    "INFERENCE_TORCH_THREADS",
+    max(1, (os.cpu_count() or 1) // max(1, INFERENCE_WORKERS))
+))
+
+# Tiempo máximo de espera por una tarea (un worker que muere no devuelve nunca su resultado)
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", 30))
+
+_pool = None
+_lock = threading.Lock()
+
+# True dentro de un worker: las llamadas se ejecutan ahí mismo, sin volver al pool
+_en_worker = False
+
+# Funciones que cada worker ejecuta al arrancar (p. ej. reabrir sesiones de ONNX Runtime,
+# cuyos hilos internos no sobreviven al fork)
+_inicializadores_worker: List[Callable[[int], None]] = []
+
+
+def registrar_inicializador_worker(funcion: Callable[[int], None]) -> None:
+    """Registra una función que recibe el número de hilos y se ejecuta en cada worker al arrancar."""
+    _inicializadores_worker.append(funcion)
+
+
+def _inicializar_worker(hilos: int) -> None:
+    global _en_worker
+    _en_worker = True
+
+    # Los manejadores de señales heredados son los del servidor; el worker termina
+    # cuando el proceso principal cierra el pool
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    try:
+        import torch
+        torch.set_num_threads(hilos)
+    except ImportError:
+        pass
+
+    for funcion in _inicializadores_worker:
+        try:
+            funcion(hilos)
+        except Exception as e:
+            logger.error(f"Error inicializando el worker de inferencia {os.getpid()}: {e}")
+
+
+def iniciar_pool_inferencia(precargar: Iterable[Callable[[], Any]] = ()) -> None:
+    """
+    Arranca INFERENCE_WORKERS procesos por fork. Debe llamarse con los modelos ya
+    cargados y antes de atender peticiones: los pesos se comparten copia-en-escritura
+    y el proceso principal no ejecuta inferencia mientras el pool está activo.
+    `precargar` son cargas diferidas (p. ej. spaCy) que conviene hacer antes del fork.
+    """
+    global _pool
+    if INFERENCE_WORKERS <= 0 or _en_worker:
+        return
+
+    with _lock:
+        if _pool is not None:
+            return
+        for funcion in precargar:
+            funcion()
+        contexto = multiprocessing.get_context("fork")
+        _pool = contexto.Pool(
+            processes=INFERENCE_WORKERS,
+            initializer=_inicializar_worker,
+            initargs=(INFERENCE_TORCH_THREADS,)
+        )
+    logger.info(
+        f"Pool de inferencia iniciado: {INFERENCE_WORKERS} procesos, "
+        f"{INFERENCE_TORCH_THREADS} hilos por proceso."
+    )
+
+
+def ejecutar(funcion: Callable, *args) -> Any:
+    """
+    Ejecuta `funcion(*args)` en un worker del pool y devuelve su resultado. Sin pool
+    (o desde un worker) se ejecuta en el proceso actual. `funcion` debe estar
+    definida a nivel de módulo para poder enviarse al worker.
+    """
+    pool = _pool
+    if pool is None or _en_worker:
+        return funcion(*args)
+    try:
+        return pool.apply_async(funcion, args).get(timeout=INFERENCE_TIMEOUT_SECONDS)
+    except multiprocessing.TimeoutError:
+        raise TimeoutError(
+            f"El pool de inferencia no respondió en {INFERENCE_TIMEOUT_SECONDS:g} s ({funcion.__qualname__})."
+        )
+
+
+def estadisticas_pool_inferencia() -> dict:
+    return {
+        "activo": _pool is not None,
+        "workers": INFERENCE_WORKERS if _pool is not None else 0,
+        "hilos_por_worker": INFERENCE_TORCH_THREADS
+    }
+
+
+def cerrar_pool_inferencia() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+        pool.join()
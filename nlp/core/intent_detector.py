@@ -1,10 +1,53 @@
 import unicodedata
 import re
-from typing import Literal
-from sentence_transformers import SentenceTransformer, util
+import os
+import json
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import Literal, Optional
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from core import onnx_backend
+from core import inference_pool
+
+logger = logging.getLogger(__name__)
 
 # Modelo de similitud semántica
-modelo_similitud = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+MODELO_SIMILITUD = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# Backend de inferencia: "pytorch" (por defecto) u "onnx" (ONNX Runtime, opcionalmente INT8)
+BACKEND_INTENCION = os.getenv("INTENT_BACKEND", "pytorch").lower()
+CUANTIZAR_ONNX_INTENCION = os.getenv("INTENT_ONNX_QUANTIZE", "true").lower() in ("1", "true", "yes")
+
+modelo_similitud = None
+if BACKEND_INTENCION == "onnx":
+    if not onnx_backend.onnx_disponible():
+        print("onnxruntime no está instalado. Se usa el backend PyTorch para intenciones.")
+    else:
+        try:
+            modelo_similitud = onnx_backend.CodificadorOnnx.cargar(
+                MODELO_SIMILITUD, cuantizar=CUANTIZAR_ONNX_INTENCION
+            )
+        except Exception as e:
+            print(f"Error preparando el backend ONNX de intenciones. Se usa PyTorch: {e}")
+    if modelo_similitud is None:
+        BACKEND_INTENCION = "pytorch"
+
+if modelo_similitud is None:
+    modelo_similitud = SentenceTransformer(MODELO_SIMILITUD)
+
+# Identifica el codificador en uso (los embeddings del backend cuantizado difieren ligeramente)
+HUELLA_CODIFICADOR = f"{MODELO_SIMILITUD}:{BACKEND_INTENCION}" + (
+    ":int8" if BACKEND_INTENCION == "onnx" and CUANTIZAR_ONNX_INTENCION else ""
+)
+
+# Directorio donde se persisten los embeddings prototipo (compartido entre workers y reinicios)
+PROTOTIPOS_DIR = os.getenv(
+    "INTENT_EMBEDDINGS_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "huggingface", "prototipos_intencion")
+)
 
 # Frases comunes afirmativas y negativas
 EXPRESIONES_AFIRMATIVAS = [
@@ -30,6 +73,79 @@ EXPRESIONES_NEGATIVAS = [
 
 DEBUG = False
 
+# Umbral mínimo de similitud para aceptar una intención por vía semántica
+UMBRAL_SIMILITUD = 0.70
+
+# -------- Embeddings prototipo de las expresiones --------
+# Matriz (afirmativas + negativas) x dimensión, normalizada y contigua.
+# Se obtiene una sola vez, en el primer uso o mediante precalcular_prototipos(),
+# y se persiste en PROTOTIPOS_DIR como .npy mapeado en memoria.
+_prototipos: Optional[np.ndarray] = None
+_lock_prototipos = threading.Lock()
+
+
+def _codificar_en_proceso(textos) -> np.ndarray:
+    return modelo_similitud.encode(textos, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def _codificar(textos) -> np.ndarray:
+    # Con el pool de inferencia activo el modelo se ejecuta en un worker
+    return inference_pool.ejecutar(_codificar_en_proceso, textos)
+
+
+def _ruta_prototipos(frases: list) -> str:
+    """
+    Ruta del fichero .npy para el modelo y las listas de frases actuales.
+    Si cambian las frases o el modelo cambia el hash y se reconstruye.
+    """
+    huella = hashlib.sha256(
+        json.dumps([HUELLA_CODIFICADOR, frases, len(EXPRESIONES_AFIRMATIVAS)], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:16]
+    nombre_modelo = MODELO_SIMILITUD.replace("/", "__")
+    return os.path.join(PROTOTIPOS_DIR, f"{nombre_modelo}-{huella}.npy")
+
+
+def _cargar_o_construir_prototipos(frases: list) -> np.ndarray:
+    """
+    Carga los embeddings desde disco con mmap (las páginas se comparten entre procesos)
+    o los calcula y los guarda de forma atómica si aún no existen.
+    """
+    ruta = _ruta_prototipos(frases)
+    try:
+        prototipos = np.load(ruta, mmap_mode="r")
+        if prototipos.shape[0] == len(frases):
+            return prototipos
+        logger.warning(f"Prototipos de intención inconsistentes en {ruta}. Se recalculan.")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"No se pudieron cargar los prototipos de intención desde {ruta}: {e}")
+
+    prototipos = np.ascontiguousarray(_codificar(frases), dtype=np.float32)
+    try:
+        os.makedirs(PROTOTIPOS_DIR, exist_ok=True)
+        ruta_temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(ruta_temporal, "wb") as f:
+            np.save(f, prototipos)
+        os.replace(ruta_temporal, ruta)
+        return np.load(ruta, mmap_mode="r")
+    except OSError as e:
+        logger.warning(f"No se pudieron guardar los prototipos de intención en {ruta}: {e}")
+        return prototipos
+
+
+def precalcular_prototipos() -> np.ndarray:
+    """
+    Devuelve la matriz de embeddings de EXPRESIONES_AFIRMATIVAS seguidas de
+    EXPRESIONES_NEGATIVAS, cargándola de disco o codificándola solo la primera vez.
+    """
+    global _prototipos
+    if _prototipos is None:
+        with _lock_prototipos:
+            if _prototipos is None:
+                _prototipos = _cargar_o_construir_prototipos(EXPRESIONES_AFIRMATIVAS + EXPRESIONES_NEGATIVAS)
+    return _prototipos
+
 # Limpieza y normalización básica del texto
 def normalizar_texto(texto: str) -> str:
     texto = unicodedata.normalize("NFD", texto)
@@ -41,6 +157,66 @@ def normalizar_texto(texto: str) -> str:
 def contiene_frase_completa(texto: str, frase: str) -> bool:
     return re.search(rf"\b{re.escape(frase)}\b", texto) is not None
 
+# Una única alternancia por polaridad, equivalente a aplicar contiene_frase_completa
+# con cada frase. Las más largas van primero para que el motor pruebe antes las más específicas.
+def _compilar_patron(frases: list) -> "re.Pattern":
+    alternativas = "|".join(re.escape(frase) for frase in sorted(set(frases), key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternativas})\b")
+
+CONJUNTO_AFIRMATIVAS = frozenset(EXPRESIONES_AFIRMATIVAS)
+CONJUNTO_NEGATIVAS = frozenset(EXPRESIONES_NEGATIVAS)
+PATRON_AFIRMATIVAS = _compilar_patron(EXPRESIONES_AFIRMATIVAS)
+PATRON_NEGATIVAS = _compilar_patron(EXPRESIONES_NEGATIVAS)
+
+# -------- Caché LRU de decisiones por texto normalizado --------
+TAMANO_CACHE_INTENCION = int(os.getenv("INTENT_CACHE_SIZE", 2048))
+
+def _firma_configuracion() -> int:
+    """Huella barata de las listas de frases y del umbral vigentes."""
+    return hash((tuple(EXPRESIONES_AFIRMATIVAS), tuple(EXPRESIONES_NEGATIVAS), UMBRAL_SIMILITUD))
+
+_firma_actual = _firma_configuracion()
+_lock_configuracion = threading.Lock()
+
+
+def _sincronizar_configuracion() -> None:
+    """
+    Si las listas de frases o el umbral han cambiado, recompila los patrones,
+    descarta los prototipos y vacía la caché de decisiones.
+    """
+    global _firma_actual, _prototipos
+    global CONJUNTO_AFIRMATIVAS, CONJUNTO_NEGATIVAS, PATRON_AFIRMATIVAS, PATRON_NEGATIVAS
+
+    if _firma_configuracion() == _firma_actual:
+        return
+    with _lock_configuracion:
+        firma = _firma_configuracion()
+        if firma == _firma_actual:
+            return
+        CONJUNTO_AFIRMATIVAS = frozenset(EXPRESIONES_AFIRMATIVAS)
+        CONJUNTO_NEGATIVAS = frozenset(EXPRESIONES_NEGATIVAS)
+        PATRON_AFIRMATIVAS = _compilar_patron(EXPRESIONES_AFIRMATIVAS)
+        PATRON_NEGATIVAS = _compilar_patron(EXPRESIONES_NEGATIVAS)
+        with _lock_prototipos:
+            _prototipos = None
+        _detectar_intencion_normalizada.cache_clear()
+        _firma_actual = firma
+
+
+def obtener_estadisticas_cache_intencion() -> dict:
+    """Aciertos, fallos y ocupación de la caché de intenciones del proceso actual."""
+    info = _detectar_intencion_normalizada.cache_info()
+    return {
+        "aciertos": info.hits,
+        "fallos": info.misses,
+        "tamano": info.currsize,
+        "capacidad": info.maxsize
+    }
+
+
+def limpiar_cache_intencion() -> None:
+    _detectar_intencion_normalizada.cache_clear()
+
 # Detección de intención afirmativa, negativa o desconocida
 def detectar_intencion(texto_usuario: str) -> Literal["afirmativo", "negativo", "desconocido"]:
     if not texto_usuario:
@@ -52,35 +228,43 @@ def detectar_intencion(texto_usuario: str) -> Literal["afirmativo", "negativo",
         print(f"[DEBUG] Texto original: {texto_usuario}")
         print(f"[DEBUG] Texto normalizado: {texto_normalizado}")
 
+    _sincronizar_configuracion()
+    return _detectar_intencion_normalizada(texto_normalizado, _firma_actual)
+
+
+# La firma forma parte de la clave para que una decisión calculada con la
+# configuración anterior nunca se sirva tras un cambio, aunque llegue tarde.
+@lru_cache(maxsize=TAMANO_CACHE_INTENCION)
+def _detectar_intencion_normalizada(texto_normalizado: str, firma: int) -> Literal["afirmativo", "negativo", "desconocido"]:
     # Coincidencia exacta
-    if texto_normalizado in EXPRESIONES_AFIRMATIVAS:
+    if texto_normalizado in CONJUNTO_AFIRMATIVAS:
         return "afirmativo"
-    if texto_normalizado in EXPRESIONES_NEGATIVAS:
+    if texto_normalizado in CONJUNTO_NEGATIVAS:
         return "negativo"
 
-    # Coincidencia por inclusión
-    for frase in EXPRESIONES_AFIRMATIVAS:
-        if contiene_frase_completa(texto_normalizado, frase):
-            return "afirmativo"
-    for frase in EXPRESIONES_NEGATIVAS:
-        if contiene_frase_completa(texto_normalizado, frase):
-            return "negativo"
+    # Coincidencia por inclusión (las afirmativas tienen prioridad)
+    if PATRON_AFIRMATIVAS.search(texto_normalizado):
+        return "afirmativo"
+    if PATRON_NEGATIVAS.search(texto_normalizado):
+        return "negativo"
 
-    # Similaridad semántica
-    emb_usuario = modelo_similitud.encode(texto_normalizado, convert_to_tensor=True)
-    emb_afirmativas = modelo_similitud.encode(EXPRESIONES_AFIRMATIVAS, convert_to_tensor=True)
-    emb_negativas = modelo_similitud.encode(EXPRESIONES_NEGATIVAS, convert_to_tensor=True)
+    # Similaridad semántica: un único producto matriz-vector contra los prototipos
+    # (los embeddings están normalizados, así que equivale a la similitud coseno)
+    prototipos = precalcular_prototipos()
+    emb_usuario = _codificar(texto_normalizado)
+    similitudes = prototipos @ emb_usuario
 
-    sim_afirmativa = util.pytorch_cos_sim(emb_usuario, emb_afirmativas).max().item()
-    sim_negativa = util.pytorch_cos_sim(emb_usuario, emb_negativas).max().item()
+    n_afirmativas = len(EXPRESIONES_AFIRMATIVAS)
+    sim_afirmativa = float(similitudes[:n_afirmativas].max())
+    sim_negativa = float(similitudes[n_afirmativas:].max())
 
     if DEBUG:
         print(f"[DEBUG] Similitud afirmativa: {sim_afirmativa:.4f}")
         print(f"[DEBUG] Similitud negativa: {sim_negativa:.4f}")
 
-    if sim_afirmativa > sim_negativa and sim_afirmativa > 0.70:
+    if sim_afirmativa > sim_negativa and sim_afirmativa > UMBRAL_SIMILITUD:
         return "afirmativo"
-    elif sim_negativa > sim_afirmativa and sim_negativa > 0.70:
+    elif sim_negativa > sim_afirmativa and sim_negativa > UMBRAL_SIMILITUD:
         return "negativo"
 
     return "desconocido"
@@ -0,0 +1,114 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Marca interna para detener el hilo de despacho
+_FIN = object()
+
+
+class MicroBatcher:
+    """
+    Agrupa peticiones individuales de varios hilos en un único lote.
+
+    Cada llamada a enviar() encola un elemento y devuelve un Future. Un hilo de
+    despacho vacía la cola cuando se alcanza `tamano_maximo` elementos o cuando
+    han pasado `espera_maxima_ms` desde el primero, llama a `procesar_lote` con
+    todos ellos y resuelve cada Future con su resultado (mismo orden).
+
+    Con `despachadores` > 1 varios hilos comparten la cola y puede haber otros
+    tantos lotes en curso a la vez (p. ej. uno por worker del pool de inferencia).
+    """
+
+    def __init__(
+        self,
+        procesar_lote: Callable[[List[Any]], List[Any]],
+        tamano_maximo: int = 32,
+        espera_maxima_ms: float = 5.0,
+        nombre: str = "micro-batcher",
+        despachadores: int = 1
+    ):
+        self._procesar_lote = procesar_lote
+        self.tamano_maximo = max(1, tamano_maximo)
+        self.espera_maxima = max(0.0, espera_maxima_ms) / 1000
+        self.nombre = nombre
+        self.despachadores = max(1, despachadores)
+        self._cola: "queue.Queue" = queue.Queue()
+        self._hilos: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def enviar(self, elemento: Any) -> Future:
+        """Encola un elemento y devuelve el Future con su resultado."""
+        futuro: Future = Future()
+        self._asegurar_hilo()
+        self._cola.put((elemento, futuro))
+        return futuro
+
+    def detener(self) -> None:
+        """Procesa lo pendiente y detiene los hilos de despacho."""
+        with self._lock:
+            hilos, self._hilos = self._hilos, []
+        # Cada hilo consume una marca de fin
+        for _ in hilos:
+            self._cola.put(_FIN)
+        for hilo in hilos:
+            hilo.join()
+
+    # Los hilos se arrancan en el primer uso para no crearlos en procesos que nunca
+    # reciben peticiones (o antes de un fork).
+    def _asegurar_hilo(self) -> None:
+        if len(self._hilos) == self.despachadores and all(h.is_alive() for h in self._hilos):
+            return
+        with self._lock:
+            self._hilos = [h for h in self._hilos if h.is_alive()]
+            while len(self._hilos) < self.despachadores:
+                hilo = threading.Thread(
+                    target=self._bucle, name=f"{self.nombre}-{len(self._hilos)}", daemon=True
+                )
+                hilo.start()
+                self._hilos.append(hilo)
+
+    def _recoger_lote(self, primero) -> tuple:
+        lote = [primero]
+        limite = time.monotonic() + self.espera_maxima
+        detener = False
+        while len(lote) < self.tamano_maximo:
+            restante = limite - time.monotonic()
+            try:
+                elemento = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if elemento is _FIN:
+                detener = True
+                break
+            lote.append(elemento)
+        return lote, detener
+
+    def _bucle(self) -> None:
+        while True:
+            primero = self._cola.get()
+            if primero is _FIN:
+                return
+
+            lote, detener = self._recoger_lote(primero)
+            elementos = [elemento for elemento, _ in lote]
+            try:
+                resultados = self._procesar_lote(elementos)
+                if len(resultados) != len(lote):
+                    raise RuntimeError(
+                        f"Se esperaban {len(lote)} resultados y se obtuvieron {len(resultados)}"
+                    )
+                for (_, futuro), resultado in zip(lote, resultados):
+                    futuro.set_result(resultado)
+            except Exception as e:
+                logger.error(f"Error procesando lote en {self.nombre}: {e}")
+                for _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+
+            if detener:
+                return
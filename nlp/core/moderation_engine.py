@@ -0,0 +1,139 @@
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, List, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class Coincidencia:
+    """Término encontrado y su posición [inicio, fin) en el texto original."""
+    termino: str
+    inicio: int
+    fin: int
+
+
+def _normalizar_caracter(caracter: str, plegar_acentos: bool) -> str:
+    caracter = caracter.casefold()
+    if plegar_acentos:
+        caracter = "".join(
+            c for c in unicodedata.normalize("NFD", caracter) if not unicodedata.combining(c)
+        )
+    return caracter
+
+
+def _es_palabra(caracter: str) -> bool:
+    return caracter.isalnum() or caracter == "_"
+
+
+class MotorModeracion:
+    """
+    Autómata de Aho-Corasick sobre una lista de términos prohibidos. Recorre el
+    texto una sola vez con coste constante (amortizado) por carácter, sea cual
+    sea el tamaño de la lista.
+
+    - La comparación ignora mayúsculas (casefold), igual que la lista cargada.
+    - `plegar_acentos`: "estupido" coincide con "estúpido" y viceversa.
+    - `limites_palabra`: solo cuenta coincidencias de palabras completas
+      ("odio" no coincide dentro de "podio").
+    """
+
+    def __init__(self, terminos: Iterable[str], limites_palabra: bool = False, plegar_acentos: bool = False):
+        self.limites_palabra = limites_palabra
+        self.plegar_acentos = plegar_acentos
+        self.terminos: List[str] = []
+        self._longitudes: List[int] = []
+
+        # Estado 0 = raíz. _transiciones[estado] = {carácter: estado siguiente}
+        self._transiciones: List[dict] = [{}]
+        self._fallo: List[int] = [0]
+        self._salidas: List[Tuple[int, ...]] = [()]
+
+        vistos = {}
+        for termino in terminos:
+            normalizado = "".join(_normalizar_caracter(c, plegar_acentos) for c in termino.strip())
+            if not normalizado or normalizado in vistos:
+                continue
+            vistos[normalizado] = len(self.terminos)
+            self.terminos.append(termino.strip())
+            self._longitudes.append(len(normalizado))
+            self._insertar(normalizado, vistos[normalizado])
+        self._construir_enlaces_fallo()
+
+    def __len__(self) -> int:
+        return len(self.terminos)
+
+    # -------- Construcción --------
+    def _insertar(self, normalizado: str, indice: int) -> None:
+        estado = 0
+        for caracter in normalizado:
+            siguiente = self._transiciones[estado].get(caracter)
+            if siguiente is None:
+                siguiente = len(self._transiciones)
+                self._transiciones.append({})
+                self._fallo.append(0)
+                self._salidas.append(())
+                self._transiciones[estado][caracter] = siguiente
+            estado = siguiente
+        self._salidas[estado] += (indice,)
+
+    def _construir_enlaces_fallo(self) -> None:
+        # Recorrido en anchura: el enlace de fallo de un estado apunta al sufijo propio
+        # más largo que también es prefijo de algún término; sus salidas se heredan.
+        cola = deque(self._transiciones[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self._transiciones[estado].items():
+                fallo = self._fallo[estado]
+                while fallo and caracter not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._transiciones[fallo].get(caracter, 0)
+                self._fallo[siguiente] = destino if destino != siguiente else 0
+                self._salidas[siguiente] += self._salidas[self._fallo[siguiente]]
+                cola.append(siguiente)
+
+    # -------- Búsqueda --------
+    def _normalizar_texto(self, texto: str) -> Tuple[str, Sequence[int]]:
+        """Texto normalizado y, para cada carácter, su posición en el texto original."""
+        # Caso habitual: la normalización no cambia la longitud y las posiciones coinciden
+        if texto.isascii():
+            return texto.lower(), range(len(texto))
+        if not self.plegar_acentos:
+            normalizado = texto.casefold()
+            if len(normalizado) == len(texto):
+                return normalizado, range(len(texto))
+
+        caracteres, posiciones = [], []
+        for i, caracter in enumerate(texto):
+            normalizado = _normalizar_caracter(caracter, self.plegar_acentos)
+            caracteres.append(normalizado)
+            posiciones.extend([i] * len(normalizado))
+        return "".join(caracteres), posiciones
+
+    def _recorrer(self, texto: str):
+        normalizado, posiciones = self._normalizar_texto(texto)
+        transiciones, fallo, salidas = self._transiciones, self._fallo, self._salidas
+        estado = 0
+        for fin, caracter in enumerate(normalizado):
+            while estado and caracter not in transiciones[estado]:
+                estado = fallo[estado]
+            estado = transiciones[estado].get(caracter, 0)
+            for indice in salidas[estado]:
+                inicio = fin - self._longitudes[indice] + 1
+                if self.limites_palabra and not (
+                    (inicio == 0 or not _es_palabra(normalizado[inicio - 1]))
+                    and (fin + 1 == len(normalizado) or not _es_palabra(normalizado[fin + 1]))
+                ):
+                    continue
+                yield Coincidencia(self.terminos[indice], posiciones[inicio], posiciones[fin] + 1)
+
+    def buscar(self, texto: str) -> List[Coincidencia]:
+        """Todas las coincidencias (incluidas las solapadas), ordenadas por posición final."""
+        if not texto or not self.terminos:
+            return []
+        return list(self._recorrer(texto))
+
+    def contiene(self, texto: str) -> bool:
+        """True en cuanto aparece el primer término (no recorre el resto del texto)."""
+        if not texto or not self.terminos:
+            return False
+        return next(self._recorrer(texto), None) is not None
@@ -1,14 +1,39 @@
 import os
-from typing import Set
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+import redis
+
+from core.moderation_engine import Coincidencia, MotorModeracion
+from core.redis_pool import obtener_cliente, notificar_error
+
+logger = logging.getLogger(__name__)
 
 # Ruta al archivo que contiene las palabras prohibidas
 RUTA_LISTA: str = os.path.join(os.path.dirname(__file__), "palabras_prohibidas.txt")
 
+# Modos opcionales del motor: solo palabras completas y comparación sin acentos
+LIMITES_PALABRA: bool = os.getenv("MODERATION_WORD_BOUNDARIES", "false").lower() in ("1", "true", "yes")
+PLEGAR_ACENTOS: bool = os.getenv("MODERATION_FOLD_ACCENTS", "false").lower() in ("1", "true", "yes")
+
+# Recarga en caliente: cada cuántos segundos se revisa la fuente de la lista (0 = nunca).
+# Si se define la clave de Redis y existe, su contenido (un término por línea) tiene
+# prioridad sobre el archivo; así un cambio llega a todos los workers a la vez.
+INTERVALO_RECARGA: float = float(os.getenv("MODERATION_RELOAD_INTERVAL_SECONDS", 5))
+CLAVE_REDIS_LEXICO: str = os.getenv("MODERATION_LEXICON_REDIS_KEY", "")
+
+def _terminos_desde_texto(contenido: str) -> Set[str]:
+    return {line.strip().casefold() for line in contenido.splitlines() if line.strip()}
+
 def cargar_palabras_prohibidas() -> Set[str]:
     """Carga palabras ofensivas o peligrosas desde archivo de texto."""
     try:
         with open(RUTA_LISTA, "r", encoding="utf-8") as f:
-            return {line.strip().casefold() for line in f if line.strip()}
+            return _terminos_desde_texto(f.read())
     except FileNotFoundError:
         print(f"Archivo de palabras prohibidas no encontrado en {RUTA_LISTA}. Se cargará lista vacía.")
         return set()
@@ -16,12 +41,144 @@ def cargar_palabras_prohibidas() -> Set[str]:
         print(f"Error cargando palabras prohibidas: {str(e)}")
         return set()
 
-# Lista cargada una sola vez al inicio
-PALABRAS_PROHIBIDAS: Set[str] = cargar_palabras_prohibidas()
+
+@dataclass(frozen=True)
+class InstantaneaLexico:
+    """Lista compilada e inmutable; `version` identifica su contenido y modos."""
+    version: str
+    motor: MotorModeracion
+    origen: str
+    cargada_en: float
+
+    @property
+    def terminos(self) -> List[str]:
+        return self.motor.terminos
+
+
+def _version(terminos: Set[str]) -> str:
+    contenido = "\n".join(sorted(terminos)) + f"\n{LIMITES_PALABRA}:{PLEGAR_ACENTOS}"
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:12]
+
+
+class GestorLexico:
+    """
+    Mantiene la instantánea vigente de la lista de palabras prohibidas. Un hilo
+    revisa la fuente periódicamente y, si cambia, compila la nueva lista fuera de
+    las peticiones y la sustituye con una sola asignación: cada petición usa de
+    principio a fin la instantánea que leyó, sin bloqueos.
+    """
+
+    def __init__(self):
+        self._firma_fuente = None
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        terminos, origen, self._firma_fuente = self._leer_fuente(inicial=True)
+        self._instantanea = self._compilar(terminos, origen)
+
+    @property
+    def instantanea(self) -> InstantaneaLexico:
+        self._asegurar_vigilancia()
+        return self._instantanea
+
+    # -------- Fuentes --------
+    def _leer_fuente(self, inicial: bool = False) -> Tuple[Optional[Set[str]], str, object]:
+        """(términos, origen, firma). Términos es None si la fuente no ha cambiado."""
+        if CLAVE_REDIS_LEXICO:
+            redis_client = obtener_cliente()
+            if not redis_client and not inicial:
+                # Redis caído (o en espera tras un fallo): se mantiene la lista actual
+                # en vez de cambiar a la del archivo y volver al recuperarse
+                return None, "", self._firma_fuente
+            if redis_client:
+                try:
+                    contenido = redis_client.get(CLAVE_REDIS_LEXICO)
+                    if contenido is not None:
+                        firma = ("redis", hashlib.sha256(contenido.encode("utf-8")).hexdigest())
+                        if firma == self._firma_fuente and not inicial:
+                            return None, "", firma
+                        return _terminos_desde_texto(contenido), f"redis:{CLAVE_REDIS_LEXICO}", firma
+                except redis.exceptions.RedisError as e:
+                    notificar_error(e)
+                    logger.warning(f"No se pudo leer la lista de moderación de Redis: {e}")
+                    if not inicial:
+                        return None, "", self._firma_fuente
+
+        try:
+            estado = os.stat(RUTA_LISTA)
+            firma = ("archivo", estado.st_mtime_ns, estado.st_size)
+        except OSError:
+            firma = ("archivo", None)
+        if firma == self._firma_fuente and not inicial:
+            return None, "", firma
+        if firma[1] is None and not inicial:
+            # Si el archivo desaparece se mantiene la última lista válida
+            logger.error(f"Archivo de palabras prohibidas no encontrado en {RUTA_LISTA}. Se mantiene la lista actual.")
+            return None, "", firma
+        return cargar_palabras_prohibidas(), f"archivo:{RUTA_LISTA}", firma
+
+    def _compilar(self, terminos: Set[str], origen: str) -> InstantaneaLexico:
+        motor = MotorModeracion(terminos, limites_palabra=LIMITES_PALABRA, plegar_acentos=PLEGAR_ACENTOS)
+        return InstantaneaLexico(_version(terminos), motor, origen, time.time())
+
+    # -------- Recarga --------
+    def recargar(self) -> bool:
+        """Relee la fuente y, si ha cambiado, activa la nueva instantánea. Devuelve si cambió."""
+        with self._lock:
+            terminos, origen, firma = self._leer_fuente()
+            self._firma_fuente = firma
+            if terminos is None:
+                return False
+            nueva = self._compilar(terminos, origen)
+            anterior = self._instantanea
+            if nueva.version == anterior.version:
+                return False
+            self._instantanea = nueva
+        logger.info(
+            f"Lista de moderación actualizada: versión {anterior.version} -> {nueva.version} "
+            f"({len(nueva.motor)} términos, {origen})."
+        )
+        return True
+
+    # El hilo se arranca en el primer uso para no crearlo antes del fork de los workers
+    def _asegurar_vigilancia(self) -> None:
+        if INTERVALO_RECARGA <= 0 or (self._hilo is not None and self._hilo.is_alive()):
+            return
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._vigilar, name="recarga-moderacion", daemon=True)
+                self._hilo.start()
+
+    def _vigilar(self) -> None:
+        while True:
+            time.sleep(INTERVALO_RECARGA)
+            try:
+                self.recargar()
+            except Exception as e:
+                logger.error(f"Error recargando la lista de moderación: {e}")
+
+    def estadisticas(self) -> dict:
+        instantanea = self._instantanea
+        return {
+            "version": instantanea.version,
+            "terminos": len(instantanea.motor),
+            "origen": instantanea.origen,
+            "cargada_en": instantanea.cargada_en
+        }
+
+
+gestor_lexico = GestorLexico()
+
+def obtener_lexico() -> InstantaneaLexico:
+    return gestor_lexico.instantanea
+
+def detectar_lenguaje_inapropiado(texto: str) -> List[Coincidencia]:
+    """Devuelve las palabras prohibidas encontradas y su posición en el texto."""
+    return obtener_lexico().motor.buscar(texto)
 
 def contiene_lenguaje_inapropiado(texto: str) -> bool:
     """Verifica si el texto contiene alguna palabra prohibida."""
-    if not texto:
+    lexico = obtener_lexico()
+    if not lexico.motor.contiene(texto):
         return False
-    texto_limpio = texto.strip().casefold()
-    return any(palabra in texto_limpio for palabra in PALABRAS_PROHIBIDAS)
+    logger.info(f"Mensaje bloqueado por moderación (lista versión {lexico.version}).")
+    return True
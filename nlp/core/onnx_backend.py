@@ -0,0 +1,306 @@
+import os
+import logging
+import weakref
+from typing import Dict, List, Union
+
+import numpy as np
+
+from core.inference_pool import registrar_inicializador_worker
+
+logger = logging.getLogger(__name__)
+
+# Directorio donde se guardan los modelos exportados a ONNX
+ONNX_DIR = os.getenv(
+    "ONNX_MODELS_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "huggingface", "onnx")
+)
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+def onnx_disponible() -> bool:
+    return ort is not None
+
+
+def ruta_modelo_onnx(nombre_modelo: str, cuantizado: bool) -> str:
+    sufijo = "int8" if cuantizado else "fp32"
+    return os.path.join(ONNX_DIR, f"{nombre_modelo.replace('/', '__')}-{sufijo}.onnx")
+
+
+# -------- Exportación y cuantización --------
+def exportar_a_onnx(modulo, entradas_ejemplo: Dict[str, "object"], ruta: str, cuantizar: bool = True) -> str:
+    """
+    Exporta un módulo PyTorch a ONNX con ejes dinámicos (lote y secuencia) y,
+    opcionalmente, aplica cuantización dinámica INT8 a los pesos.
+    `modulo` debe aceptar las entradas por nombre y devolver un único tensor.
+    """
+    import torch
+
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    nombres_entrada = list(entradas_ejemplo.keys())
+    ruta_temporal = f"{ruta}.{os.getpid()}.fp32.tmp"
+
+    modulo.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            modulo,
+            tuple(entradas_ejemplo[nombre] for nombre in nombres_entrada),
+            ruta_temporal,
+            input_names=nombres_entrada,
+            output_names=["salida"],
+            dynamic_axes={
+                **{nombre: {0: "lote", 1: "secuencia"} for nombre in nombres_entrada},
+                "salida": {0: "lote"}
+            },
+            opset_version=14
+        )
+
+    if cuantizar:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        ruta_int8 = f"{ruta}.{os.getpid()}.int8.tmp"
+        quantize_dynamic(ruta_temporal, ruta_int8, weight_type=QuantType.QInt8)
+        os.remove(ruta_temporal)
+        os.replace(ruta_int8, ruta)
+    else:
+        os.replace(ruta_temporal, ruta)
+
+    logger.info(f"Modelo exportado a ONNX: {ruta}")
+    return ruta
+
+
+def crear_sesion_onnx(ruta: str, hilos: int = 0):
+    opciones = ort.SessionOptions()
+    opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opciones.intra_op_num_threads = hilos
+    return ort.InferenceSession(ruta, sess_options=opciones, providers=["CPUExecutionProvider"])
+
+
+# Modelos con sesión abierta en este proceso. Los hilos internos de una sesión no
+# sobreviven a un fork, así que cada worker de inferencia las vuelve a abrir.
+_modelos_con_sesion = weakref.WeakSet()
+
+
+def _registrar_sesion(modelo, ruta: str) -> None:
+    modelo.ruta = ruta
+    modelo.sesion = crear_sesion_onnx(ruta)
+    modelo.entradas = {entrada.name for entrada in modelo.sesion.get_inputs()}
+    _modelos_con_sesion.add(modelo)
+
+
+def _reabrir_sesiones(hilos: int) -> None:
+    for modelo in list(_modelos_con_sesion):
+        modelo.sesion = crear_sesion_onnx(modelo.ruta, hilos)
+
+
+registrar_inicializador_worker(_reabrir_sesiones)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+# -------- Clasificador de emociones --------
+class SalidaClasificacion:
+    """Salida equivalente a la de pysentimiento: etiqueta ganadora y probabilidades."""
+
+    def __init__(self, sentence: str, probas: Dict[str, float], is_multilabel: bool = False):
+        self.sentence = sentence
+        self.probas = probas
+        self.is_multilabel = is_multilabel
+        if is_multilabel:
+            self.output = [k for k, v in probas.items() if v > 0.5]
+        else:
+            self.output = max(probas.items(), key=lambda x: x[1])[0]
+
+    def __repr__(self):
+        probas = ", ".join(f"{k}: {v:.3f}" for k, v in sorted(self.probas.items(), key=lambda x: -x[1]))
+        return f"{self.__class__.__name__}(output={self.output}, probas={{{probas}}})"
+
+
+def _modulo_logits(modelo):
+    """Envuelve un modelo de clasificación de HF para exportar solo los logits."""
+    import torch
+
+    class LogitsSecuencia(torch.nn.Module):
+        def __init__(self, modelo):
+            super().__init__()
+            self.modelo = modelo
+
+        def forward(self, input_ids, attention_mask):
+            return self.modelo(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    return LogitsSecuencia(modelo)
+
+
+class ClasificadorOnnx:
+    """
+    Sustituto de un analizador de pysentimiento que ejecuta el transformer con
+    ONNX Runtime en CPU. Reutiliza el tokenizador, el preprocesado y las
+    etiquetas del analizador original, y expone el mismo predict().
+    """
+
+    def __init__(self, analizador, cuantizar: bool = True):
+        self.tokenizer = analizador.tokenizer
+        self.preprocessing_args = dict(analizador.preprocessing_args)
+        config = analizador.model.config
+        self.nombre_modelo = config.name_or_path
+        self.id2label = {int(i): etiqueta for i, etiqueta in config.id2label.items()}
+        self.is_multilabel = config.problem_type == "multi_label_classification"
+        self.max_length = min(self.tokenizer.model_max_length, 512)
+
+        ruta = ruta_modelo_onnx(self.nombre_modelo, cuantizar)
+        if not os.path.exists(ruta):
+            ejemplo = self.tokenizer(["texto de ejemplo"], return_tensors="pt")
+            exportar_a_onnx(
+                _modulo_logits(analizador.model),
+                {"input_ids": ejemplo["input_ids"], "attention_mask": ejemplo["attention_mask"]},
+                ruta,
+                cuantizar
+            )
+        _registrar_sesion(self, ruta)
+
+    def _preprocesar(self, texto: str) -> str:
+        from pysentimiento.preprocessing import preprocess_tweet
+        return preprocess_tweet(texto, **self.preprocessing_args)
+
+    def predict(self, inputs: Union[str, List[str]]):
+        textos = [inputs] if isinstance(inputs, str) else list(inputs)
+        preprocesados = [self._preprocesar(texto) for texto in textos]
+        codificado = self.tokenizer(
+            preprocesados,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        alimentacion = {
+            nombre: codificado[nombre].astype(np.int64)
+            for nombre in self.entradas if nombre in codificado
+        }
+        logits = self.sesion.run(None, alimentacion)[0]
+        probabilidades = 1 / (1 + np.exp(-logits)) if self.is_multilabel else _softmax(logits)
+
+        salidas = [
+            SalidaClasificacion(
+                texto,
+                {self.id2label[i]: float(fila[i]) for i in self.id2label},
+                self.is_multilabel
+            )
+            for texto, fila in zip(preprocesados, probabilidades)
+        ]
+        return salidas[0] if isinstance(inputs, str) else salidas
+
+
+def verificar_paridad_clasificador(analizador, clasificador, textos: List[str]) -> dict:
+    """
+    Compara las etiquetas del analizador PyTorch con las del backend ONNX sobre
+    los mismos textos. Devuelve el número de coincidencias, las discrepancias y
+    la mayor diferencia absoluta de probabilidad observada.
+    """
+    referencia = analizador.predict(textos)
+    candidata = clasificador.predict(textos)
+
+    discrepancias = []
+    max_diferencia = 0.0
+    for texto, ref, cand in zip(textos, referencia, candidata):
+        if ref.output != cand.output:
+            discrepancias.append({"texto": texto, "pytorch": ref.output, "onnx": cand.output})
+        for etiqueta, proba in ref.probas.items():
+            max_diferencia = max(max_diferencia, abs(proba - cand.probas.get(etiqueta, 0.0)))
+
+    return {
+        "total": len(textos),
+        "coincidencias": len(textos) - len(discrepancias),
+        "discrepancias": discrepancias,
+        "max_diferencia_probabilidad": max_diferencia
+    }
+
+
+# -------- Codificador de frases (sentence-transformers) --------
+def _modulo_estados_ocultos(modelo):
+    """Envuelve un transformer de HF para exportar solo last_hidden_state."""
+    import torch
+
+    class EstadosOcultos(torch.nn.Module):
+        def __init__(self, modelo):
+            super().__init__()
+            self.modelo = modelo
+
+        def forward(self, input_ids, attention_mask):
+            return self.modelo(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    return EstadosOcultos(modelo)
+
+
+class CodificadorOnnx:
+    """
+    Sustituto de SentenceTransformer.encode() para modelos con mean pooling,
+    ejecutado con ONNX Runtime. Aplica el mismo pooling por máscara de atención
+    y, si se pide, la misma normalización L2.
+    """
+
+    def __init__(self, tokenizer, ruta: str, max_length: int = 128, tamano_lote: int = 32):
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.tamano_lote = tamano_lote
+        _registrar_sesion(self, ruta)
+
+    @classmethod
+    def cargar(cls, nombre_modelo: str, cuantizar: bool = True, modelo_st=None) -> "CodificadorOnnx":
+        """
+        Usa el modelo exportado si ya existe (solo se carga el tokenizador, no los
+        pesos PyTorch). Si no existe, lo exporta desde el SentenceTransformer.
+        """
+        ruta = ruta_modelo_onnx(nombre_modelo, cuantizar)
+        if os.path.exists(ruta) and modelo_st is None:
+            from transformers import AutoTokenizer
+            return cls(AutoTokenizer.from_pretrained(nombre_modelo), ruta)
+
+        if modelo_st is None:
+            from sentence_transformers import SentenceTransformer
+            modelo_st = SentenceTransformer(nombre_modelo)
+        transformer = modelo_st[0]
+        if not os.path.exists(ruta):
+            ejemplo = transformer.tokenizer(["texto de ejemplo"], return_tensors="pt")
+            exportar_a_onnx(
+                _modulo_estados_ocultos(transformer.auto_model),
+                {"input_ids": ejemplo["input_ids"], "attention_mask": ejemplo["attention_mask"]},
+                ruta,
+                cuantizar
+            )
+        return cls(transformer.tokenizer, ruta, max_length=transformer.max_seq_length)
+
+    def _codificar_lote(self, textos: List[str]) -> np.ndarray:
+        codificado = self.tokenizer(
+            textos,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        alimentacion = {
+            nombre: codificado[nombre].astype(np.int64)
+            for nombre in self.entradas if nombre in codificado
+        }
+        estados = self.sesion.run(None, alimentacion)[0]
+
+        # Mean pooling ponderado por la máscara de atención
+        mascara = codificado["attention_mask"][..., None].astype(np.float32)
+        suma = (estados * mascara).sum(axis=1)
+        return suma / np.clip(mascara.sum(axis=1), 1e-9, None)
+
+    def encode(self, textos: Union[str, List[str]], convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False) -> np.ndarray:
+        lista = [textos] if isinstance(textos, str) else list(textos)
+        embeddings = np.concatenate([
+            self._codificar_lote(lista[i:i + self.tamano_lote])
+            for i in range(0, len(lista), self.tamano_lote)
+        ]).astype(np.float32)
+
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if isinstance(textos, str) else embeddings
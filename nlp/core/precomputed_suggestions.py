@@ -0,0 +1,97 @@
+import os
+import inspect
+import logging
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, List, Mapping
+
+from core import dialog_manager
+from core.cleaner import limpiar_texto
+from core.emotion_model import analizar_sentimiento_lote
+from core.intent_detector import detectar_intencion
+from core.empathy_utils import detectar_ambiguedad, generar_respuesta_aclaratoria
+
+logger = logging.getLogger(__name__)
+
+# Tabla de solo lectura con los análisis de las respuestas sugeridas del cuestionario
+PRECALCULO_ACTIVO = os.getenv("PRECOMPUTE_SUGGESTIONS", "true").lower() in ("1", "true", "yes")
+
+EMOCION = "emocion"
+INTENCION = "intencion"
+AMBIGUEDAD = "ambiguedad"
+LIMPIEZA = "limpieza"
+
+# análisis -> {texto: resultado}. Vacía hasta que se llama a precalcular_sugerencias()
+_tabla: Mapping[str, Mapping[str, Any]] = MappingProxyType({})
+_aciertos = 0
+_lock = threading.Lock()
+
+
+def enumerar_sugerencias(estados: Iterable[str] = ()) -> List[str]:
+    """
+    Todas las respuestas sugeridas que ofrece el asistente: las de cada mensaje de
+    dialog_manager y las de las aclaraciones de cada estado. Sin duplicados, en orden.
+    """
+    mensajes = []
+    for nombre, funcion in inspect.getmembers(dialog_manager, inspect.isfunction):
+        if not nombre.startswith("obtener_") or funcion.__module__ != dialog_manager.__name__:
+            continue
+        parametros = inspect.signature(funcion).parameters.values()
+        mensajes.append(funcion(*["" for p in parametros if p.default is inspect.Parameter.empty]))
+    mensajes.extend(generar_respuesta_aclaratoria(estado) for estado in estados)
+
+    sugerencias = (s for mensaje in mensajes for s in mensaje.get("sugerencias", []))
+    return list(dict.fromkeys(s for s in sugerencias if isinstance(s, str) and s.strip()))
+
+
+def precalcular_sugerencias(estados: Iterable[str] = ()) -> int:
+    """
+    Analiza todas las respuestas sugeridas de una vez (el modelo de emociones en un
+    solo lote) y publica la tabla. Debe llamarse al arrancar, después de crear el pool
+    de inferencia: la tabla solo se consulta en el proceso principal y así no se hace
+    ninguna inferencia antes del fork. Devuelve el número de textos precalculados.
+    """
+    global _tabla
+    if not PRECALCULO_ACTIVO:
+        return 0
+
+    sugerencias = enumerar_sugerencias(estados)
+    limpias = {texto: limpiar_texto(texto) for texto in sugerencias}
+    # La intención y la ambigüedad se consultan también sobre el texto limpio
+    variantes = list(dict.fromkeys([*sugerencias, *limpias.values()]))
+
+    # Un fallo del modelo no se fija en la tabla: esos textos seguirán el camino normal
+    emociones = {
+        texto: MappingProxyType(resultado)
+        for texto, resultado in zip(sugerencias, analizar_sentimiento_lote(sugerencias))
+        if resultado.get("estado_emocional") != "error"
+    }
+
+    _tabla = MappingProxyType({
+        EMOCION: MappingProxyType(emociones),
+        INTENCION: MappingProxyType({texto: detectar_intencion(texto) for texto in variantes if texto}),
+        AMBIGUEDAD: MappingProxyType({texto: detectar_ambiguedad(texto) for texto in variantes if texto}),
+        LIMPIEZA: MappingProxyType(limpias)
+    })
+    logger.info(f"Precalculadas {len(sugerencias)} respuestas sugeridas ({len(emociones)} con emoción).")
+    return len(sugerencias)
+
+
+def consultar(analisis: str, texto: str, calcular: Callable[[str], Any]) -> Any:
+    """Resultado precalculado del análisis para el texto o, si no está, calcular(texto)."""
+    global _aciertos
+    valores = _tabla.get(analisis)
+    if valores is None or texto not in valores:
+        return calcular(texto)
+    with _lock:
+        _aciertos += 1
+    resultado = valores[texto]
+    return dict(resultado) if isinstance(resultado, Mapping) else resultado
+
+
+def estadisticas_precalculo() -> dict:
+    return {
+        "activo": PRECALCULO_ACTIVO,
+        "textos": {analisis: len(valores) for analisis, valores in _tabla.items()},
+        "aciertos": _aciertos
+    }
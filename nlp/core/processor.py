@@ -3,6 +3,8 @@ import nltk
 from nltk.corpus import stopwords
 from typing import List
 from core.cleaner import limpiar_texto
+from core.inference_context import memorizado_por_turno
+from core import inference_pool
 
 # Stopwords personalizadas (se combinan con las de NLTK)
 def cargar_stopwords() -> set:
@@ -32,11 +34,17 @@ def get_spacy_model():
     return _spacy_model
 
 # Preprocesamiento completo del texto
+@memorizado_por_turno
 def preprocesar_texto(texto: str) -> List[str]:
     """
     Limpia el texto, lematiza palabras, elimina stopwords y puntuación,
     y devuelve una lista de tokens útiles.
     """
+    # Con el pool de inferencia activo spaCy se ejecuta en un worker
+    return inference_pool.ejecutar(_preprocesar_en_proceso, texto)
+
+
+def _preprocesar_en_proceso(texto: str) -> List[str]:
     texto_limpio = limpiar_texto(texto)
     nlp = get_spacy_model()
     doc = nlp(texto_limpio)
@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+import threading
+from typing import Optional
+
+import redis
+import redis.asyncio
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+from redis.asyncio.retry import Retry as RetryAsync
+
+logger = logging.getLogger(__name__)
+
+# -------- Configuración (compartida por caché, estado y puntuaciones) --------
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 2.0))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 2.0))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_RETRY_ATTEMPTS = int(os.getenv("REDIS_RETRY_ATTEMPTS", 3))
+REDIS_RETRY_BACKOFF_BASE = float(os.getenv("REDIS_RETRY_BACKOFF_BASE", 0.05))
+REDIS_RETRY_BACKOFF_CAP = float(os.getenv("REDIS_RETRY_BACKOFF_CAP", 1.0))
+
+# Los reintentos con backoff cubren conexiones del pool que se caen a mitad de comando.
+# Tras un fallo de conexión no se vuelve a intentar hasta pasado este tiempo,
+# para no bloquear cada petición con timeouts mientras Redis está caído
+REDIS_PAUSA_TRAS_FALLO = float(os.getenv("REDIS_OUTAGE_COOLDOWN_SECONDS", 5.0))
+
+ERRORES_CONEXION = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+
+_cliente: Optional[redis.Redis] = None
+_cliente_async: Optional[redis.asyncio.Redis] = None
+_lock = threading.Lock()
+_no_disponible_hasta = 0.0
+
+
+def _parametros_pool() -> dict:
+    return dict(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        decode_responses=True,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        retry_on_error=list(ERRORES_CONEXION)
+    )
+
+
+def _backoff() -> ExponentialBackoff:
+    return ExponentialBackoff(cap=REDIS_RETRY_BACKOFF_CAP, base=REDIS_RETRY_BACKOFF_BASE)
+
+
+def _crear_cliente() -> redis.Redis:
+    # No se conecta aquí: el pool abre conexiones bajo demanda
+    pool = redis.ConnectionPool(**_parametros_pool(), retry=Retry(_backoff(), REDIS_RETRY_ATTEMPTS))
+    return redis.Redis(connection_pool=pool)
+
+
+def obtener_cliente() -> Optional[redis.Redis]:
+    """
+    Cliente Redis compartido del proceso. Devuelve None durante la pausa que sigue
+    a un fallo de conexión; después se vuelve a intentar sin reiniciar el servicio.
+    """
+    global _cliente
+    if time.monotonic() < _no_disponible_hasta:
+        return None
+    if _cliente is None:
+        with _lock:
+            if _cliente is None:
+                _cliente = _crear_cliente()
+    return _cliente
+
+
+def obtener_cliente_async() -> Optional[redis.asyncio.Redis]:
+    """
+    Cliente redis.asyncio compartido para el camino asíncrono de las peticiones.
+    Usa la misma configuración y la misma pausa tras fallos que el cliente síncrono.
+    Debe usarse siempre desde el mismo bucle de eventos (el del servidor).
+    """
+    global _cliente_async
+    if time.monotonic() < _no_disponible_hasta:
+        return None
+    if _cliente_async is None:
+        pool = redis.asyncio.ConnectionPool(
+            **_parametros_pool(), retry=RetryAsync(_backoff(), REDIS_RETRY_ATTEMPTS)
+        )
+        _cliente_async = redis.asyncio.Redis(connection_pool=pool)
+    return _cliente_async
+
+
+def notificar_error(error: Exception) -> None:
+    """Registra un error de Redis; si es de conexión activa la pausa de reintento."""
+    global _no_disponible_hasta
+    if isinstance(error, ERRORES_CONEXION):
+        if time.monotonic() >= _no_disponible_hasta:
+            logger.warning(
+                f"Redis no disponible ({error}). Se reintentará en {REDIS_PAUSA_TRAS_FALLO:g} s."
+            )
+        _no_disponible_hasta = time.monotonic() + REDIS_PAUSA_TRAS_FALLO
+
+
+def estadisticas_pool() -> dict:
+    if _cliente is None:
+        return {"conexiones_creadas": 0, "max_conexiones": REDIS_MAX_CONNECTIONS, "disponible": None}
+    pool = _cliente.connection_pool
+    return {
+        "conexiones_creadas": len(pool._available_connections) + len(pool._in_use_connections),
+        "max_conexiones": REDIS_MAX_CONNECTIONS,
+        "disponible": time.monotonic() >= _no_disponible_hasta
+    }
+
+
+def cerrar_pool() -> None:
+    global _cliente
+    with _lock:
+        if _cliente is not None:
+            _cliente.connection_pool.disconnect()
+            _cliente = None
+
+
+async def cerrar_pool_async() -> None:
+    global _cliente_async
+    if _cliente_async is not None:
+        await _cliente_async.connection_pool.disconnect()
+        _cliente_async = None
@@ -0,0 +1,137 @@
+import os
+import copy
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import redis
+
+from core.redis_pool import obtener_cliente, notificar_error
+from core.database import generar_pdf_informe
+from core.pdf_utils import construir_interacciones_para_pdf
+
+logger = logging.getLogger(__name__)
+
+# Dónde se guardan los PDF y con qué URLs se anuncian al usuario
+DIRECTORIO_INFORMES = os.getenv("REPORTS_DIR", "/app/static/informes")
+URL_BASE_INFORMES = os.getenv("REPORTS_PUBLIC_BASE_URL", "http://localhost:8010/static/informes").rstrip("/")
+URL_BASE_ESTADO = os.getenv("REPORT_STATUS_BASE_URL", "http://localhost:8001/informes").rstrip("/")
+
+# Hilos que generan informes y caducidad del estado de cada trabajo
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 1))
+TTL_TRABAJO = int(os.getenv("REPORT_JOB_TTL_SECONDS", 86400))
+
+REDIS_PREFIX = "informe"
+
+PENDIENTE = "pendiente"
+LISTO = "listo"
+FALLIDO = "fallido"
+
+_ejecutor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+# Estado de los trabajos cuando Redis no está disponible (solo visible en este proceso)
+_trabajos_en_memoria: dict = {}
+
+
+def _get_key(job_id: str) -> str:
+    return f"{REDIS_PREFIX}:{job_id}"
+
+
+def _obtener_ejecutor() -> ThreadPoolExecutor:
+    # Se crea en el primer uso, después del fork de los workers de inferencia
+    global _ejecutor
+    if _ejecutor is None:
+        with _lock:
+            if _ejecutor is None:
+                _ejecutor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="informes")
+    return _ejecutor
+
+
+def _guardar_estado(job_id: str, campos: dict) -> None:
+    campos = {**campos, "actualizado": str(time.time())}
+    redis_client = obtener_cliente()
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.hset(_get_key(job_id), mapping=campos)
+            pipe.expire(_get_key(job_id), TTL_TRABAJO)
+            pipe.execute()
+            return
+        except redis.exceptions.RedisError as e:
+            notificar_error(e)
+            logger.error(f"Error guardando el estado del informe {job_id}: {e}")
+    _trabajos_en_memoria.setdefault(job_id, {}).update(campos)
+
+    # Misma caducidad que en Redis
+    limite = time.time() - TTL_TRABAJO
+    for caducado in [k for k, v in _trabajos_en_memoria.items() if float(v["actualizado"]) < limite]:
+        _trabajos_en_memoria.pop(caducado, None)
+
+
+def obtener_estado_informe(job_id: str) -> Optional[dict]:
+    """Estado de un trabajo (pendiente / listo / fallido) o None si no existe o ha caducado."""
+    campos = None
+    redis_client = obtener_cliente()
+    if redis_client:
+        try:
+            campos = redis_client.hgetall(_get_key(job_id)) or None
+        except redis.exceptions.RedisError as e:
+            notificar_error(e)
+            logger.error(f"Error leyendo el estado del informe {job_id}: {e}")
+    if campos is None:
+        campos = _trabajos_en_memoria.get(job_id)
+    if campos is None:
+        return None
+
+    estado = {"job_id": job_id, "estado": campos.get("estado"), "url_pdf": campos.get("url_pdf")}
+    if campos.get("error"):
+        estado["error"] = campos["error"]
+    return estado
+
+
+def _generar(job_id: str, datos_guardados: dict, ruta_pdf: str) -> None:
+    try:
+        interacciones = construir_interacciones_para_pdf(datos_guardados)
+        os.makedirs(os.path.dirname(ruta_pdf), exist_ok=True)
+        if generar_pdf_informe(interacciones, ruta_pdf):
+            _guardar_estado(job_id, {"estado": LISTO})
+        else:
+            _guardar_estado(job_id, {"estado": FALLIDO, "error": "No se pudo generar el PDF."})
+    except Exception as e:
+        logger.error(f"Error generando el informe {job_id}: {e}")
+        _guardar_estado(job_id, {"estado": FALLIDO, "error": str(e)})
+
+
+def encolar_informe(session_id: str, datos_guardados: dict) -> dict:
+    """
+    Registra un trabajo de informe PDF para la sesión y lo genera en segundo plano.
+    Devuelve enseguida el identificador y las URLs del PDF y de su estado.
+    """
+    job_id = uuid.uuid4().hex
+    nombre_pdf = f"{session_id}.pdf"
+    url_pdf = f"{URL_BASE_INFORMES}/{nombre_pdf}"
+
+    _guardar_estado(job_id, {"estado": PENDIENTE, "session_id": session_id, "url_pdf": url_pdf})
+    _obtener_ejecutor().submit(
+        _generar, job_id, copy.deepcopy(datos_guardados), os.path.join(DIRECTORIO_INFORMES, nombre_pdf)
+    )
+
+    return {
+        "job_id": job_id,
+        "estado": PENDIENTE,
+        "url_pdf": url_pdf,
+        "url_estado": f"{URL_BASE_ESTADO}/{job_id}"
+    }
+
+
+def cerrar_trabajos_informe() -> None:
+    """Espera a que terminen los informes en curso (al apagar el servicio)."""
+    global _ejecutor
+    with _lock:
+        if _ejecutor is not None:
+            _ejecutor.shutdown(wait=True)
+            _ejecutor = None
@@ -1,7 +1,19 @@
-from core.emotion_model import analizar_sentimiento
-from core.moderator import contiene_lenguaje_inapropiado
-from core.cache import obtener_cache, guardar_cache
-from core.database import guardar_interaccion
+import os
+import asyncio
+from typing import Optional
+from core.emotion_model import analizar_sentimiento, analizar_sentimiento_lote, HUELLA_MODELO_EMOCION
+from core.moderator import contiene_lenguaje_inapropiado, obtener_lexico
+from core.cache import (
+    registrar_espacio, obtener_cache, guardar_cache, obtener_cache_async, guardar_cache_async,
+    obtener_cache_lote_async, guardar_cache_lote_async
+)
+from core.database import guardar_interaccion, escrituras_agrupadas_async
+from core.inference_context import contexto_inferencia
+from core.executor import ejecutar_en_hilo
+
+# Las respuestas de /analyze dependen del modelo de emociones y de la lista de moderación
+ESPACIO_CACHE = "respuesta"
+registrar_espacio(ESPACIO_CACHE, lambda: f"{HUELLA_MODELO_EMOCION}-{obtener_lexico().version}")
 
 
 def generar_respuesta_emocional(estado: str) -> str:
@@ -14,37 +26,77 @@ def generar_respuesta_emocional(estado: str) -> str:
     return respuestas.get(estado, "Gracias por tu mensaje. ¿Te gustaría seguir hablando?")
 
 
-def procesar_texto(texto: str) -> dict:
-    """Analiza el texto, verifica lenguaje y genera una respuesta."""
-    if contiene_lenguaje_inapropiado(texto):
-        return {
-            "estado_emocional": "alerta",
-            "respuesta": "Hemos detectado lenguaje inapropiado. Por favor, cuida tu expresión para que podamos ayudarte mejor."
-        }
+RESPUESTA_MODERADA = {
+    "estado_emocional": "alerta",
+    "respuesta": "Hemos detectado lenguaje inapropiado. Por favor, cuida tu expresión para que podamos ayudarte mejor."
+}
 
-    resultado_emocion = analizar_sentimiento(texto)
-    estado = resultado_emocion.get("estado_emocional", "neutral").lower()
 
+def _respuesta_para_emocion(resultado_emocion: dict) -> dict:
+    estado = resultado_emocion.get("estado_emocional", "neutral").lower()
     return {
         "estado_emocional": estado,
         "respuesta": generar_respuesta_emocional(estado)
     }
 
 
+def procesar_texto(texto: str) -> dict:
+    """Analiza el texto, verifica lenguaje y genera una respuesta."""
+    if contiene_lenguaje_inapropiado(texto):
+        return dict(RESPUESTA_MODERADA)
+
+    return _respuesta_para_emocion(analizar_sentimiento(texto))
+
+
 def generar_respuesta(texto: str) -> dict:
     """Genera una respuesta empática usando caché y guardado de historial."""
     try:
-        if (respuesta := obtener_cache(texto)):
+        if (respuesta := obtener_cache(texto, espacio=ESPACIO_CACHE)):
             return respuesta
 
-        respuesta_generada = procesar_texto(texto)
+        with contexto_inferencia():
+            respuesta_generada = procesar_texto(texto)
 
         guardar_interaccion(
             texto,
             respuesta_generada["respuesta"],
             respuesta_generada["estado_emocional"]
         )
-        guardar_cache(texto, respuesta_generada)
+        guardar_cache(texto, respuesta_generada, espacio=ESPACIO_CACHE)
+
+        return respuesta_generada
+
+    except Exception as e:
+        return {
+            "estado_emocional": "error",
+            "respuesta": f"Error interno inesperado: {str(e)}"
+        }
+
+
+def _procesar_y_guardar(texto: str) -> dict:
+    with contexto_inferencia():
+        respuesta_generada = procesar_texto(texto)
+
+    guardar_interaccion(
+        texto,
+        respuesta_generada["respuesta"],
+        respuesta_generada["estado_emocional"]
+    )
+    return respuesta_generada
+
+
+async def generar_respuesta_async(texto: str) -> dict:
+    """
+    Igual que generar_respuesta() sin bloquear el bucle de eventos: caché con
+    redis.asyncio, modelo en el ejecutor acotado y guardado con el driver async.
+    """
+    try:
+        if (respuesta := await obtener_cache_async(texto, espacio=ESPACIO_CACHE)):
+            return respuesta
+
+        async with escrituras_agrupadas_async():
+            respuesta_generada = await ejecutar_en_hilo(_procesar_y_guardar, texto)
+        await guardar_cache_async(texto, respuesta_generada, espacio=ESPACIO_CACHE)
 
         return respuesta_generada
 
@@ -53,3 +105,60 @@ def generar_respuesta(texto: str) -> dict:
             "estado_emocional": "error",
             "respuesta": f"Error interno inesperado: {str(e)}"
         }
+
+
+# -------- Análisis por lotes --------
+# Textos por pasada (moderación, caché, modelo y guardado) y pasadas simultáneas
+# entre todas las peticiones por lotes, para no desplazar al tráfico interactivo
+TAMANO_LOTE_ANALISIS = int(os.getenv("ANALYZE_BATCH_SIZE", 64))
+CONCURRENCIA_LOTES = int(os.getenv("ANALYZE_BATCH_MAX_CONCURRENCY", 2))
+_semaforo_lotes: Optional[asyncio.Semaphore] = None
+
+
+def _procesar_lote_y_guardar(textos: list[str]) -> list[dict]:
+    """Moderación por texto, una pasada del modelo para el resto y guardado de todos."""
+    resultados: list[Optional[dict]] = [None] * len(textos)
+    pendientes = []
+    for i, texto in enumerate(textos):
+        if contiene_lenguaje_inapropiado(texto):
+            resultados[i] = dict(RESPUESTA_MODERADA)
+        else:
+            pendientes.append(i)
+
+    emociones = analizar_sentimiento_lote([textos[i] for i in pendientes])
+    for i, resultado_emocion in zip(pendientes, emociones):
+        resultados[i] = _respuesta_para_emocion(resultado_emocion)
+
+    # Los mensajes vacíos se responden pero no se guardan (no hay nada que anonimizar)
+    for texto, resultado in zip(textos, resultados):
+        if texto.strip():
+            guardar_interaccion(texto, resultado["respuesta"], resultado["estado_emocional"])
+    return resultados
+
+
+async def generar_respuestas_lote_async(textos: list[str]) -> list[dict]:
+    """
+    Igual que generar_respuesta_async() para un lote de textos, en el mismo orden:
+    una lectura de caché (MGET), una pasada del modelo para los textos no cacheados
+    (sin repetir duplicados), un único guardado agrupado y una escritura de caché.
+    """
+    global _semaforo_lotes
+    if _semaforo_lotes is None:
+        _semaforo_lotes = asyncio.Semaphore(max(1, CONCURRENCIA_LOTES))
+
+    async with _semaforo_lotes:
+        try:
+            resultados = await obtener_cache_lote_async(textos, espacio=ESPACIO_CACHE)
+            sin_cache = list(dict.fromkeys(t for t, r in zip(textos, resultados) if r is None))
+            if sin_cache:
+                async with escrituras_agrupadas_async():
+                    nuevos = dict(zip(sin_cache, await ejecutar_en_hilo(_procesar_lote_y_guardar, sin_cache)))
+                await guardar_cache_lote_async(nuevos, espacio=ESPACIO_CACHE)
+                resultados = [r if r is not None else nuevos[t] for t, r in zip(textos, resultados)]
+            return resultados
+
+        except Exception as e:
+            return [{
+                "estado_emocional": "error",
+                "respuesta": f"Error interno inesperado: {str(e)}"
+            }] * len(textos)
@@ -1,20 +1,5 @@
-import redis
-import os
-import json
 from typing import Optional
-
-# Configuración de Redis
-REDIS_HOST = os.getenv("REDIS_HOST", "redis")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-
-try:
-    redis_client = redis.Redis(
-        host=REDIS_HOST, port=REDIS_PORT, decode_responses=True
-    )
-    redis_client.ping()
-except redis.exceptions.ConnectionError:
-    redis_client = None
-    print("Redis no disponible. Puntuaciones no serán almacenadas.")
+from core.session_store import sesion_turno
 
 # -------------------- Funciones de cálculo --------------------
 
@@ -62,36 +47,32 @@ def calcular_puntuacion(tipo: str, valor: str) -> int:
 
 # -------------------- Gestión de puntuaciones --------------------
 
+# Las puntuaciones viven en el hash de la sesión junto al estado conversacional
+
 def obtener_puntuaciones(session_id: str) -> dict:
-    if not redis_client:
-        return {}
-    key = f"puntuacion_usuario:{session_id}"
-    data = redis_client.get(key)
-    return json.loads(data) if data else {}
+    with sesion_turno(session_id) as sesion:
+        return sesion.puntuaciones
 
 def asignar_puntuacion(session_id: str, tipo: str, valor: str):
-    if not redis_client:
-        return
-
-    key = f"puntuacion_usuario:{session_id}"
-    puntuaciones = obtener_puntuaciones(session_id)
-    puntos = calcular_puntuacion(tipo, valor)
+    with sesion_turno(session_id) as sesion:
+        puntuaciones = sesion.puntuaciones
+        puntos = calcular_puntuacion(tipo, valor)
 
-    puntuaciones[tipo] = puntos
+        puntuaciones[tipo] = puntos
 
-    valores = [
-        puntuaciones.get("frecuencia"),
-        puntuaciones.get("duracion"),
-        puntuaciones.get("intensidad")
-    ]
-    valores_validos = [v for v in valores if isinstance(v, int)]
-    puntuaciones["media"] = round(sum(valores_validos) / len(valores_validos), 2) if valores_validos else 0
+        valores = [
+            puntuaciones.get("frecuencia"),
+            puntuaciones.get("duracion"),
+            puntuaciones.get("intensidad")
+        ]
+        valores_validos = [v for v in valores if isinstance(v, int)]
+        puntuaciones["media"] = round(sum(valores_validos) / len(valores_validos), 2) if valores_validos else 0
 
-    redis_client.set(key, json.dumps(puntuaciones), ex=3600)
+        sesion.puntuaciones = puntuaciones
 
 def eliminar_puntuaciones(session_id: str):
-    if redis_client:
-        redis_client.delete(f"puntuacion_usuario:{session_id}")
+    with sesion_turno(session_id) as sesion:
+        sesion.puntuaciones = {}
 
 def generar_resumen_evaluacion(session_id: str) -> dict:
     puntuaciones = obtener_puntuaciones(session_id)
@@ -0,0 +1,228 @@
+import redis
+import os
+import copy
+import json
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional
+from core.redis_pool import obtener_cliente, obtener_cliente_async, notificar_error
+
+logger = logging.getLogger(__name__)
+
+# Un hash por sesión con los campos "estado" y "puntuaciones" (JSON)
+REDIS_PREFIX = "sesion"
+TTL_SESION = int(os.getenv("SESSION_TTL_SECONDS", 3600))
+CAMPO_ESTADO = "estado"
+CAMPO_PUNTUACIONES = "puntuaciones"
+
+# Claves usadas antes del hash único; se leen para migrar sesiones en curso
+PREFIJO_ESTADO_ANTIGUO = "estado_usuario"
+PREFIJO_PUNTUACIONES_ANTIGUO = "puntuacion_usuario"
+
+
+def _get_key(session_id: str) -> str:
+    return f"{REDIS_PREFIX}:{session_id}"
+
+
+def _json_o_none(valor: Optional[str]):
+    return json.loads(valor) if valor else None
+
+
+class SesionConversacion:
+    """
+    Estado conversacional y puntuaciones de una sesión. Se carga de Redis con una
+    sola llamada (pipeline) y los cambios se acumulan en memoria hasta volcar(),
+    que los escribe en una transacción MULTI/EXEC con un único refresco del TTL.
+    Si no se pudo leer de Redis la sesión queda sin cargar y nunca se vuelca, para
+    no sobrescribir la conversación real con una vacía.
+    """
+
+    def __init__(self, session_id: str, estado: Optional[dict] = None,
+                 puntuaciones: Optional[dict] = None, migrada: bool = False,
+                 cargada: bool = True):
+        self.session_id = session_id
+        self.cargada = cargada
+        self._estado = estado
+        self._puntuaciones = puntuaciones or {}
+        self._estado_modificado = migrada and estado is not None
+        self._puntuaciones_modificadas = migrada and bool(puntuaciones)
+        self._migrada = migrada
+
+    # -------- Lectura / escritura en memoria --------
+    @property
+    def estado(self) -> Optional[dict]:
+        return copy.deepcopy(self._estado)
+
+    @estado.setter
+    def estado(self, valor: Optional[dict]) -> None:
+        self._estado = copy.deepcopy(valor)
+        self._estado_modificado = True
+
+    @property
+    def puntuaciones(self) -> dict:
+        return copy.deepcopy(self._puntuaciones)
+
+    @puntuaciones.setter
+    def puntuaciones(self, valor: dict) -> None:
+        self._puntuaciones = copy.deepcopy(valor)
+        self._puntuaciones_modificadas = True
+
+    @property
+    def modificada(self) -> bool:
+        return self._estado_modificado or self._puntuaciones_modificadas
+
+    # -------- Persistencia --------
+    @staticmethod
+    def _encolar_carga(pipe, session_id: str) -> None:
+        pipe.hgetall(_get_key(session_id))
+        pipe.get(f"{PREFIJO_ESTADO_ANTIGUO}:{session_id}")
+        pipe.get(f"{PREFIJO_PUNTUACIONES_ANTIGUO}:{session_id}")
+
+    @classmethod
+    def _desde_resultados(cls, session_id: str, resultados: list) -> "SesionConversacion":
+        campos, estado_antiguo, puntuaciones_antiguas = resultados
+        if campos:
+            return cls(
+                session_id,
+                _json_o_none(campos.get(CAMPO_ESTADO)),
+                _json_o_none(campos.get(CAMPO_PUNTUACIONES))
+            )
+
+        migrada = bool(estado_antiguo or puntuaciones_antiguas)
+        return cls(session_id, _json_o_none(estado_antiguo), _json_o_none(puntuaciones_antiguas), migrada)
+
+    def _encolar_volcado(self, pipe) -> None:
+        clave = _get_key(self.session_id)
+        if self._estado_modificado:
+            if self._estado is None:
+                pipe.hdel(clave, CAMPO_ESTADO)
+            else:
+                pipe.hset(clave, CAMPO_ESTADO, json.dumps(self._estado))
+        if self._puntuaciones_modificadas:
+            pipe.hset(clave, CAMPO_PUNTUACIONES, json.dumps(self._puntuaciones))
+        pipe.expire(clave, TTL_SESION)
+        if self._migrada:
+            pipe.delete(
+                f"{PREFIJO_ESTADO_ANTIGUO}:{self.session_id}",
+                f"{PREFIJO_PUNTUACIONES_ANTIGUO}:{self.session_id}"
+            )
+
+    def _marcar_volcada(self) -> None:
+        self._estado_modificado = False
+        self._puntuaciones_modificadas = False
+        self._migrada = False
+
+    @classmethod
+    def cargar(cls, session_id: str) -> "SesionConversacion":
+        """Lee el hash de la sesión (y las claves antiguas) en un único viaje a Redis."""
+        redis_client = obtener_cliente()
+        if not redis_client:
+            return cls(session_id, cargada=False)
+
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            cls._encolar_carga(pipe, session_id)
+            return cls._desde_resultados(session_id, pipe.execute())
+        except redis.exceptions.RedisError as e:
+            notificar_error(e)
+            logger.error(f"Error cargando la sesión {session_id}: {e}")
+            return cls(session_id, cargada=False)
+
+    def volcar(self) -> None:
+        """Escribe los cambios acumulados en una transacción y refresca el TTL una vez."""
+        if not self.modificada or not self.cargada:
+            return
+        redis_client = obtener_cliente()
+        if not redis_client:
+            return
+
+        try:
+            pipe = redis_client.pipeline(transaction=True)
+            self._encolar_volcado(pipe)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            notificar_error(e)
+            logger.error(f"Error guardando la sesión {self.session_id}: {e}")
+            return
+        self._marcar_volcada()
+
+    @classmethod
+    async def cargar_async(cls, session_id: str) -> "SesionConversacion":
+        """Igual que cargar() pero con redis.asyncio, sin bloquear el bucle de eventos."""
+        redis_client = obtener_cliente_async()
+        if not redis_client:
+            return cls(session_id, cargada=False)
+
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                cls._encolar_carga(pipe, session_id)
+                return cls._desde_resultados(session_id, await pipe.execute())
+        except redis.exceptions.RedisError as e:
+            notificar_error(e)
+            logger.error(f"Error cargando la sesión {session_id}: {e}")
+            return cls(session_id, cargada=False)
+
+    async def volcar_async(self) -> None:
+        """Igual que volcar() pero con redis.asyncio."""
+        if not self.modificada or not self.cargada:
+            return
+        redis_client = obtener_cliente_async()
+        if not redis_client:
+            return
+
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                self._encolar_volcado(pipe)
+                await pipe.execute()
+        except redis.exceptions.RedisError as e:
+            notificar_error(e)
+            logger.error(f"Error guardando la sesión {self.session_id}: {e}")
+            return
+        self._marcar_volcada()
+
+
+# Sesión del turno en curso (una por petición / hilo de ejecución)
+_sesion_activa: ContextVar[Optional[SesionConversacion]] = ContextVar("sesion_activa", default=None)
+
+
+@contextmanager
+def sesion_turno(session_id: str) -> Iterator[SesionConversacion]:
+    """
+    Abre la sesión para un turno: una lectura al entrar y un volcado al salir.
+    Dentro del bloque, estado y puntuaciones se leen y modifican en memoria.
+    Si ya hay una sesión abierta para el mismo usuario se reutiliza.
+    """
+    activa = _sesion_activa.get()
+    if activa is not None and activa.session_id == session_id:
+        yield activa
+        return
+
+    sesion = SesionConversacion.cargar(session_id)
+    token = _sesion_activa.set(sesion)
+    try:
+        yield sesion
+    finally:
+        _sesion_activa.reset(token)
+        sesion.volcar()
+
+
+@asynccontextmanager
+async def sesion_turno_async(session_id: str) -> AsyncIterator[SesionConversacion]:
+    """
+    Versión asíncrona de sesion_turno(): la lectura y el volcado usan redis.asyncio.
+    El código síncrono que se ejecute dentro (en el ejecutor, con el contexto
+    copiado) ve la misma sesión a través de sesion_turno().
+    """
+    activa = _sesion_activa.get()
+    if activa is not None and activa.session_id == session_id:
+        yield activa
+        return
+
+    sesion = await SesionConversacion.cargar_async(session_id)
+    token = _sesion_activa.set(sesion)
+    try:
+        yield sesion
+    finally:
+        _sesion_activa.reset(token)
+        await sesion.volcar_async()
@@ -0,0 +1,198 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import List, Optional
+
+from bson import json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Marca interna para detener el hilo de volcado
+_FIN = object()
+
+# Código de MongoDB para clave duplicada: el documento ya se escribió en un intento anterior
+DUPLICADO = 11000
+
+
+class BufferEscritura:
+    """
+    Buffer de escritura diferida (write-behind) para una colección de MongoDB.
+
+    encolar() deja el documento en una cola acotada y vuelve enseguida. Un hilo
+    la vacía con insert_many(ordered=False) al reunir `tamano_lote` documentos o
+    cuando han pasado `intervalo_ms` desde el primero. Los lotes que fallan se
+    reintentan con backoff exponencial; si se agotan los intentos, los documentos
+    se añaden a un fichero JSONL (dead-letter) para no perderlos. Si la cola está
+    llena, el documento se escribe de forma síncrona.
+    """
+
+    def __init__(
+        self,
+        coleccion,
+        capacidad: int = 10000,
+        tamano_lote: int = 100,
+        intervalo_ms: float = 500.0,
+        reintentos: int = 5,
+        backoff_base: float = 0.2,
+        backoff_max: float = 10.0,
+        ruta_dead_letter: str = "historial_no_guardado.jsonl",
+        nombre: str = "write-behind"
+    ):
+        self._coleccion = coleccion
+        self.capacidad = max(1, capacidad)
+        self.tamano_lote = max(1, tamano_lote)
+        self.intervalo = max(0.0, intervalo_ms) / 1000
+        self.reintentos = max(1, reintentos)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.ruta_dead_letter = ruta_dead_letter
+        self.nombre = nombre
+        self._cola: "queue.Queue" = queue.Queue(maxsize=self.capacidad)
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._lock_metricas = threading.Lock()
+        self._atexit_registrado = False
+        self._metricas = {
+            "escritos": 0,
+            "lotes": 0,
+            "reintentos": 0,
+            "escrituras_sincronas": 0,
+            "dead_letter": 0
+        }
+
+    # -------- API --------
+    def encolar(self, doc: dict) -> None:
+        """Encola un documento para escribirlo en segundo plano."""
+        self._asegurar_hilo()
+        try:
+            self._cola.put_nowait(doc)
+        except queue.Full:
+            # Contrapresión: antes que perder el documento, se paga la latencia de Mongo
+            self._contar("escrituras_sincronas")
+            self._escribir([doc])
+
+    def detener(self) -> None:
+        """Vuelca todo lo pendiente y detiene el hilo (se llama también al salir del proceso)."""
+        with self._lock:
+            hilo = self._hilo
+            self._hilo = None
+        if hilo is not None:
+            self._cola.put(_FIN)
+            hilo.join()
+
+    def estadisticas(self) -> dict:
+        with self._lock_metricas:
+            metricas = dict(self._metricas)
+        metricas.update({
+            "en_cola": self._cola.qsize(),
+            "capacidad": self.capacidad,
+            "activo": self._hilo is not None and self._hilo.is_alive()
+        })
+        return metricas
+
+    # -------- Hilo de volcado --------
+    # Se arranca en el primer uso para no crearlo antes del fork de los workers de inferencia
+    def _asegurar_hilo(self) -> None:
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name=self.nombre, daemon=True)
+                self._hilo.start()
+                if not self._atexit_registrado:
+                    atexit.register(self.detener)
+                    self._atexit_registrado = True
+
+    def _recoger_lote(self, primero) -> tuple:
+        lote = [primero]
+        limite = time.monotonic() + self.intervalo
+        detener = False
+        while len(lote) < self.tamano_lote:
+            restante = limite - time.monotonic()
+            try:
+                elemento = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if elemento is _FIN:
+                detener = True
+                break
+            lote.append(elemento)
+        return lote, detener
+
+    def _bucle(self) -> None:
+        while True:
+            primero = self._cola.get()
+            if primero is _FIN:
+                return
+
+            lote, detener = self._recoger_lote(primero)
+            self._escribir(lote)
+
+            if detener:
+                # Lo que se haya encolado después de la marca de fin también se vuelca
+                pendientes = []
+                while True:
+                    try:
+                        elemento = self._cola.get_nowait()
+                    except queue.Empty:
+                        break
+                    if elemento is not _FIN:
+                        pendientes.append(elemento)
+                for i in range(0, len(pendientes), self.tamano_lote):
+                    self._escribir(pendientes[i:i + self.tamano_lote])
+                return
+
+    # -------- Escritura con reintentos --------
+    def _escribir(self, docs: List[dict]) -> None:
+        pendientes = docs
+        for intento in range(self.reintentos):
+            try:
+                self._coleccion.insert_many(pendientes, ordered=False)
+                self._contar("escritos", len(docs))
+                self._contar("lotes")
+                return
+            except BulkWriteError as e:
+                # Con ordered=False solo fallan algunos documentos: se reintentan esos.
+                # Los duplicados ya se escribieron en un intento anterior (mismo _id).
+                errores = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICADO]
+                if not errores and not e.details.get("writeConcernErrors"):
+                    self._contar("escritos", len(docs))
+                    self._contar("lotes")
+                    return
+                if errores:
+                    pendientes = [pendientes[err["index"]] for err in errores]
+                ultimo_error: Exception = e
+            except PyMongoError as e:
+                ultimo_error = e
+
+            if intento < self.reintentos - 1:
+                self._contar("reintentos")
+                time.sleep(min(self.backoff_max, self.backoff_base * 2 ** intento))
+
+        logger.error(
+            f"No se pudieron guardar {len(pendientes)} interacciones tras {self.reintentos} intentos: {ultimo_error}"
+        )
+        self._contar("escritos", len(docs) - len(pendientes))
+        self._a_dead_letter(pendientes)
+
+    def _a_dead_letter(self, docs: List[dict]) -> None:
+        try:
+            directorio = os.path.dirname(self.ruta_dead_letter)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            with open(self.ruta_dead_letter, "a", encoding="utf-8") as f:
+                for doc in docs:
+                    f.write(json_util.dumps(doc, ensure_ascii=False) + "\n")
+            self._contar("dead_letter", len(docs))
+            logger.error(f"{len(docs)} interacciones guardadas en {self.ruta_dead_letter} para reprocesarlas.")
+        except OSError as e:
+            logger.error(f"Error escribiendo en {self.ruta_dead_letter}: {e}")
+            logger.error(f"Contenido fallido: {docs}")
+
+    def _contar(self, metrica: str, cantidad: int = 1) -> None:
+        with self._lock_metricas:
+            self._metricas[metrica] += cantidad
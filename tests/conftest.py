@@ -0,0 +1,5 @@
+import sys
+import os
+
+# Los módulos del servicio NLP se importan como "core.*" (la raíz es nlp/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "nlp")))
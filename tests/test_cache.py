@@ -0,0 +1,170 @@
+import pytest
+
+# Caché en dos niveles: LRU en memoria (L1) delante de Redis, con caché negativa,
+# funcionamiento solo con L1 cuando Redis no está disponible y espacios de claves
+# con huella que se invalidan por separado.
+pytest.importorskip("redis")
+
+from core import cache
+
+
+class RedisFalso:
+    def __init__(self):
+        self.datos = {}
+        self.caducidad_ms = {}
+        self.lecturas = 0
+
+    def get(self, clave):
+        self.lecturas += 1
+        return self.datos.get(clave)
+
+    def pttl(self, clave):
+        return self.caducidad_ms.get(clave, -1) if clave in self.datos else -2
+
+    def set(self, clave, valor, ex=None):
+        self.datos[clave] = valor
+
+    def pipeline(self, transaction=True):
+        return PipelineFalso(self)
+
+    def scan(self, cursor, match, count):
+        # Como en Redis, borrar durante el recorrido no hace saltarse claves
+        if cursor == 0:
+            self._recorrido = sorted(c for c in self.datos if c.startswith(match.rstrip("*")))
+        siguiente = cursor + count
+        return (siguiente if siguiente < len(self._recorrido) else 0), self._recorrido[cursor:siguiente]
+
+    def unlink(self, *claves):
+        return sum(self.datos.pop(clave, None) is not None for clave in claves)
+
+
+class PipelineFalso:
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.comandos = []
+
+    def __getattr__(self, nombre):
+        return lambda *args, **kwargs: self.comandos.append((nombre, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.cliente, nombre)(*args, **kwargs) for nombre, args, kwargs in self.comandos]
+
+
+@pytest.fixture(autouse=True)
+def espacios(monkeypatch):
+    huellas = {"prueba": "v1", "otro": "v1"}
+    monkeypatch.setattr(cache, "_espacios", {})
+    for espacio in huellas:
+        cache.registrar_espacio(espacio, lambda espacio=espacio: huellas[espacio])
+    return huellas
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    cliente = RedisFalso()
+    monkeypatch.setattr(cache, "obtener_cliente", lambda: cliente)
+    monkeypatch.setattr(cache, "cache_local", cache.CacheLocal(capacidad=2, ttl=60))
+    return cliente
+
+
+def test_l1_evita_consultar_redis(redis_falso):
+    cache.guardar_cache("Nunca", {"estado_emocional": "neutral"}, espacio="prueba")
+    assert cache.obtener_cache("Nunca", espacio="prueba") == {"estado_emocional": "neutral"}
+    assert redis_falso.lecturas == 0
+
+    # Lo que llega de Redis también queda en L1
+    redis_falso.datos[cache.generar_clave_cache("prueba", "Todos los días")] = '{"estado_emocional": "tristeza"}'
+    assert cache.obtener_cache("Todos los días", espacio="prueba") == {"estado_emocional": "tristeza"}
+    assert cache.obtener_cache("Todos los días", espacio="prueba") == {"estado_emocional": "tristeza"}
+    assert redis_falso.lecturas == 1
+
+
+def test_l1_no_supera_la_vida_restante_en_redis(redis_falso, monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: ahora[0])
+    clave = cache.generar_clave_cache("prueba", "Nunca")
+    redis_falso.datos[clave] = '{"estado_emocional": "neutral"}'
+    redis_falso.caducidad_ms[clave] = 2000
+
+    assert cache.obtener_cache("Nunca", espacio="prueba") == {"estado_emocional": "neutral"}
+    ahora[0] += 1
+    assert cache.obtener_cache("Nunca", espacio="prueba") is not None
+    assert redis_falso.lecturas == 1
+
+    # Caducada en Redis, tampoco sigue en L1
+    ahora[0] += 1.5
+    del redis_falso.datos[clave]
+    assert cache.obtener_cache("Nunca", espacio="prueba") is None
+    assert redis_falso.lecturas == 2
+
+
+def test_cache_negativa(redis_falso, monkeypatch):
+    assert cache.obtener_cache("sin guardar", espacio="prueba") is None
+    assert cache.obtener_cache("sin guardar", espacio="prueba") is None
+    assert redis_falso.lecturas == 1
+
+    # Al guardar el resultado la entrada negativa se sustituye
+    cache.guardar_cache("sin guardar", {"estado_emocional": "alegria"}, espacio="prueba")
+    assert cache.obtener_cache("sin guardar", espacio="prueba") == {"estado_emocional": "alegria"}
+
+    monkeypatch.setattr(cache, "TTL_CACHE_NEGATIVA", 0)
+    assert cache.obtener_cache("otro", espacio="prueba") is None
+    assert cache.obtener_cache("otro", espacio="prueba") is None
+    assert redis_falso.lecturas == 3
+
+
+def test_lru_acotada_y_caducidad(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: ahora[0])
+    local = cache.CacheLocal(capacidad=2, ttl=10)
+
+    local.guardar("a", "1")
+    local.guardar("b", "2")
+    assert local.obtener("a") == (True, "1")
+    local.guardar("c", "3")
+    assert local.obtener("b") == (False, None)
+
+    ahora[0] += 11
+    assert local.obtener("a") == (False, None)
+    assert len(local) == 1
+
+
+def test_sin_redis_usa_solo_l1(monkeypatch):
+    monkeypatch.setattr(cache, "obtener_cliente", lambda: None)
+    monkeypatch.setattr(cache, "cache_local", cache.CacheLocal(capacidad=8, ttl=60))
+
+    assert cache.obtener_cache("Nunca", espacio="prueba") is None
+    cache.guardar_cache("Nunca", {"estado_emocional": "neutral"}, espacio="prueba")
+    assert cache.obtener_cache("Nunca", espacio="prueba") == {"estado_emocional": "neutral"}
+    assert cache.obtener_cache("Nunca", espacio="otro") is None
+
+    estadisticas = cache.estadisticas_cache()
+    assert estadisticas["l1"]["aciertos"] >= 1 and estadisticas["l1"]["entradas"] == 1
+
+
+def test_claves_con_espacio_huella_y_normalizacion(espacios):
+    clave = cache.generar_clave_cache("prueba", "Todos  los días ")
+    assert clave.startswith("cache:prueba:v1:")
+    assert clave == cache.generar_clave_cache("prueba", "Todos los di\u0301as")
+    assert clave != cache.generar_clave_cache("otro", "Todos los días")
+
+    espacios["prueba"] = "v2"
+    assert cache.generar_clave_cache("prueba", "Todos los días").startswith("cache:prueba:v2:")
+    with pytest.raises(KeyError):
+        cache.generar_clave_cache("desconocido", "hola")
+
+
+def test_invalidar_espacio_por_lotes(redis_falso, espacios, monkeypatch):
+    monkeypatch.setattr(cache, "TAMANO_LOTE_INVALIDACION", 2)
+    for i in range(5):
+        cache.guardar_cache(f"texto {i}", {"i": i}, espacio="prueba")
+    cache.guardar_cache("texto", {"i": 0}, espacio="otro")
+    espacios["prueba"] = "v2"
+    cache.guardar_cache("nuevo", {"i": 9}, espacio="prueba")
+
+    assert cache.invalidar_espacio("prueba", solo_obsoletas=True) == 5
+    assert cache.obtener_cache("nuevo", espacio="prueba") == {"i": 9}
+
+    assert cache.invalidar_espacio("prueba") == 1
+    assert cache.obtener_cache("nuevo", espacio="prueba") is None
+    assert cache.obtener_cache("texto", espacio="otro") == {"i": 0}
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+# Reproduce conversaciones grabadas con la implementación original (cadena de if) y
+# comprueba que el registro de estados devuelve exactamente las mismas respuestas,
+# guarda los mismos datos y produce las mismas escrituras en base de datos y puntuaciones.
+# Los modelos se sustituyen por funciones deterministas idénticas a las usadas al grabar.
+for dependencia in ("pysentimiento", "sentence_transformers", "spacy", "redis", "pymongo", "fpdf", "pandas"):
+    pytest.importorskip(dependencia)
+
+from core import conversation_flow, empathy_utils
+from core import precomputed_suggestions as precalculo
+
+RUTA_GRABACIONES = os.path.join(os.path.dirname(__file__), "datos", "conversaciones_grabadas.json")
+EMOCIONES = ["tristeza", "alegria", "neutral", "enojo"]
+
+
+def _analizar_sentimiento(texto):
+    h = int(hashlib.md5(texto.encode()).hexdigest(), 16)
+    return {"estado_emocional": EMOCIONES[h % 4].upper(), "confianza": f"{h % 100}%"}
+
+
+def _detectar_intencion(texto):
+    texto = texto.strip().lower()
+    if texto.startswith(("sí", "si", "claro", "yes")):
+        return "afirmativo"
+    if texto.startswith(("no", "nunca")):
+        return "negativo"
+    return "desconocido"
+
+
+def _informe(session_id):
+    return {
+        "job_id": "trabajo-grabado",
+        "estado": "pendiente",
+        "url_pdf": f"http://localhost:8010/static/informes/{session_id}.pdf",
+        "url_estado": "http://localhost:8001/informes/trabajo-grabado"
+    }
+
+
+with open(RUTA_GRABACIONES, encoding="utf-8") as f:
+    CONVERSACIONES = json.load(f)
+
+
+@pytest.fixture
+def efectos(monkeypatch):
+    registro = []
+    monkeypatch.setattr(conversation_flow, "analizar_sentimiento", _analizar_sentimiento)
+    monkeypatch.setattr(conversation_flow, "detectar_intencion", _detectar_intencion)
+    monkeypatch.setattr(conversation_flow, "extraer_nombre", lambda texto: texto.strip().title())
+    monkeypatch.setattr(empathy_utils, "preprocesar_texto", lambda texto: texto.split())
+    monkeypatch.setattr(
+        conversation_flow, "guardar_interaccion_completa",
+        lambda **campos: registro.append(["db", campos])
+    )
+    monkeypatch.setattr(
+        conversation_flow, "asignar_puntuacion",
+        lambda *args: registro.append(["asig", *args])
+    )
+    monkeypatch.setattr(
+        conversation_flow, "encolar_informe",
+        lambda session_id, datos: registro.append(["informe", session_id]) or _informe(session_id)
+    )
+    return registro
+
+
+def _reproducir(conversacion, efectos):
+    estado = conversacion["estado_inicial"]
+    datos = {}
+
+    for numero, turno in enumerate(conversacion["turnos"]):
+        efectos.clear()
+        respuesta, datos = conversation_flow.procesar_mensaje("sesion-grabada", turno["entrada"], estado, datos)
+
+        assert respuesta == turno["respuesta"], f"Turno {numero} ({estado}): {turno['entrada']!r}"
+        assert efectos == turno["efectos"], f"Turno {numero} ({estado}): {turno['entrada']!r}"
+        estado = respuesta.get("estado", estado)
+
+    assert datos == conversacion["datos_finales"]
+
+
+@pytest.fixture
+def tabla_precalculada(efectos, monkeypatch):
+    monkeypatch.setattr(precalculo, "_tabla", precalculo._tabla)
+    monkeypatch.setattr(precalculo, "PRECALCULO_ACTIVO", True)
+    monkeypatch.setattr(precalculo, "analizar_sentimiento_lote", lambda textos: [_analizar_sentimiento(t) for t in textos])
+    monkeypatch.setattr(precalculo, "detectar_intencion", _detectar_intencion)
+    assert precalculo.precalcular_sugerencias(estados=conversation_flow.MANEJADORES_ESTADO) > 0
+    return efectos
+
+
+@pytest.mark.parametrize("conversacion", CONVERSACIONES, ids=lambda c: c["estado_inicial"])
+def test_reproduce_conversacion_grabada(conversacion, efectos):
+    _reproducir(conversacion, efectos)
+
+
+# Con la tabla de respuestas sugeridas cargada las conversaciones no cambian
+@pytest.mark.parametrize("conversacion", CONVERSACIONES, ids=lambda c: c["estado_inicial"])
+def test_reproduce_conversacion_con_tabla_precalculada(conversacion, tabla_precalculada):
+    _reproducir(conversacion, tabla_precalculada)
+
+
+# Con la tabla cargada, una respuesta sugerida no pasa por el modelo ni siquiera al guardarse
+def test_respuesta_sugerida_no_llama_al_modelo(tabla_precalculada, monkeypatch):
+    from core import database
+
+    llamadas = []
+    def modelo(texto):
+        llamadas.append(texto)
+        return _analizar_sentimiento(texto)
+
+    documentos = []
+    monkeypatch.setattr(conversation_flow, "analizar_sentimiento", modelo)
+    monkeypatch.setattr(database, "analizar_sentimiento", modelo)
+    monkeypatch.setattr(database, "_insertar", lambda doc, descripcion: documentos.append(doc))
+    monkeypatch.setattr(conversation_flow, "guardar_interaccion_completa", database.guardar_interaccion_completa)
+
+    respuesta, _ = conversation_flow.procesar_mensaje("sesion-grabada", "Todos los días", "preguntar_frecuencia", {})
+
+    assert respuesta["estado"] == "preguntar_duracion"
+    assert llamadas == []
+    assert [doc["emocion"] for doc in documentos] == [
+        _analizar_sentimiento("Todos los días")["estado_emocional"].lower()
+    ]
+
+
+def test_todos_los_estados_con_pregunta_tienen_manejador():
+    sin_manejador = {
+        "cerrar_evaluación_por_riesgo_alto", "cierre_conversacion", "esperar_siguiente_pregunta"
+    }
+    esperados = set(conversation_flow.ESTADOS_DIALOG_MANAGER) - sin_manejador
+    esperados.add("preguntar_percepcion_empatia")
+    assert esperados == set(conversation_flow.MANEJADORES_ESTADO)
@@ -0,0 +1,34 @@
+import threading
+
+# Agrupación de peticiones concurrentes en lotes y reparto entre varios despachadores.
+from core.micro_batcher import MicroBatcher
+
+
+def test_agrupa_y_respeta_el_orden():
+    lotes = []
+
+    def procesar(elementos):
+        lotes.append(list(elementos))
+        return [e * 2 for e in elementos]
+
+    batcher = MicroBatcher(procesar, tamano_maximo=4, espera_maxima_ms=50)
+    futuros = [batcher.enviar(n) for n in range(6)]
+    assert [f.result(timeout=5) for f in futuros] == [0, 2, 4, 6, 8, 10]
+    batcher.detener()
+    assert sorted(n for lote in lotes for n in lote) == list(range(6))
+    assert all(len(lote) <= 4 for lote in lotes)
+
+
+def test_varios_lotes_en_curso_con_varios_despachadores():
+    # Cada lote espera a que haya otro en curso: con un único despachador no terminaría
+    en_curso = threading.Barrier(2, timeout=5)
+
+    def procesar(elementos):
+        en_curso.wait()
+        return elementos
+
+    batcher = MicroBatcher(procesar, tamano_maximo=1, espera_maxima_ms=0, despachadores=2)
+    futuros = [batcher.enviar(n) for n in range(2)]
+    assert [f.result(timeout=5) for f in futuros] == [0, 1]
+    batcher.detener()
+    assert batcher._hilos == []
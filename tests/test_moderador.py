@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+from core.moderation_engine import Coincidencia, MotorModeracion
+
+# Comprueba el autómata de moderación contra la búsqueda ingenua término a término
+# (el comportamiento anterior de contiene_lenguaje_inapropiado) y sus modos opcionales.
+ALFABETO = "abcdeéñ "
+
+
+def _buscar_ingenuo(terminos, texto):
+    texto = texto.casefold()
+    return sorted(
+        (termino, i, i + len(termino))
+        for termino in terminos
+        for i in range(len(texto) - len(termino) + 1)
+        if texto.startswith(termino, i)
+    )
+
+
+def test_equivale_a_la_busqueda_ingenua():
+    aleatorio = random.Random(7)
+    for _ in range(300):
+        terminos = {
+            "".join(aleatorio.choice(ALFABETO.strip()) for _ in range(aleatorio.randint(1, 4)))
+            for _ in range(aleatorio.randint(1, 12))
+        }
+        texto = "".join(aleatorio.choice(ALFABETO + ALFABETO.upper()) for _ in range(aleatorio.randint(0, 40)))
+        motor = MotorModeracion(terminos)
+
+        encontrados = sorted((c.termino, c.inicio, c.fin) for c in motor.buscar(texto))
+        assert encontrados == _buscar_ingenuo(terminos, texto), (terminos, texto)
+        assert motor.contiene(texto) == any(t in texto.casefold() for t in terminos)
+
+
+def test_devuelve_terminos_y_posiciones():
+    motor = MotorModeracion(["odio", "matar", "estúpido"])
+    texto = "Lo ODIO, es Estúpido"
+    assert motor.buscar(texto) == [Coincidencia("odio", 3, 7), Coincidencia("estúpido", 12, 20)]
+    assert texto[12:20] == "Estúpido"
+
+
+def test_limites_de_palabra():
+    motor = MotorModeracion(["odio"], limites_palabra=True)
+    assert motor.buscar("un podio") == []
+    assert motor.buscar("odio, todo") == [Coincidencia("odio", 0, 4)]
+    assert MotorModeracion(["odio"]).contiene("un podio")
+
+
+def test_plegado_de_acentos_conserva_posiciones_originales():
+    motor = MotorModeracion(["estúpido"], plegar_acentos=True)
+    texto = "eres un ESTUPIDO y un éstupido"
+    assert [(c.inicio, c.fin) for c in motor.buscar(texto)] == [(8, 16), (22, 31)]
+    assert not MotorModeracion(["estúpido"]).contiene("estupido")
+
+
+def test_lista_vacia_y_texto_vacio():
+    assert MotorModeracion([]).buscar("cualquier cosa") == []
+    assert not MotorModeracion(["odio"]).contiene("")
+
+
+@pytest.fixture
+def moderator():
+    pytest.importorskip("redis")
+    from core import moderator
+    return moderator
+
+
+def test_contiene_lenguaje_inapropiado_usa_la_lista_cargada(moderator):
+    termino = moderator.obtener_lexico().terminos[0]
+    assert moderator.contiene_lenguaje_inapropiado(f"Texto con {termino.upper()} dentro")
+    assert not moderator.contiene_lenguaje_inapropiado("Hoy me siento bien")
+    assert moderator.detectar_lenguaje_inapropiado(termino)[0].termino == termino
+
+
+def test_recarga_la_lista_y_cambia_de_version(moderator, tmp_path, monkeypatch):
+    ruta = tmp_path / "palabras.txt"
+    ruta.write_text("odio\n", encoding="utf-8")
+    monkeypatch.setattr(moderator, "RUTA_LISTA", str(ruta))
+    monkeypatch.setattr(moderator, "INTERVALO_RECARGA", 0)
+    monkeypatch.setattr(moderator, "CLAVE_REDIS_LEXICO", "")
+
+    gestor = moderator.GestorLexico()
+    anterior = gestor.instantanea
+    assert not gestor.recargar()
+
+    ruta.write_text("odio\nrabia\n", encoding="utf-8")
+    assert gestor.recargar()
+    nueva = gestor.instantanea
+    assert nueva.version != anterior.version
+    assert nueva.motor.contiene("qué rabia") and not anterior.motor.contiene("qué rabia")
+
+    # Si el archivo desaparece se conserva la última lista válida
+    ruta.unlink()
+    assert not gestor.recargar()
+    assert gestor.instantanea is nueva
+
+
+def test_caida_de_redis_conserva_la_lista_de_redis(moderator, tmp_path, monkeypatch):
+    ruta = tmp_path / "palabras.txt"
+    ruta.write_text("odio\n", encoding="utf-8")
+    monkeypatch.setattr(moderator, "RUTA_LISTA", str(ruta))
+    monkeypatch.setattr(moderator, "INTERVALO_RECARGA", 0)
+    monkeypatch.setattr(moderator, "CLAVE_REDIS_LEXICO", "moderacion:lexico")
+
+    class RedisFalso:
+        def get(self, clave):
+            return "rabia\nasco\n"
+
+    cliente = [RedisFalso()]
+    monkeypatch.setattr(moderator, "obtener_cliente", lambda: cliente[0])
+    gestor = moderator.GestorLexico()
+    cargada = gestor.instantanea
+    assert cargada.origen == "redis:moderacion:lexico"
+
+    # Durante la caída no se cambia a la lista del archivo
+    cliente[0] = None
+    assert not gestor.recargar()
+    assert gestor.instantanea is cargada and not gestor.instantanea.motor.contiene("odio")
+
+    # Al volver Redis con la misma lista tampoco hay cambio de versión
+    cliente[0] = RedisFalso()
+    assert not gestor.recargar()
+    assert gestor.instantanea is cargada
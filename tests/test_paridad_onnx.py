@@ -0,0 +1,55 @@
+import pytest
+
+# Comprueba que el backend ONNX (INT8) del modelo de emociones no cambia ninguna etiqueta
+# respecto al analizador PyTorch de pysentimiento.
+pytest.importorskip("onnxruntime")
+pysentimiento = pytest.importorskip("pysentimiento")
+
+from core import onnx_backend
+
+TEXTOS_EMOCIONES = [
+    "Últimamente me siento muy triste y sin ganas de nada.",
+    "Hoy ha sido un día increíble, estoy muy feliz.",
+    "Siento una presión constante en el pecho, no puedo relajarme.",
+    "Estoy harto de que todo salga mal, me siento muy molesto.",
+    "Confío en que todo mejorará con el tiempo.",
+    "No me lo esperaba, fue una noticia completamente inesperada.",
+    "No lo sé, a veces estoy bien, a veces no.",
+    "Estoy bastante confundido últimamente.",
+    "Sí, me he sentido triste",
+    "No, me he sentido bien",
+    "Todos los días",
+    "Casi nunca",
+    "Un mes o más",
+    "Me cuesta dormirme",
+    "Evito salir de casa",
+    "Hablo con un amigo",
+]
+
+
+@pytest.fixture(scope="module")
+def analizador():
+    return pysentimiento.create_analyzer(task="emotion", lang="es")
+
+
+@pytest.mark.parametrize("cuantizar", [True, False])
+def test_paridad_etiquetas_emociones(analizador, cuantizar, tmp_path_factory, monkeypatch):
+    monkeypatch.setattr(onnx_backend, "ONNX_DIR", str(tmp_path_factory.mktemp("onnx")))
+    clasificador = onnx_backend.ClasificadorOnnx(analizador, cuantizar=cuantizar)
+
+    informe = onnx_backend.verificar_paridad_clasificador(analizador, clasificador, TEXTOS_EMOCIONES)
+
+    assert informe["discrepancias"] == [], informe
+    assert informe["max_diferencia_probabilidad"] < (0.1 if cuantizar else 1e-3)
+
+
+def test_salida_individual_igual_que_lote(analizador, tmp_path, monkeypatch):
+    monkeypatch.setattr(onnx_backend, "ONNX_DIR", str(tmp_path))
+    clasificador = onnx_backend.ClasificadorOnnx(analizador, cuantizar=True)
+
+    individual = clasificador.predict(TEXTOS_EMOCIONES[0])
+    lote = clasificador.predict(TEXTOS_EMOCIONES[:3])
+
+    assert individual.output == lote[0].output
+    assert set(individual.probas) == set(analizador.model.config.id2label.values())
+
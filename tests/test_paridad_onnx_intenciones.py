@@ -0,0 +1,38 @@
+import pytest
+
+# Codificador de intenciones: las similitudes coseno del backend ONNX deben quedar
+# dentro de tolerancia respecto a sentence-transformers (no necesita pysentimiento).
+pytest.importorskip("onnxruntime")
+sentence_transformers = pytest.importorskip("sentence_transformers")
+
+from core import onnx_backend
+
+TEXTOS = [
+    "Últimamente me siento muy triste y sin ganas de nada.",
+    "Hoy ha sido un día increíble, estoy muy feliz.",
+    "No lo sé, a veces estoy bien, a veces no.",
+    "Sí, me he sentido triste",
+    "No, me he sentido bien",
+    "Todos los días",
+    "Casi nunca",
+    "Me cuesta dormirme",
+]
+FRASES_INTENCION = ["sí", "claro que sí", "me siento así", "no", "para nada", "no me pasa"]
+
+
+@pytest.mark.parametrize("cuantizar", [True, False])
+def test_paridad_similitud_intenciones(cuantizar, tmp_path, monkeypatch):
+    monkeypatch.setattr(onnx_backend, "ONNX_DIR", str(tmp_path))
+
+    nombre = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    modelo = sentence_transformers.SentenceTransformer(nombre)
+    codificador = onnx_backend.CodificadorOnnx.cargar(nombre, cuantizar=cuantizar, modelo_st=modelo)
+
+    referencia = modelo.encode(TEXTOS, convert_to_numpy=True, normalize_embeddings=True)
+    candidata = codificador.encode(TEXTOS, normalize_embeddings=True)
+    prototipos_ref = modelo.encode(FRASES_INTENCION, convert_to_numpy=True, normalize_embeddings=True)
+    prototipos_cand = codificador.encode(FRASES_INTENCION, normalize_embeddings=True)
+
+    diferencia = abs(referencia @ prototipos_ref.T - candidata @ prototipos_cand.T).max()
+    assert diferencia < (0.03 if cuantizar else 1e-4)
+    assert codificador.encode(TEXTOS[0]).shape == (referencia.shape[1],)
@@ -0,0 +1,67 @@
+import pytest
+
+# Una sesión que no se pudo leer de Redis no debe volcarse encima de la real.
+pytest.importorskip("redis")
+
+import redis
+
+from core import session_store
+
+
+class RedisFalso:
+    def __init__(self):
+        self.hashes = {}
+        self.caido = False
+
+    def pipeline(self, transaction=True):
+        return PipelineFalso(self)
+
+
+class PipelineFalso:
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.comandos = []
+
+    def __getattr__(self, nombre):
+        return lambda *args: self.comandos.append((nombre, args))
+
+    def execute(self):
+        if self.cliente.caido:
+            raise redis.exceptions.ConnectionError("sin conexión")
+        resultados = []
+        for nombre, args in self.comandos:
+            if nombre == "hgetall":
+                resultados.append(dict(self.cliente.hashes.get(args[0], {})))
+            elif nombre == "hset":
+                self.cliente.hashes.setdefault(args[0], {})[args[1]] = args[2]
+                resultados.append(1)
+            else:
+                resultados.append(None)
+        return resultados
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    cliente = RedisFalso()
+    monkeypatch.setattr(session_store, "obtener_cliente", lambda: cliente)
+    monkeypatch.setattr(session_store, "notificar_error", lambda e: None)
+    return cliente
+
+
+def test_fallo_al_cargar_no_sobrescribe_la_sesion(redis_falso):
+    with session_store.sesion_turno("u1") as sesion:
+        sesion.estado = {"estado_actual": "preguntar_frecuencia"}
+    clave = session_store._get_key("u1")
+    guardado = dict(redis_falso.hashes[clave])
+
+    # La lectura falla y Redis vuelve antes del volcado
+    redis_falso.caido = True
+    with session_store.sesion_turno("u1") as sesion:
+        redis_falso.caido = False
+        assert not sesion.cargada
+        sesion.estado = {"estado_actual": "presentacion"}
+    assert redis_falso.hashes[clave] == guardado
+
+    with session_store.sesion_turno("u1") as sesion:
+        assert sesion.cargada
+        assert sesion.estado == {"estado_actual": "preguntar_frecuencia"}
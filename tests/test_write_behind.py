@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+# Comprueba el buffer de escritura diferida contra una colección simulada:
+# agrupación en lotes, vaciado al detener, duplicados y fichero dead-letter.
+pytest.importorskip("pymongo")
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from core.write_behind import BufferEscritura
+
+
+class ColeccionSimulada:
+    def __init__(self, fallos=0, errores_por_lote=None):
+        self.lotes = []
+        self.fallos = fallos
+        self.errores_por_lote = list(errores_por_lote or [])
+
+    def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        if self.fallos:
+            self.fallos -= 1
+            raise AutoReconnect("sin conexión")
+        self.lotes.append([doc["n"] for doc in docs])
+        if self.errores_por_lote:
+            raise BulkWriteError({"writeErrors": self.errores_por_lote.pop(0), "writeConcernErrors": []})
+
+
+def _buffer(coleccion, tmp_path, **opciones):
+    opciones.setdefault("intervalo_ms", 50)
+    opciones.setdefault("backoff_base", 0)
+    return BufferEscritura(coleccion, ruta_dead_letter=str(tmp_path / "dead.jsonl"), **opciones)
+
+
+def test_agrupa_en_lotes_y_vacia_al_detener(tmp_path):
+    coleccion = ColeccionSimulada()
+    buffer = _buffer(coleccion, tmp_path, tamano_lote=3, intervalo_ms=10_000)
+    for n in range(7):
+        buffer.encolar({"n": n})
+    buffer.detener()
+
+    assert sum(coleccion.lotes, []) == list(range(7))
+    assert all(len(lote) <= 3 for lote in coleccion.lotes)
+    assert buffer.estadisticas()["escritos"] == 7
+    assert buffer.estadisticas()["en_cola"] == 0
+
+
+def test_reintenta_y_cuenta_duplicados_como_escritos(tmp_path):
+    duplicado = [{"index": 0, "code": 11000, "errmsg": "duplicate key"}]
+    coleccion = ColeccionSimulada(fallos=1, errores_por_lote=[duplicado])
+    buffer = _buffer(coleccion, tmp_path)
+    buffer.encolar({"n": 1})
+    buffer.detener()
+
+    estadisticas = buffer.estadisticas()
+    assert estadisticas["reintentos"] == 1
+    assert estadisticas["escritos"] == 1
+    assert estadisticas["dead_letter"] == 0
+
+
+def test_reintenta_solo_los_documentos_fallidos(tmp_path):
+    fallo_parcial = [{"index": 1, "code": 121, "errmsg": "document failed validation"}]
+    coleccion = ColeccionSimulada(errores_por_lote=[fallo_parcial])
+    buffer = _buffer(coleccion, tmp_path, tamano_lote=3, intervalo_ms=10_000)
+    for n in range(3):
+        buffer.encolar({"n": n})
+    buffer.detener()
+
+    assert coleccion.lotes == [[0, 1, 2], [1]]
+    assert buffer.estadisticas()["escritos"] == 3
+
+
+def test_envia_a_dead_letter_tras_agotar_reintentos(tmp_path):
+    coleccion = ColeccionSimulada(fallos=10)
+    buffer = _buffer(coleccion, tmp_path, reintentos=3)
+    buffer.encolar({"n": 1, "pregunta": "¿Cómo te sientes?"})
+    buffer.detener()
+
+    lineas = (tmp_path / "dead.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(linea)["n"] for linea in lineas] == [1]
+    assert buffer.estadisticas()["dead_letter"] == 1
+    assert buffer.estadisticas()["reintentos"] == 2
+
+
+def test_cola_llena_escribe_de_forma_sincrona(tmp_path):
+    coleccion = ColeccionSimulada()
+    buffer = _buffer(coleccion, tmp_path, capacidad=1, intervalo_ms=10_000)
+    buffer._asegurar_hilo = lambda: None  # sin hilo de volcado la cola no se vacía
+    buffer.encolar({"n": 1})
+    buffer.encolar({"n": 2})
+
+    assert coleccion.lotes == [[2]]
+    assert buffer.estadisticas()["escrituras_sincronas"] == 1